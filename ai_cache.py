@@ -0,0 +1,128 @@
+"""
+Persistent cache for NL→SQL translations (SQLite, stdlib only).
+
+Entries are keyed on the normalised question, the ``session_id``, the model
+name and a hash of the prompt material (schema + few-shot examples), so a
+prompt change never serves SQL generated for an older schema.  Summaries are
+stored next to the SQL together with a hash of the result preview they were
+written for, and are only reused while the data still looks the same.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+
+CACHE_PATH = Path(os.getenv("AI_CACHE_PATH", Path(__file__).parent / ".ai_cache.sqlite3"))
+MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key          TEXT PRIMARY KEY,
+    question     TEXT NOT NULL,
+    session_id   INTEGER,
+    model        TEXT NOT NULL,
+    schema_hash  TEXT NOT NULL,
+    sql          TEXT NOT NULL,
+    raw          TEXT NOT NULL,
+    summary      TEXT,
+    preview_hash TEXT,
+    created_at   REAL NOT NULL,
+    last_used    REAL NOT NULL
+)
+"""
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def content_hash(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()[:16]
+
+
+class TranslationCache:
+    """Size-bounded (least recently used first out) store of generated SQL."""
+
+    def __init__(self, path: Path = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        with self._connect() as con:
+            con.execute(_SCHEMA)
+
+    def _connect(self):
+        # one short-lived connection per call keeps this safe across threads
+        return closing(sqlite3.connect(self.path, timeout=5, isolation_level=None))
+
+    @staticmethod
+    def key(question: str, session_id: Optional[int], model: str, schema_hash: str) -> str:
+        return content_hash(normalize_question(question), str(session_id), model, schema_hash)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            row = con.execute("SELECT * FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            con.execute("UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key))
+            return dict(row)
+
+    def put(self, key: str, *, question: str, session_id: Optional[int], model: str,
+            schema_hash: str, sql: str, raw: str):
+        now = time.time()
+        with self._connect() as con:
+            con.execute(
+                """INSERT OR REPLACE INTO translations
+                   (key, question, session_id, model, schema_hash, sql, raw, created_at, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, question, session_id, model, schema_hash, sql, raw, now, now),
+            )
+            con.execute(
+                """DELETE FROM translations WHERE key IN (
+                       SELECT key FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                (self.max_entries,),
+            )
+
+    def get_summary(self, key: str, preview_hash: str) -> Optional[str]:
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT summary FROM translations WHERE key = ? AND preview_hash = ?",
+                (key, preview_hash),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_summary(self, key: str, preview_hash: str, summary: str):
+        with self._connect() as con:
+            con.execute(
+                "UPDATE translations SET summary = ?, preview_hash = ? WHERE key = ?",
+                (summary, preview_hash, key),
+            )
+
+    def invalidate(self, keep_schema: Optional[str] = None) -> int:
+        """Drop entries built for another schema hash, or everything."""
+        with self._connect() as con:
+            if keep_schema is None:
+                return con.execute("DELETE FROM translations").rowcount
+            return con.execute(
+                "DELETE FROM translations WHERE schema_hash <> ?", (keep_schema,)
+            ).rowcount
+
+    def __len__(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT count(*) FROM translations").fetchone()[0]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect or clear the NL→SQL cache.")
+    ap.add_argument("--clear", action="store_true", help="delete all cached translations")
+    args = ap.parse_args()
+    cache = TranslationCache()
+    if args.clear:
+        print(f"🗑️ removed {cache.invalidate()} cached translations")
+    else:
+        print(f"📦 {len(cache)} cached translations in {cache.path}")
@@ -1,22 +1,46 @@
 # ai_sql.py
 
+import contextvars
 import os
+import queue
 import re
+import threading
+import time
 import sqlparse
+from concurrent.futures import ThreadPoolExecutor, wait
 from functools import lru_cache
-from typing import Optional
+from typing import Iterator, Optional
 
 import pandas as pd
-import google.generativeai as genai
-from db import run_query
+import schema_index
+import sql_guard
+from ai_cache import TranslationCache, content_hash
+from db import QueryStream, _engine, run_query
+
+AI_MAX_ROWS = int(os.getenv("AI_MAX_ROWS", "1000"))
+AI_TIMEOUT_S = float(os.getenv("AI_TIMEOUT_S", "30"))      # per model call
+
+# model calls, the query and connection warm-up run here so the caller stays responsive
+_WORKERS = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ask-ai")
+
+def _submit(fn, *args):
+    # carry the caller's context along (perf attributes queries to the calling tab)
+    return _WORKERS.submit(contextvars.copy_context().run, fn, *args)
 
 # 1️⃣ Gemini config
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+@lru_cache
+def _genai():
+    # the SDK takes ~1.5 s to import: only pay for it when a question is asked
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai
 
 @lru_cache
 def _model():
-    return genai.GenerativeModel(
-        model_name=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+    return _genai().GenerativeModel(
+        model_name=MODEL_NAME,
         generation_config={
             "response_mime_type": "text/plain",
             "temperature": 0.0,
@@ -247,10 +271,67 @@ SUMMARY_CONTEXT = (
     "concise answer to the user's question without disclaimers."
 )
 
+@lru_cache
+def _schema_index() -> schema_index.SchemaIndex:
+    """Schema used for prompts: ``AI_SCHEMA_SOURCE=live`` reads it from the database."""
+    if os.getenv("AI_SCHEMA_SOURCE", "snippet").lower() == "live":
+        try:
+            live = schema_index.from_database(run_query)
+            if live is not None:
+                return live
+        except Exception:
+            pass            # no database yet – the snippet is still a usable schema
+    return schema_index.from_snippet(SCHEMA_SNIPPET)
+
+@lru_cache
+def _schema_hash() -> str:
+    # any change to the prompt material makes older cached SQL unreachable
+    return content_hash(_schema_index().full_text(), FEW_SHOT, SYSTEM_CONTEXT)
+
+def _schema_for(question: str) -> tuple[str, dict]:
+    """Only the relevant tables unless ``AI_SCHEMA_PRUNE=off``."""
+    index = _schema_index()
+    if os.getenv("AI_SCHEMA_PRUNE", "on").lower() == "off":
+        text = index.full_text()
+        tokens = schema_index.approx_tokens(text)
+        return text, {"tables": list(index.tables), "schema_tokens": tokens,
+                      "full_schema_tokens": tokens, "reduction": 0.0}
+    return index.render(question)
+
+@lru_cache
+def _cache() -> Optional[TranslationCache]:
+    """Persistent NL→SQL cache; ``AI_CACHE=off`` disables it."""
+    if os.getenv("AI_CACHE", "on").lower() == "off":
+        return None
+    cache = TranslationCache()
+    cache.invalidate(keep_schema=_schema_hash())     # drop entries for an older schema
+    return cache
+
+def _cache_key(question: str, session_id: Optional[int]) -> str:
+    return TranslationCache.key(question, session_id, MODEL_NAME, _schema_hash())
+
 # 3️⃣ Generate SQL from question
-def question_to_sql(question: str, session_id: Optional[int] = None) -> tuple[str, str, str]:
+def question_to_sql(question: str, session_id: Optional[int] = None,
+                    model=None, stats: Optional[dict] = None) -> tuple[str, str, str]:
+    """
+    Translate ``question`` into SQL; repeated questions come from the cache.
+
+    ``model`` defaults to the configured Gemini model and may be any object
+    with a compatible ``generate_content``.  If ``stats`` is given it is filled
+    with the tables sent, prompt token estimates and the model latency.
+    """
+    stats = {} if stats is None else stats
+    cache = _cache()
+    key = _cache_key(question, session_id)
+    hit = cache.get(key) if cache is not None else None
+    if hit:
+        stats.update(cached=True, latency_s=0.0)
+        return hit["sql"], hit["raw"], question
+
+    schema_text, schema_stats = _schema_for(question)
+    stats.update(schema_stats, cached=False)
     prompt = [
-        f"{SYSTEM_CONTEXT}\n\nSchema:\n{SCHEMA_SNIPPET}",
+        f"{SYSTEM_CONTEXT}\n\nSchema:\n{schema_text}",
         "Here are some examples of NL→SQL conversions:",
         FEW_SHOT,
         f"Natural language: \"{question}\"",
@@ -261,7 +342,11 @@ def question_to_sql(question: str, session_id: Optional[int] = None) -> tuple[st
             "If appropriate, include a WHERE clause to filter results to this session."
         )
     prompt.append("SQL:")
-    response = _model().generate_content(prompt)
+    stats["prompt_tokens"] = schema_index.approx_tokens("\n".join(prompt))
+
+    t0 = time.perf_counter()
+    response = (model or _model()).generate_content(prompt)
+    stats["latency_s"] = time.perf_counter() - t0
 
     raw_text = response.text.strip()
 
@@ -269,74 +354,206 @@ def question_to_sql(question: str, session_id: Optional[int] = None) -> tuple[st
     cleaned_sql = re.sub(r'(?i)^\s*sql[:\s\n]*', '', raw_text)
     cleaned_sql = cleaned_sql.strip("`").strip()
 
+    if cache is not None:
+        cache.put(key, question=question, session_id=session_id, model=MODEL_NAME,
+                  schema_hash=_schema_hash(), sql=cleaned_sql, raw=raw_text)
     return cleaned_sql, raw_text, question
 
-def _summarize(question: str, df: pd.DataFrame) -> str:
-    """Use Gemini to summarise query results in natural language."""
+def _summary_prompt(question: str, preview: str) -> list[str]:
+    return [SUMMARY_CONTEXT, f"Question: {question}", f"Results:\n{preview}", "Answer:"]
+
+def _summarize(question: str, df: pd.DataFrame, key: Optional[str] = None, model=None,
+               cancel: Optional[threading.Event] = None) -> Iterator[str]:
+    """Stream a Gemini summary of the query results, chunk by chunk."""
     preview = df.head(5).to_csv(index=False)
-    resp = _model().generate_content([
-        SUMMARY_CONTEXT,
-        f"Question: {question}",
-        f"Results:\n{preview}",
-        "Answer:",
-    ])
-    return resp.text.strip()
+    cache = _cache() if key else None
+    preview_hash = content_hash(preview)
+    cached = cache.get_summary(key, preview_hash) if cache is not None else None
+    if cached:
+        yield cached
+        return
+
+    parts = []
+    for chunk in (model or _model()).generate_content(_summary_prompt(question, preview),
+                                                      stream=True):
+        if cancel is not None and cancel.is_set():
+            return                      # incomplete answers are not cached
+        parts.append(chunk.text)
+        yield chunk.text
+    if cache is not None:
+        cache.put_summary(key, preview_hash, "".join(parts).strip())
+
+# ─── Pipeline helpers ───────────────────────────────────────────────
+class Cancelled(Exception):
+    """A newer question replaced this one."""
+
+def _await(fut, cancel: threading.Event, timeout: float, what: str):
+    """``fut.result()`` that gives up on cancellation or after ``timeout`` seconds."""
+    deadline = time.monotonic() + timeout
+    while not fut.done():
+        wait([fut], timeout=0.1)
+        if cancel.is_set():
+            fut.cancel()
+            raise Cancelled()
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{what} timed out after {timeout:.0f}s")
+    return fut.result()
+
+def _stream_chunks(chunks: Iterator[str], cancel: threading.Event,
+                   timeout: float) -> Iterator[str]:
+    """Iterate ``chunks`` on a worker thread; the caller never blocks on the network."""
+    q: queue.Queue = queue.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for c in chunks:
+                q.put(c)
+        except Exception as e:
+            q.put(e)
+        q.put(done)
+
+    _submit(produce)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            if cancel.is_set():
+                raise Cancelled()
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Summary timed out after {timeout:.0f}s")
+            continue
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def _warm_connection():
+    # check a pooled connection out (and in) while the model is still writing SQL
+    with _engine().connect() as con:
+        con.exec_driver_sql("SELECT 1")
+
+def _first_page(sql: str, timeout_ms: int, holder: dict):
+    stream = holder["stream"] = QueryStream(sql, page_rows=AI_MAX_ROWS, timeout_ms=timeout_ms)
+    try:
+        df = stream.next_page()
+        return df, not stream.exhausted
+    finally:
+        stream.close()
 
 # 4️⃣ Run query or fallback to raw
-def ask(question: str, session_id: Optional[int] = None):
-    if not os.getenv("GEMINI_API_KEY"):
-        return {
-            "raw": "",
-            "sql": None,
-            "df": None,
-            "answer": None,
-            "error": "GEMINI_API_KEY environment variable not set",
-        }
-
-    sql, raw, _ = question_to_sql(question, session_id)
+def ask_stream(question: str, session_id: Optional[int] = None, model=None,
+               cancel: Optional[threading.Event] = None,
+               timeout_s: float = AI_TIMEOUT_S) -> Iterator[tuple[str, object]]:
+    """
+    Answer ``question`` step by step as ``(kind, payload)`` events.
+
+    ``sql`` (raw response, SQL, prompt stats) comes as soon as the model has
+    answered, ``guard`` once the cost check passed (with the SQL that will
+    run), ``data`` with the first result page, then one ``answer`` event per
+    streamed summary chunk and finally ``done`` with the same dict ``ask``
+    returns.  Model calls and the query run on worker threads; setting
+    ``cancel`` (or closing the generator) abandons them and cancels a running
+    query on the server.
+    """
+    cancel = cancel or threading.Event()
+    try:
+        yield from _pipeline(question, session_id, model, cancel, timeout_s)
+    finally:
+        cancel.set()        # stop whatever is still running in the background
+
+def _pipeline(question, session_id, model, cancel, timeout_s):
+    res = {"raw": "", "sql": None, "df": None, "answer": None, "error": None}
+    if model is None and not os.getenv("GEMINI_API_KEY"):
+        res["error"] = "GEMINI_API_KEY environment variable not set"
+        yield "done", res
+        return
+
+    stats = {}
+    warm = _submit(_warm_connection)
+    try:
+        sql, raw, _ = _await(_submit(question_to_sql, question, session_id, model, stats),
+                             cancel, timeout_s, "SQL generation")
+    except (TimeoutError, Cancelled) as e:
+        res["error"] = str(e) or "Cancelled – a newer question was asked."
+        yield "done", res
+        return
+    res.update(raw=raw, sql=sql, stats=stats)
+    yield "sql", {"raw": raw, "sql": sql, "stats": stats}
 
     # Versuch, das SQL zu parsen
     try:
         parsed = sqlparse.parse(sql)[0]
     except Exception:
-        return {
-            "raw": raw,
-            "sql": sql,
-            "df": None,
-            "answer": None,
-            "error": "Could not parse generated SQL. Please review manually.",
-        }
+        res["error"] = "Could not parse generated SQL. Please review manually."
+        yield "done", res
+        return
 
     # Nur SELECT‑Statements erlaubt (Warnung statt Exception)
     if parsed.get_type() != "SELECT":
-        return {
-            "raw": raw,
-            "sql": sql,
-            "df": None,
-            "answer": None,
-            "error": "Warnung: Generiertes Statement ist kein SELECT. Bitte prüfen.",
-        }
+        res["error"] = "Warnung: Generiertes Statement ist kein SELECT. Bitte prüfen."
+        yield "done", res
+        return
 
     # DML/DDL‑Keywords weiterhin blocken
     if re.search(r";|\b(update|delete|insert|drop|alter)\b", sql, re.I):
-        return {
-            "raw": raw,
-            "sql": sql,
-            "df": None,
-            "answer": None,
-            "error": "Unsafe SQL detected – please remove data‑modifying statements.",
-        }
-
-    # SQL ausführen
-    df = run_query(sql)
-
-    # Zusammenfassung erzeugen
-    answer = "No results found." if df.empty else _summarize(question, df)
-
-    return {
-        "raw": raw,
-        "sql": sql,
-        "df": df,
-        "answer": answer,
-        "error": None,
-    }
+        res["error"] = "Unsafe SQL detected – please remove data‑modifying statements."
+        yield "done", res
+        return
+
+    # Kosten per EXPLAIN schätzen – ggf. umschreiben (session_id, LIMIT) oder ablehnen
+    wait([warm])
+    try:
+        guard = sql_guard.check(sql, session_id)
+    except Exception as e:
+        res["error"] = f"The database rejected the generated SQL: {e}"
+        yield "done", res
+        return
+    res["guard"] = guard
+    if not guard.allowed:
+        res["error"] = guard.reason
+        yield "done", res
+        return
+    res["sql"] = sql = guard.sql
+    yield "guard", guard
+
+    # SQL ausführen – nur die erste Seite, mit statement_timeout
+    holder = {}
+    try:
+        df, truncated = _await(_submit(_first_page, sql, guard.timeout_ms, holder),
+                               cancel, guard.timeout_ms / 1000 + 5, "Query")
+    except (TimeoutError, Cancelled) as e:
+        if "stream" in holder:
+            holder["stream"].cancel()
+        res["error"] = str(e) or "Cancelled – a newer question was asked."
+        yield "done", res
+        return
+    res.update(df=df, truncated=truncated)
+    yield "data", {"df": df, "truncated": truncated}
+
+    # Zusammenfassung streamen, während Tabelle und SQL schon sichtbar sind
+    if df.empty:
+        res["answer"] = "No results found."
+        yield "answer", res["answer"]
+    else:
+        parts = []
+        chunks = _summarize(question, df, _cache_key(question, session_id), model, cancel)
+        try:
+            for chunk in _stream_chunks(chunks, cancel, timeout_s):
+                parts.append(chunk)
+                yield "answer", chunk
+        except Cancelled:
+            pass
+        except TimeoutError as e:
+            parts.append(f" … ({e})")
+            yield "answer", parts[-1]
+        res["answer"] = "".join(parts).strip()
+    yield "done", res
+
+def ask(question: str, session_id: Optional[int] = None, model=None):
+    """Blocking variant of ``ask_stream``: the final result dict."""
+    for kind, payload in ask_stream(question, session_id, model):
+        if kind == "done":
+            return payload
@@ -1,63 +1,109 @@
 import os
+import tempfile
+import threading
 import streamlit as st
-import plotly.express as px
 import pandas as pd
 from ssh_tunnel import start_ssh_tunnel
+from dotenv import load_dotenv
+
+load_dotenv()
+import snapshot
+import warmup
+from db import on_first_connect, warm_pool, watch_refreshes
+
+
+def open_database():
+    # after every reconnect the connection pool is refilled through the new tunnel
+    start_ssh_tunnel(on_up=warm_pool)
+    # cached results are dropped as soon as a view refresh is announced
+    watch_refreshes()
+
+
+# Open the SSH tunnel before anything else.  With a fresh snapshot the tabs need
+# no database: the tunnel opens with the first query that still goes to Postgres
+# (custom SQL, Ask AI, sessions outside a partial snapshot).
+if snapshot.is_fresh():
+    on_first_connect("tunnel", open_database)
+else:
+    open_database()
 
-# Open the SSH tunnel before anything else
-start_ssh_tunnel()
+# the season/race catalog loads in the background while plotly & co. import
+warmup.start()
 
-from db import run_query
-from ai_sql import ask
+import plotly.express as px
+import perf
+import queries
+from db import QueryStream, run_query
+from sql_guard import check as guard_sql
+from catalog import catalog
+from session_bundle import fetch_session_bundle
+from lap_analytics import ROLLING_LAPS, session_analytics
+from compare import compare as compare_races, pace_matrix, points_table, season_races
+from downsample import METHODS, fetch_telemetry
 
 st.set_page_config(page_title="F1 Analytics Suite", layout="wide")
 st.title("🏎️ F1 Analytics Suite")
+_run = perf.start_run()
 
 # ───────────────────────── Sidebar ──────────────────────────
-with st.sidebar:
+with st.sidebar, perf.tab("sidebar"):
     st.header("Filters")
-    seasons = run_query("SELECT DISTINCT year FROM meeting ORDER BY year DESC")["year"]
-    sel_year = st.selectbox("Season", seasons, index=0)
-
-    # fetch all Race sessions for the selected year, ordered by meeting start
-    sessions = run_query(
-        """
-        SELECT s.session_id,
-               m.meeting_name AS label,
-               m.start
-        FROM session s
-        JOIN meeting m ON m.meeting_id = s.meeting_id
-        WHERE m.year = :yr
-          AND s.session_type = 'Race'
-        ORDER BY m.start
-        """,
-        yr=int(sel_year)
-    )
+    # seasons, meetings and sessions come from the in-memory catalog
+    cal = catalog()
+    sel_year = st.selectbox("Season", cal.years, index=0)
 
-    # keep only one row per meeting_name (label), keeping the last (i.e. the latest by start)
-    sessions = (
-        sessions
-        .drop_duplicates(subset="label", keep="last")
-        .reset_index(drop=True)
-    )
+    # meetings in calendar order, the season's latest race weekend preselected
+    meetings = cal.meetings(sel_year)
+    meeting = st.selectbox("Grand Prix", meetings,
+                           index=meetings.index(cal.latest_race(sel_year).meeting))
+    names = [s.name for s in cal.sessions(sel_year, meeting)]
+    session_name = st.selectbox("Session", names,
+                                index=names.index(cal.main_session(sel_year, meeting).name))
+    session_id = cal.session_id(sel_year, meeting, session_name)
+    lazy_tabs = st.toggle("Lazy tabs", value=True,
+                          help="Only query and draw the tab you are looking at.")
+    prefetch = st.toggle("Prefetch race data", value=False,
+                         help="Load all race tabs in parallel and warm the "
+                              "neighbouring races in the background.")
+    show_perf = st.toggle("⏱ Performance", value=False,
+                          help="Show where the time of this rerun went.")
 
-    # build the selectbox from the de‑duplicated labels
-    session_label = st.selectbox("Race", sessions["label"], index=len(sessions) - 1)
-    session_id = int(sessions.loc[sessions["label"] == session_label, "session_id"].iat[0])
+if prefetch:
+    # fills the query cache, so the tab loaders below are served from memory;
+    # a failing query is reported by its own tab instead of breaking the page
+    try:
+        with perf.tab("prefetch"):
+            fetch_session_bundle(session_id, neighbours=cal.season(
+                sel_year, cal.by_id[session_id].type))
+    except Exception as e:
+        print(f"⚠️ Prefetch failed: {e}")
 
 
-# ───────────────────────── Tabs ──────────────────────────
-tab_race, tab_lap, tab_stint, tab_pit, tab_sector, tab_season, tab_ai = st.tabs(
-    ["🏁 Race results", "📈 Lap pace", "🛞 Stint cmp.", "🔧 Pit stops",
-     "🚥 Sector bests", "📊 Season view", "🤖 Ask AI"])
+# ───────────────────────── Tab memo ──────────────────────────
+# Results computed for one tab are kept until the session/season changes.
+_selection = (session_id, int(sel_year))
+if st.session_state.get("tab_selection") != _selection:
+    st.session_state.tab_selection = _selection
+    st.session_state.tab_memo = {}
+
+
+def memo(name: str, loader):
+    """Run ``loader()`` once per tab for the current session/season selection."""
+    if name not in st.session_state.tab_memo:
+        with perf.timed("prep"):
+            st.session_state.tab_memo[name] = loader()
+    return st.session_state.tab_memo[name]
+
+
+def chart(fig):
+    """``st.plotly_chart`` with the time spent serialising the figure recorded."""
+    with perf.timed("chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
 
 # 1️⃣  Race results
-with tab_race:
-    df = run_query(
-        "SELECT * FROM v_session_results WHERE session_id = :sid ORDER BY position",
-        sid=session_id
-    )
-    st.dataframe(df, use_container_width=True)
+def load_race():
+    df = run_query(queries.SESSION_RESULTS, sid=session_id)
     fig = px.bar(
         df,
         x="acronym",
@@ -65,41 +111,29 @@ with tab_race:
         color="team_name",
         color_discrete_sequence=["#" + c for c in df.team_colour]
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return df, fig
+
+
+def render_race():
+    df, fig = memo("race", load_race)
+    st.dataframe(df, use_container_width=True)
+    chart(fig)
+
 
 # 2️⃣  Lap pace
-with tab_lap:
-    lap_df = run_query(
-        """
-        SELECT d.full_name, l.lap_number, l.lap_time_s
-        FROM v_lap_detail l JOIN driver d USING (driver_id)
-        WHERE session_id=:sid AND out_lap=0
-        ORDER BY lap_number
-        """,
-        sid=session_id
-    )
-    fig = px.line(lap_df, x="lap_number", y="lap_time_s", color="full_name", markers=True)
-    st.plotly_chart(fig, use_container_width=True)
+def load_lap():
+    lap_df = run_query(queries.LAP_PACE, sid=session_id)
+    return px.line(lap_df, x="lap_number", y="lap_time_s", color="full_name", markers=True,
+                   hover_data=["compound", "tyre_age"])
 
-# 3️⃣  Stint comparison (Best Lap)
-with tab_stint:
-    st.subheader("Best Lap per Stint (analysis.mv_stint_summary)")
-    stint_df = run_query(
-        """
-        SELECT
-            driver_id,
-            full_name,
-            team_name,
-            team_colour,
-            stint_number,
-            compound,
-            best_lap_s
-        FROM analysis.mv_stint_summary
-        WHERE session_id = :sid
-        """,
-        sid=session_id
-    )
-    st.dataframe(stint_df, use_container_width=True)
+
+def render_lap():
+    chart(memo("lap", load_lap))
+
+
+# 3️⃣  Stint comparison (Best Lap, degradation, pace, consistency)
+def load_stint():
+    stint_df = run_query(queries.STINT_SUMMARY, sid=session_id)
     fig = px.bar(
         stint_df,
         x="full_name",
@@ -114,69 +148,203 @@ with tab_stint:
         yaxis_title="Best Lap Time (s)",
         legend_title="Reifencompound"
     )
-    st.plotly_chart(fig, use_container_width=True)
+
+    a = session_analytics(session_id)
+    deg = px.bar(a.stints.dropna(subset=["deg_s_per_lap"]), x="full_name", y="deg_s_per_lap",
+                 color="compound", barmode="group",
+                 hover_data=["stint_number", "lap_start", "lap_end", "valid_laps", "r2"],
+                 labels={"full_name": "Driver", "deg_s_per_lap": "Degradation (s/lap)"},
+                 title="Tyre degradation per stint (fuel-corrected)")
+    pace = px.line(a.laps.dropna(subset=["rolling_s"]), x="lap_number", y="rolling_s",
+                   color="full_name", hover_data=["compound", "tyre_age", "lap_time_s"],
+                   labels={"lap_number": "Lap", "rolling_s": "Fuel-corrected lap time (s)",
+                           "full_name": "Driver"},
+                   title=f"Fuel-corrected pace, rolling median of {ROLLING_LAPS} laps")
+    spread = px.scatter(a.drivers, x="corrected_median_s", y="iqr_s", color="full_name",
+                        hover_data=["valid_laps", "valid_pct", "std_s", "cv_pct"],
+                        labels={"corrected_median_s": "Median fuel-corrected lap (s)",
+                                "iqr_s": "Lap time IQR (s)", "full_name": "Driver"},
+                        title="Pace vs consistency (outliers removed)")
+    return stint_df, fig, a.stints, deg, pace, spread
+
+
+def render_stint():
+    st.subheader("Best Lap per Stint (analysis.mv_stint_summary)")
+    stint_df, fig, stints, deg, pace, spread = memo("stint", load_stint)
+    st.dataframe(stint_df, use_container_width=True)
+    chart(fig)
+    st.subheader("Degradation and pace (lap_analytics)")
+    chart(deg)
+    chart(pace)
+    chart(spread)
+    st.dataframe(stints, use_container_width=True)
+
 
 # 4️⃣  Pit-stop timeline
-with tab_pit:
-    pit_df = run_query(
-        """
-        SELECT *
-        FROM analysis.mv_pit_stop_timeline
-        WHERE session_id = :sid
-        """,
-        sid=session_id
+def load_pit():
+    pit_df = run_query(queries.PIT_STOPS, sid=session_id)
+    if pit_df.empty:
+        return None
+
+    pit_df["start_time"] = pd.to_datetime(pit_df["start_time"])
+    pit_df["end_time"]   = pd.to_datetime(pit_df["end_time"])
+    fig = px.timeline(
+        pit_df,
+        x_start="start_time",
+        x_end="end_time",
+        y="full_name",
+        color="team_name",
+        hover_data=["lap_number", "duration"]
     )
+    fig.update_yaxes(autorange="reversed")
+    return fig
 
-    if pit_df.empty:
+
+def render_pit():
+    fig = memo("pit", load_pit)
+    if fig is None:
         st.info("No pit-stop data for this session.")
     else:
         st.subheader("Pit-stop timeline")
-        pit_df["start_time"] = pd.to_datetime(pit_df["start_time"])
-        pit_df["end_time"]   = pd.to_datetime(pit_df["end_time"])
-        fig = px.timeline(
-            pit_df,
-            x_start="start_time",
-            x_end="end_time",
-            y="full_name",
-            color="team_name",
-            hover_data=["lap_number", "duration"]
-        )
-        fig.update_yaxes(autorange="reversed")
-        st.plotly_chart(fig, use_container_width=True)
+        chart(fig)
+
 
 # 5️⃣  Sector performance
-with tab_sector:
-    sector_df = run_query(
-        "SELECT * FROM analysis.mv_sector_performance WHERE session_id = :sid",
-        sid=session_id
-    )
-    st.subheader("Best sector times")
-    fig = px.bar(
+def load_sector():
+    sector_df = run_query(queries.SECTOR_BESTS, sid=session_id)
+    return px.bar(
         sector_df,
         x="full_name",
         y="best_sector_s",
         color="sector_number",
         barmode="group"
     )
-    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_sector():
+    st.subheader("Best sector times")
+    chart(memo("sector", load_sector))
+
 
 # 6️⃣  Season driver summary
-with tab_season:
-    seas_df = run_query(
-        "SELECT * FROM analysis.mv_driver_summary_season WHERE year = :y",
-        y=int(sel_year)
-    )
-    st.subheader(f"Season {sel_year} points")
+def load_season():
+    seas_df = run_query(queries.SEASON_SUMMARY, y=int(sel_year))
     fig = px.bar(
         seas_df.sort_values("season_points", ascending=False),
         x="full_name",
         y="season_points"
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return seas_df, fig
+
+
+def render_season():
+    st.subheader(f"Season {sel_year} points")
+    seas_df, fig = memo("season", load_season)
+    chart(fig)
     st.dataframe(seas_df, use_container_width=True)
 
-# 7️⃣  Ask AI
-with tab_ai:
+
+# 7️⃣  Track map / telemetry
+def load_track(driver_id: int, lap, points: int, method: str):
+    tel = fetch_telemetry(session_id, driver_id, lap, points=points, method=method)
+    track = px.scatter(tel, x="x", y="y", color="speed",
+                       color_continuous_scale="Turbo", hover_data=["lap_number", "gear"])
+    track.update_traces(marker_size=4)
+    track.update_yaxes(scaleanchor="x", scaleratio=1, visible=False)
+    track.update_xaxes(visible=False)
+    speed = px.line(tel, x="t", y=["speed", "throttle"])
+    return len(tel), track, speed
+
+
+def render_track():
+    drivers = run_query(queries.SESSION_DRIVERS, sid=session_id)
+    if drivers.empty:
+        st.info("No drivers for this session.")
+        return
+
+    c1, c2, c3, c4 = st.columns(4)
+    name = c1.selectbox("Driver", drivers["full_name"])
+    driver_id = int(drivers.loc[drivers["full_name"] == name, "driver_id"].iat[0])
+    laps = run_query(queries.DRIVER_LAPS, sid=session_id, did=driver_id)["lap_number"]
+    lap = c2.selectbox("Lap", [None, *laps.tolist()],
+                       format_func=lambda v: "All laps" if v is None else str(v))
+    points = c3.slider("Point budget", 200, 5000, 1500, step=100)
+    method = c4.selectbox("Downsampling", METHODS)
+
+    n, track, speed = memo(f"track:{driver_id}:{lap}:{points}:{method}",
+                           lambda: load_track(driver_id, lap, points, method))
+    if n == 0:
+        st.info("No telemetry for this driver.")
+        return
+    st.caption(f"{n:,} points after downsampling")
+    chart(track)
+    chart(speed)
+
+
+# 8️⃣  Race trace
+def load_trace():
+    trace = run_query(queries.RACE_TRACE, sid=session_id)
+    if trace.dropna(subset=["position", "gap_to_leader"], how="all").empty:
+        return None
+    gaps = px.line(trace, x="lap_number", y="gap_to_leader", color="full_name",
+                   labels={"gap_to_leader": "Gap to leader (s)"})
+    gaps.update_yaxes(autorange="reversed")
+    positions = px.line(trace, x="lap_number", y="position", color="full_name",
+                        hover_data=["gap_to_next"])
+    positions.update_yaxes(autorange="reversed", dtick=1)
+    return gaps, positions
+
+
+def render_trace():
+    figs = memo("trace", load_trace)
+    if figs is None:
+        st.info("No position or interval data for this session.")
+        return
+    st.subheader("Gap to leader")
+    chart(figs[0])
+    st.subheader("Positions")
+    chart(figs[1])
+
+
+# 9️⃣  Compare races / seasons
+def load_compare(ids: tuple, labels: dict):
+    cmp = compare_races(ids)
+    pace = pace_matrix(cmp.laps, labels)
+    heat = px.imshow(pace, aspect="auto", color_continuous_scale="RdYlGn_r",
+                     labels={"color": "Δ to session best (%)", "x": "", "y": ""})
+    stints = px.box(cmp.stints, x="compound", y="best_delta_pct", color="compound",
+                    points="all", hover_data=["full_name", "session_id", "stint_number"],
+                    labels={"best_delta_pct": "Best stint lap, Δ to session best (%)"})
+    points = points_table(cmp.results, labels) if not cmp.results.empty else None
+    return heat, stints, points
+
+
+def render_compare():
+    c1, c2 = st.columns([1, 3])
+    years = c1.multiselect("Seasons", list(cal.years), default=[int(sel_year)])
+    races = season_races(years) if years else pd.DataFrame(columns=["session_id", "label"])
+    picked = c2.multiselect("Races (empty = all of the selected seasons)", races["label"])
+    if picked:
+        races = races[races["label"].isin(picked)]
+    if races.empty:
+        st.info("Pick at least one season or race.")
+        return
+
+    labels = dict(zip(races["session_id"].astype(int), races["label"]))
+    ids = tuple(sorted(labels))
+    heat, stints, points = memo(f"compare:{ids}", lambda: load_compare(ids, labels))
+    st.caption(f"{len(ids)} race(s), one query per dataset")
+    st.subheader("Median lap, Δ to the session's fastest lap")
+    chart(heat)
+    st.subheader("Stints by compound")
+    chart(stints)
+    if points is not None:
+        st.subheader("Points over the selection")
+        st.dataframe(points, use_container_width=True)
+
+
+# 🔟  Ask AI
+def render_ai():
     if "ai_history" not in st.session_state:
         st.session_state.ai_history = []
     if "manual_sql" not in st.session_state:
@@ -185,24 +353,48 @@ with tab_ai:
         st.session_state.sql_df = None
     if "sql_error" not in st.session_state:
         st.session_state.sql_error = None
+    if "sql_stream" not in st.session_state:
+        st.session_state.sql_stream = None
+    if "sql_csv" not in st.session_state:
+        st.session_state.sql_csv = None
+    if "sql_guard" not in st.session_state:
+        st.session_state.sql_guard = None
 
+    history = list(st.session_state.ai_history)   # a question answered live in this run is not repeated
     if not os.getenv("GEMINI_API_KEY"):
         st.info("Set GEMINI_API_KEY to enable AI queries.")
     else:
         q = st.text_input("Ask something about the F1 data")
         if st.button("Run AI query") and q:
-            with st.spinner("Gemini Flash is thinking…"):
-                res = ask(q, session_id)
+            # a newer question cancels whatever the previous run is still doing
+            if st.session_state.get("ai_cancel") is not None:
+                st.session_state.ai_cancel.set()
+            st.session_state.ai_cancel = threading.Event()
+            res = _ask_live(q, st.session_state.ai_cancel)
             st.session_state.ai_history.append((q, res))
             if res.get("sql"):
+                _reset_sql_stream()
                 st.session_state.manual_sql = res["sql"]
                 st.session_state.sql_df = res["df"]
                 st.session_state.sql_error = res["error"]
 
-    for i, (query, res) in enumerate(reversed(st.session_state.ai_history), 1):
+    for i, (query, res) in enumerate(reversed(history), 1):
         with st.expander(f"🧠 {i}. {query}", expanded=False):
             st.markdown("#### 📝 Raw Gemini response")
             st.code(res["raw"], language="text")
+            stats = res.get("stats")
+            if stats and stats.get("cached"):
+                st.caption("⚡ SQL served from the translation cache")
+            elif stats:
+                st.caption(
+                    f"Prompt ≈{stats['prompt_tokens']:,} tokens, schema "
+                    f"{stats['schema_tokens']:,}/{stats['full_schema_tokens']:,} tokens "
+                    f"(−{stats['reduction']:.0%}, {', '.join(stats['tables'])}) · "
+                    f"model {stats['latency_s']:.1f}s"
+                )
+
+            if res.get("guard"):
+                _guard_caption(res["guard"])
 
             if res["error"]:
                 st.error(f"⚠️ {res['error']}")
@@ -216,19 +408,175 @@ with tab_ai:
 
             st.markdown("#### 📊 Result data")
             st.dataframe(res["df"], use_container_width=True)
+            if res.get("truncated"):
+                st.caption("Only the first rows are shown – run it below to page through the rest.")
 
     st.markdown("### 🔍 Run custom SQL")
     st.text_area("SQL query", key="manual_sql", height=150)
     if st.button("Execute SQL") and st.session_state.manual_sql.strip():
+        _reset_sql_stream()
         with st.spinner("Running SQL…"):
             try:
-                st.session_state.sql_df = run_query(st.session_state.manual_sql)
+                guard = guard_sql(st.session_state.manual_sql)
+                st.session_state.sql_guard = guard
+                if not guard.allowed:
+                    raise ValueError(guard.reason)
+                # streamed: only the first page is fetched now
+                stream = QueryStream(guard.sql, timeout_ms=guard.timeout_ms)
+                st.session_state.sql_stream = stream
+                st.session_state.sql_df = stream.next_page()
                 st.session_state.sql_error = None
             except Exception as e:
                 st.session_state.sql_df = None
                 st.session_state.sql_error = str(e)
 
+    if st.session_state.sql_guard is not None:
+        _guard_caption(st.session_state.sql_guard)
     if st.session_state.sql_error:
         st.error(st.session_state.sql_error)
     if st.session_state.sql_df is not None:
         st.dataframe(st.session_state.sql_df, use_container_width=True)
+        _render_sql_paging()
+
+
+def _reset_sql_stream():
+    """Release the previous streamed query (and its pooled connection)."""
+    if st.session_state.sql_stream is not None:
+        st.session_state.sql_stream.close()
+    st.session_state.sql_stream = None
+    st.session_state.sql_csv = None
+    st.session_state.sql_guard = None
+
+
+def _ask_live(q, cancel):
+    """Render SQL, data and the streamed summary as each becomes available."""
+    from ai_sql import ask_stream      # the AI stack is only loaded once it is used
+
+    with st.container(border=True):
+        st.markdown(f"**🧠 {q}**")
+        status = st.empty()
+        sql_box, answer_box, data_box = st.empty(), st.empty(), st.empty()
+        status.caption("✍️ Gemini Flash is writing SQL…")
+        answer = ""
+        for kind, payload in ask_stream(q, session_id, cancel=cancel):
+            if kind == "sql":
+                sql_box.code(payload["sql"], language="sql")
+                status.caption("🧮 Checking the query plan…")
+            elif kind == "guard":
+                sql_box.code(payload.sql, language="sql")
+                status.caption("🏃 Running the query…")
+            elif kind == "data":
+                with data_box.container():
+                    st.dataframe(payload["df"], use_container_width=True)
+                    if payload["truncated"]:
+                        st.caption("Only the first rows are shown – run it below "
+                                   "to page through the rest.")
+                status.caption("🗒️ Summarising…")
+            elif kind == "answer":
+                answer += payload
+                answer_box.success(answer)
+            elif kind == "done":
+                status.empty()
+                if payload["error"]:
+                    st.error(f"⚠️ {payload['error']}")
+                return payload
+
+
+def _guard_caption(guard):
+    note = f"🧮 Estimated cost {guard.original_cost:,.0f}, ≈{guard.original_rows:,} rows"
+    if guard.rewrites:
+        note += f" → rewritten ({', '.join(guard.rewrites)}): cost {guard.cost:,.0f}"
+    st.caption(note + f" · timeout {guard.timeout_ms / 1000:.0f}s")
+
+
+def _render_sql_paging():
+    stream = st.session_state.sql_stream
+    if stream is None:
+        return
+
+    note = f"{stream.rows:,} rows loaded"
+    if stream.truncated:
+        note += f" – stopped at the row/size limit ({stream.max_rows:,} rows)"
+    elif stream.expired:
+        note += " – released after being idle, run the query again for more"
+    elif not stream.done:
+        note += " – more available"
+    st.caption(note)
+
+    if not stream.done:
+        c1, c2 = st.columns(2)
+        if c1.button("Load more rows"):
+            st.session_state.sql_df = pd.concat(
+                [st.session_state.sql_df, stream.next_page()], ignore_index=True)
+            st.rerun()
+        if c2.button("Prepare CSV of all rows"):
+            # spool the remaining pages to disk instead of holding them in memory
+            with st.spinner("Fetching remaining rows…"), \
+                    tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+                st.session_state.sql_df.to_csv(f, index=False)
+                for page in stream:
+                    page.to_csv(f, index=False, header=False)
+            st.session_state.sql_csv = f.name
+            st.rerun()
+
+    if st.session_state.sql_csv:
+        with open(st.session_state.sql_csv, "rb") as f:
+            st.download_button("⬇️ Download CSV", f, file_name="query.csv", mime="text/csv")
+
+
+# ───────────────────────── Tabs ──────────────────────────
+TABS = {
+    "🏁 Race results": render_race,
+    "📈 Lap pace":     render_lap,
+    "🛞 Stint cmp.":   render_stint,
+    "🔧 Pit stops":    render_pit,
+    "🚥 Sector bests": render_sector,
+    "📊 Season view":  render_season,
+    "🗺️ Track map":    render_track,
+    "📉 Race trace":   render_trace,
+    "⚖️ Compare":      render_compare,
+    "🤖 Ask AI":       render_ai,
+}
+
+if lazy_tabs:
+    # st.tabs runs every tab body; a radio only runs the selected one
+    active = st.radio("View", list(TABS), horizontal=True,
+                      key="active_tab", label_visibility="collapsed")
+    with perf.tab(active), perf.timed("total"):
+        TABS[active]()
+else:
+    for tab, (label, render) in zip(st.tabs(list(TABS)), TABS.items()):
+        with tab, perf.tab(label), perf.timed("total"):
+            render()
+
+
+# ───────────────────────── Performance ──────────────────────────
+def render_perf(run: int):
+    ev = perf.RECORDER.run_events(run)
+    with st.sidebar.expander("⏱ Performance", expanded=True):
+        if ev.empty:
+            st.caption("Nothing was measured in this rerun.")
+            return
+        db = ev[ev["kind"] != "stage"]
+        st.caption(f"{len(db)} queries · {db['seconds'].sum() * 1000:,.0f} ms · "
+                   f"{db['rows'].sum():,} rows · {db['bytes'].sum() / 1e6:,.1f} MB")
+
+        # per tab: database/snapshot time, DataFrame prep (includes its queries),
+        # chart serialisation and the whole tab
+        ev["what"] = ev["kind"].where(ev["kind"] != "stage", ev["name"])
+        per_tab = ev.pivot_table(index="tab", columns="what", values="seconds",
+                                 aggfunc="sum", fill_value=0) * 1000
+        st.markdown("**ms per tab**")
+        st.dataframe(per_tab.round(1), use_container_width=True)
+
+        if not db.empty:
+            st.markdown("**Slowest queries**")
+            slow = db.nlargest(10, "seconds")[["tab", "name", "seconds", "rows", "bytes"]]
+            slow["seconds"] = (slow["seconds"] * 1000).round(1)
+            st.dataframe(slow.rename(columns={"name": "relation", "seconds": "ms"}),
+                         use_container_width=True, hide_index=True)
+
+
+if show_perf:
+    render_perf(_run)
+perf.export(_run)
@@ -0,0 +1 @@
+"""Benchmarks that run against throwaway Postgres databases (see bench_views.py)."""
@@ -0,0 +1,159 @@
+"""
+Micro-benchmark of ``lap_analytics`` from one race to several seasons.
+
+    python -m benchmarks.bench_lap_analytics
+    python -m benchmarks.bench_lap_analytics --races 1 22 110 --drivers 20
+
+Builds the rows of ``queries.STINT_LAPS`` in memory with the lap generator of
+``benchmarks/synthetic.py`` (tyre degradation per compound, fuel burn, pit
+stops) – no database needed – and times ``lap_analytics.analyse`` against a
+straightforward loop over drivers and stints computing the same statistics.
+Reports laps/s of both, checks that they agree and how close the fitted
+degradation comes to the generator's, and that a lap outside any stint is
+skipped.  Exits 1 when a check fails.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import lap_analytics as la
+from benchmarks.synthetic import COMPOUNDS, _laps, _Track
+
+
+def season_laps(races: int, drivers: int = 20, seed: int = 0) -> pd.DataFrame:
+    """``races`` synthetic races as ``queries.STINT_LAPS`` rows, plus ``true_deg``."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for sid in range(1, races + 1):
+        track = _Track(rng)
+        n = track.laps
+        times, stints, pits, out_laps = _laps(rng, track, n, drivers, race=True)
+        lap_no = np.tile(np.arange(1, n + 1), drivers)
+        driver = np.repeat(np.arange(1, drivers + 1), n)
+        st = pd.DataFrame(stints, columns=["d", "stint_number", "compound", "a", "b", "age0"])
+        # the stint of every lap: stints are contiguous and in order per driver
+        per_lap = st.loc[st.index.repeat(st["b"] - st["a"] + 1)].reset_index(drop=True)
+        pit = np.zeros((drivers, n), dtype=bool)
+        for d, lap, _ in pits:
+            pit[d, lap - 1] = True
+        frames.append(pd.DataFrame({
+            "session_id": sid,
+            "driver_id": driver,
+            "full_name": pd.Categorical([f"Driver {d}" for d in driver]),
+            "team_colour": "1E5BC6",
+            "lap_number": lap_no,
+            "lap_time_s": times.ravel().round(3),
+            "stint_number": per_lap["stint_number"].to_numpy(),
+            "compound": per_lap["compound"].to_numpy(),
+            "tyre_age": (per_lap["age0"] + lap_no - per_lap["a"]).to_numpy(),
+            "clean": (lap_no > 1) & (out_laps.ravel() == 0) & ~pit.ravel(),
+            "session_type": "Race",
+            "true_deg": per_lap["compound"].map(COMPOUNDS).to_numpy(),
+        }))
+    laps = pd.concat(frames, ignore_index=True)
+    return laps.astype({"compound": "category", "session_type": "category"})
+
+
+def loop_analyse(laps: pd.DataFrame) -> tuple[dict, dict]:
+    """The same statistics one driver and stint at a time: (stints, drivers)."""
+    stints, drivers = {}, {}
+    for (sid, did), d in laps.groupby(la.DRIVER):
+        d = d.sort_values("lap_number")
+        t = d["lap_time_s"].to_numpy(float)
+        lap = d["lap_number"].to_numpy()
+        to_go = laps.loc[laps["session_id"] == sid, "lap_number"].max() - lap
+        race = (d["session_type"].astype(str) == "Race").to_numpy()
+        corr = t - np.where(race, la.FUEL_S_PER_LAP * to_go, 0.0)
+        valid = np.zeros(len(d), dtype=bool)
+        for stint in d["stint_number"].dropna().unique():
+            idx = np.flatnonzero((d["stint_number"] == stint).to_numpy())
+            clean = idx[d["clean"].to_numpy()[idx]]
+            if len(clean) == 0:
+                continue
+            dev = np.abs(corr[clean] - np.median(corr[clean]))
+            scale = max(1.4826 * np.median(dev), la._MAD_FLOOR_S)
+            valid[clean[dev <= la.OUTLIER_MAD * scale]] = True
+            ok = idx[valid[idx] & d["tyre_age"].notna().to_numpy()[idx]]
+            x = d["tyre_age"].to_numpy(float)[ok]
+            slope = np.nan
+            if len(ok) >= la.MIN_STINT_LAPS and np.ptp(x) > 0:
+                slope = np.polyfit(x, corr[ok], 1)[0]
+            stints[(sid, did, stint)] = slope
+        v = corr[valid]
+        if len(v):
+            drivers[(sid, did)] = (np.median(v), np.percentile(v, 75) - np.percentile(v, 25))
+    return stints, drivers
+
+
+def agree(result: la.LapAnalytics, stints: dict, drivers: dict) -> bool:
+    got = result.stints.set_index(la.STINT)["deg_s_per_lap"]
+    want = pd.Series(stints).rename_axis(la.STINT)
+    got_d = result.drivers.set_index(la.DRIVER)[["corrected_median_s", "iqr_s"]]
+    want_d = pd.DataFrame.from_dict(drivers, orient="index",
+                                    columns=["corrected_median_s", "iqr_s"])
+    want_d.index = pd.MultiIndex.from_tuples(want_d.index, names=la.DRIVER)
+    return (got.reindex(want.index).fillna(-1).round(9).equals(want.fillna(-1).round(9))
+            and np.allclose(got_d.reindex(want_d.index), want_d))
+
+
+def stintless_ok() -> bool:
+    """A lap outside any stint (NULL stint_number in mv_lap_detail) is skipped, not fatal."""
+    laps = season_laps(1, drivers=2)
+    laps.loc[5, ["stint_number", "tyre_age"]] = np.nan
+    result = la.analyse(laps)
+    orphan = result.laps[result.laps["stint_number"].isna()]
+    return len(orphan) == 1 and not orphan["valid"].any() \
+        and result.stints["stint_number"].notna().all()
+
+
+def best_of(fn, repeat: int) -> tuple[float, object]:
+    runs, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - t0)
+    return min(runs), out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the lap analytics against a loop.")
+    ap.add_argument("--races", type=int, nargs="+", default=[1, 22, 110])
+    ap.add_argument("--drivers", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--loop-max-races", type=int, default=22,
+                    help="skip the (slow) loop above this many races")
+    args = ap.parse_args(argv)
+
+    failures = []
+    if not stintless_ok():
+        failures.append("a lap without a stint")
+    print(f"{'races':>6}{'laps':>10}{'analyse ms':>12}{'laps/s':>12}"
+          f"{'loop ms':>10}{'×':>7}{'|deg err| s/lap':>17}")
+    for races in args.races:
+        laps = season_laps(races, args.drivers)
+        t_vec, result = best_of(lambda: la.analyse(laps), args.repeat)
+        fitted = result.stints.merge(
+            laps.groupby(la.STINT)["true_deg"].first().reset_index(), on=la.STINT)
+        err = statistics.median((fitted["deg_s_per_lap"] - fitted["true_deg"]).abs().dropna())
+        loop_ms = ratio = "-"
+        if races <= args.loop_max_races:
+            t_loop, (stints, drivers) = best_of(lambda: loop_analyse(laps), 1)
+            loop_ms, ratio = f"{t_loop * 1000:.0f}", f"{t_loop / t_vec:.0f}"
+            if not agree(result, stints, drivers):
+                failures.append(races)
+        print(f"{races:>6}{len(laps):>10,}{t_vec * 1000:>12.1f}{len(laps) / t_vec:>12,.0f}"
+              f"{loop_ms:>10}{ratio:>7}{err:>17.4f}")
+    for what in failures:
+        print(f"❌ {what}: analyse and the loop disagree" if isinstance(what, int)
+              else f"❌ {what} broke analyse")
+    if not failures:
+        print("✅ analyse matches the loop")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
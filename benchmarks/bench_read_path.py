@@ -0,0 +1,149 @@
+"""
+Compare the two read paths of ``db``: ``pd.read_sql`` and ``COPY`` + Arrow.
+
+    python -m benchmarks.bench_read_path
+    python -m benchmarks.bench_read_path --database f1_bench_x4 --only season
+
+Reads every SQL constant in ``queries.py`` plus race- and season-wide scans of
+the widest views with both paths, after checking that both return the same
+frame.  Each path reads in a fresh Python process whose peak RSS (``VmHWM``,
+so Linux only) above its RSS before the first read is reported.  A read the
+kernel kills for lack of memory is reported as such.
+
+Runs against the dashboard database (``PG*``), or with ``--database`` against
+a database on the benchmark server (``BENCH_PG*``).  Exits 1 when the paths
+disagree.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+import db
+from benchmarks.bench_views import dashboard_on, dashboard_queries, sample_params
+
+READERS = {"read_sql": db._read_sql, "copy": db.read_copy}
+
+WIDE = {
+    "track_projection (race)": """
+        SELECT * FROM analysis.mv_track_projection WHERE session_id = :sid""",
+    "track_projection (season)": """
+        SELECT tp.* FROM analysis.mv_track_projection tp
+        JOIN session s USING (session_id) JOIN meeting m USING (meeting_id)
+        WHERE m.year = :y""",
+    "lap_detail (season)": """
+        SELECT ld.* FROM analysis.mv_lap_detail ld
+        JOIN session s USING (session_id) JOIN meeting m USING (meeting_id)
+        WHERE m.year = :y""",
+}
+
+
+def workloads() -> dict[str, str]:
+    return {**dashboard_queries(), **WIDE}
+
+
+def _comparable(df: pd.DataFrame) -> pd.DataFrame:
+    """Undo the representation differences: categoricals and Decimal numerics."""
+    df = df.copy()
+    for c in range(df.shape[1]):
+        col = df.iloc[:, c]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            df.isetitem(c, col.astype(col.cat.categories.dtype))
+        elif col.dtype == object and (col.isna().all()      # all-NULL numeric: None vs NaN
+                                      or type(col.dropna().iat[0]).__name__ == "Decimal"):
+            df.isetitem(c, col.astype(float))
+    return df
+
+
+def _status_mb(field: str) -> float:
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    df = _comparable(df)
+    return f"{list(df.columns)} {int(pd.util.hash_pandas_object(df, index=False).sum())}"
+
+
+def worker(path: str, name: str, params: dict, repeat: int) -> dict:
+    """Time ``repeat`` reads in this process and report its peak RSS over them."""
+    read, sql = READERS[path], workloads()[name]
+    before = _status_mb("VmRSS")
+    times = []
+    for _ in range(repeat):
+        df = None                       # free the previous frame before reading again
+        t0 = time.perf_counter()
+        df = read(sql, params)
+        times.append(time.perf_counter() - t0)
+    peak = _status_mb("VmHWM")
+    return {"rows": len(df), "seconds": statistics.median(times),
+            "frame_mb": df.memory_usage(deep=True).sum() / 2**20,
+            "peak_mb": peak - before, "fingerprint": fingerprint(df)}
+
+
+def run_worker(path: str, name: str, params: dict, repeat: int) -> Optional[dict]:
+    """``worker`` in a fresh process; None when it was killed (out of memory)."""
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_read_path", "--worker", path, name,
+         "--params", json.dumps(params), "--repeat", str(repeat)],
+        capture_output=True, text=True)
+    if out.returncode < 0:
+        return None
+    out.check_returncode()
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def _speed(res: Optional[dict]) -> str:
+    return f"{res['rows'] / res['seconds']:,.0f}" if res else "killed"
+
+
+def _peak(res: Optional[dict]) -> str:
+    return f"{res['peak_mb']:.1f}" if res else "-"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark pd.read_sql against COPY + Arrow.")
+    ap.add_argument("--database", help="database on the benchmark server (default: PG*)")
+    ap.add_argument("--only", nargs="+", default=[], help="workloads whose name contains …")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--worker", nargs=2, metavar=("PATH", "NAME"), help=argparse.SUPPRESS)
+    ap.add_argument("--params", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(*args.worker, json.loads(args.params), args.repeat)))
+        return 0
+
+    failures = []
+    with dashboard_on(args.database) if args.database else nullcontext():
+        params = sample_params(db._engine())
+        names = [n for n in workloads() if not args.only or any(o in n for o in args.only)]
+        print(f"{'query':<28}{'rows':>10}{'read_sql rows/s':>17}{'copy rows/s':>14}"
+              f"{'×':>6}{'read_sql MB':>13}{'copy MB':>9}{'frame MB':>10}")
+        for name in names:
+            a, b = (run_worker(p, name, params, args.repeat) for p in READERS)
+            if a and b and a["fingerprint"] != b["fingerprint"]:
+                failures.append(name)
+            rows = (a or b or {"rows": 0})["rows"]
+            ratio = f"{a['seconds'] / b['seconds']:.1f}" if a and b else "-"
+            frame = f"{b['frame_mb']:.1f}" if b else "-"
+            print(f"{name:<28}{rows:>10,}{_speed(a):>17}{_speed(b):>14}{ratio:>6}"
+                  f"{_peak(a):>13}{_peak(b):>9}{frame:>10}")
+    for name in failures:
+        print(f"❌ {name}: read_sql and COPY returned different frames")
+    if not failures:
+        print("✅ both read paths return the same frames")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
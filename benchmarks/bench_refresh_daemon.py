@@ -0,0 +1,106 @@
+"""
+Check the refresh daemon end to end and time ingestion-to-view latency.
+
+    python -m benchmarks.bench_refresh_daemon
+
+Builds a small synthetic ``f1_bench_daemon`` database with the change
+triggers installed.  For each feed (``poll`` and ``notify``) it then
+
+* inserts one pit stop and waits for the daemon's refresh – only the views
+  reading ``pit_stop`` may be refreshed, and the new stop must be visible in
+  ``analysis.mv_pit_stop_timeline``;
+* writes a burst of lap updates spread over a second – they must be refreshed
+  in a single cycle.
+
+Exits 1 when a check fails.
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+
+import refresh_daemon
+import refresh_views
+from benchmarks import scratch
+from benchmarks.bench_views import dashboard_on
+
+INSERT_PIT = """
+INSERT INTO pit_stop (time, driver_id, session_id, duration, lap_number)
+SELECT max(time) + interval '1 second', driver_id, session_id, 23.4, 1
+FROM pit_stop
+WHERE session_id = :sid AND driver_id = :did
+GROUP BY driver_id, session_id
+RETURNING time
+"""
+
+
+def check_feed(engine, mode: str, quiet: float, burst: int) -> list[str]:
+    failures = []
+    if mode == "poll":
+        time.sleep(2)          # earlier writes reach pg_stat_user_tables with a delay
+    feed = refresh_daemon.open_feed(mode, interval=0.5)
+    gen = refresh_daemon.cycles(feed, quiet_s=quiet, max_delay_s=30)
+    try:
+        with engine.begin() as con:
+            sid, did = con.execute(text(
+                "SELECT session_id, driver_id FROM pit_stop LIMIT 1")).one()
+            t0 = time.perf_counter()
+            when = con.execute(text(INSERT_PIT), {"sid": sid, "did": did}).scalar()
+        tables, stats = next(gen)
+        latency = time.perf_counter() - t0
+        views = [s.view for s in stats]
+        expected = refresh_views.affected_views(["pit_stop"])
+        print(f"⏱ {mode:<6} pit stop visible after {latency:.2f}s "
+              f"(quiet {quiet}s), refreshed {', '.join(views)}")
+        if set(views) != set(expected):
+            failures.append(f"{mode}: refreshed {views}, expected {expected}")
+        with engine.connect() as con:
+            seen = con.execute(text(
+                "SELECT count(*) FROM analysis.mv_pit_stop_timeline "
+                "WHERE session_id = :sid AND driver_id = :did AND time = :t"),
+                {"sid": sid, "did": did, "t": when}).scalar()
+        if not seen:
+            failures.append(f"{mode}: new pit stop missing from mv_pit_stop_timeline")
+
+        for _ in range(burst):
+            with engine.begin() as con:
+                con.execute(text("UPDATE lap SET duration = duration WHERE lap_id = "
+                                 "(SELECT min(lap_id) FROM lap)"))
+            time.sleep(1.0 / burst)
+        tables, stats = next(gen)
+        print(f"⏱ {mode:<6} burst of {burst} writes → one refresh of "
+              f"{len(stats)} view(s) for {', '.join(sorted(tables))}")
+        if tables != {"lap"}:
+            failures.append(f"{mode}: burst reported {tables}, expected only lap")
+    finally:
+        gen.close()
+        feed.close()
+    return failures
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Check the refresh daemon on a scratch database.")
+    ap.add_argument("--quiet", type=float, default=0.5, help="debounce window (s)")
+    ap.add_argument("--burst", type=int, default=10, help="writes in the burst test")
+    ap.add_argument("--keep", action="store_true", help="keep the scratch database")
+    args = ap.parse_args(argv)
+
+    name = "daemon"
+    failures = []
+    with scratch.scratch_database(name, keep=args.keep) as engine:
+        scratch.SEEDERS["synthetic"](engine, meetings=1, hz=0.5)
+        with dashboard_on(scratch.PREFIX + name):
+            refresh_daemon.install()
+            refresh_views.refresh_all()
+            for mode in ("poll", "notify"):
+                failures += check_feed(engine, mode, args.quiet, args.burst)
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print("✅ refresh daemon checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Track the dashboard's cold start: import times and time to first render.
+
+    python -m benchmarks.bench_startup --save-baseline
+    python -m benchmarks.bench_startup             # compare with the baseline
+
+Every measurement runs in a fresh Python process:
+
+* the import time of each heavy module the app (or the Ask-AI tab) pulls in;
+* the first run of ``app.py`` under Streamlit's ``AppTest`` – imports, tunnel,
+  sidebar and the default tab – with and without ``warmup`` (``F1_WARMUP``),
+  plus one rerun.
+
+``--latency-ms`` routes the database connection through
+``benchmarks/loopback_ssh.py`` with that delay per hop, as a stand-in for the
+SSH tunnel.  The first render must not import the Gemini SDK.  Timings more than
+``--threshold`` (and ``--min-ms``) slower than the baseline are flagged; the
+exit status is then 1.
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+APP = HERE.parent / "app.py"
+BASELINE = HERE / "startup_baseline.json"
+
+MODULES = ["pandas", "sqlalchemy", "pyarrow", "plotly.express", "streamlit",
+           "db", "ai_sql", "google.generativeai"]
+AI_SDK = "google.generativeai"
+
+
+def child_import(module: str) -> dict:
+    t0 = time.perf_counter()
+    importlib.import_module(module)
+    return {"seconds": time.perf_counter() - t0}
+
+
+def child_render() -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    t0 = time.perf_counter()
+    at = AppTest.from_file(str(APP), default_timeout=120).run()
+    first = time.perf_counter() - t0
+    ai_loaded = AI_SDK in sys.modules
+    t0 = time.perf_counter()
+    at.run()
+    return {"first_s": first, "rerun_s": time.perf_counter() - t0, "ai_loaded": ai_loaded,
+            "errors": [e.value for e in at.exception]}
+
+
+def run_child(*args: str, env: dict = None) -> dict:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child", *args],
+                         capture_output=True, text=True, check=True, cwd=HERE.parent,
+                         env={**os.environ, **(env or {})})
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+@contextmanager
+def slow_link(latency_ms: float):
+    """Point ``PGHOST``/``PGPORT`` at a loopback forwarder delaying each hop."""
+    from benchmarks.bench_tunnel import free_port
+    from ssh_tunnel import is_port_in_use
+
+    saved = {k: os.environ.get(k) for k in ("PGHOST", "PGPORT")}
+    port = free_port()
+    link = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.loopback_ssh",
+         "-L", f"{port}:{saved['PGHOST'] or 'localhost'}:{saved['PGPORT'] or 5432}"],
+        cwd=HERE.parent, env={**os.environ, "LOOPBACK_DELAY_MS": str(latency_ms)})
+    try:
+        while not is_port_in_use(port):
+            time.sleep(0.05)
+        os.environ.update(PGHOST="localhost", PGPORT=str(port))
+        yield
+    finally:
+        link.terminate()
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def measure(repeat: int) -> tuple[dict, list[str]]:
+    """Median milliseconds per metric, and the problems found on the way."""
+    metrics, problems = {}, []
+    for module in MODULES:
+        try:
+            runs = [run_child("import", module)["seconds"] for _ in range(repeat)]
+        except subprocess.CalledProcessError:
+            print(f"⚠️ {module} is not installed")
+            continue
+        metrics[f"import/{module}"] = statistics.median(runs) * 1000
+
+    for warm in ("on", "off"):
+        runs = [run_child("render", env={"F1_WARMUP": warm}) for _ in range(repeat)]
+        suffix = "" if warm == "on" else "_no_warmup"
+        metrics[f"render/first{suffix}"] = statistics.median(r["first_s"] for r in runs) * 1000
+        metrics[f"render/rerun{suffix}"] = statistics.median(r["rerun_s"] for r in runs) * 1000
+        if any(r["ai_loaded"] for r in runs):
+            problems.append(f"the first render imported {AI_SDK}")
+        for err in {e for r in runs for e in r["errors"]}:
+            problems.append(f"the first render raised: {err[:200]}")
+    return metrics, problems
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark import times and time to first render.")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--latency-ms", type=float, default=0.0,
+                    help="delay per hop between the app and the database")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.25, help="relative slowdown")
+    ap.add_argument("--min-ms", type=float, default=50.0, help="ignore smaller slowdowns")
+    ap.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        kind, *rest = args.child
+        print(json.dumps(child_import(*rest) if kind == "import" else child_render()))
+        return 0
+
+    if args.latency_ms:
+        with slow_link(args.latency_ms):
+            metrics, problems = measure(args.repeat)
+    else:
+        metrics, problems = measure(args.repeat)
+    baseline = (json.loads(args.baseline.read_text())
+                if args.baseline.exists() and not args.save_baseline else {})
+    if baseline and baseline.get("latency_ms") != args.latency_ms:
+        print(f"⚠️ baseline was recorded with --latency-ms {baseline.get('latency_ms')}")
+    regressions = []
+    for metric, ms in metrics.items():
+        was = baseline.get("metrics", {}).get(metric)
+        note = ""
+        if was:
+            change = (ms - was) / was
+            note = f"(was {was:.0f}, {change:+.0%})"
+            if ms - was > args.min_ms and change > args.threshold:
+                regressions.append(metric)
+                note = "🔺 " + note
+        print(f"⏱ {metric:<32} {ms:8.0f} ms  {note}")
+
+    for p in problems:
+        print(f"❌ {p}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({"latency_ms": args.latency_ms,
+                                             "metrics": metrics}, indent=2))
+        print(f"📌 baseline saved to {args.baseline}")
+    elif not baseline:
+        print("ℹ️ no baseline yet – run with --save-baseline to record one")
+    elif regressions:
+        print(f"❌ {len(regressions)} regression(s) against {args.baseline}")
+    else:
+        print(f"✅ no regressions against {args.baseline}")
+    return 1 if problems or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
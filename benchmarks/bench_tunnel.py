@@ -0,0 +1,116 @@
+"""
+Time the SSH tunnel's cold start and its recovery after the ssh process dies.
+
+    python -m benchmarks.bench_tunnel                              # loopback stand-in
+    python -m benchmarks.bench_tunnel --ssh ssh --host localhost   # a real sshd
+
+Forwards a free local port to the benchmark server (``BENCH_PG*``) through
+``ssh_tunnel.TunnelManager`` with ``db.warm_pool`` as its ``on_up`` callback,
+points ``db`` at the tunnel and measures
+
+* cold start: until the port is forwarded, and until the first query returns;
+* recovery, ``--kills`` times: the ssh process is SIGKILLed and queries are
+  retried until one succeeds again through a fresh tunnel and pool.
+
+Exits 1 when a recovery takes longer than ``--check`` + ``--connect-timeout``.
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import db
+import ssh_tunnel
+from benchmarks import scratch
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def query_ok() -> bool:
+    try:
+        db.run_query("SELECT 1 AS ok", cache=False)
+    except Exception:
+        return False
+    return True
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Measure tunnel cold start and recovery.")
+    ap.add_argument("--ssh", default=f"{sys.executable} -m benchmarks.loopback_ssh",
+                    help="ssh command (default: the loopback stand-in)")
+    ap.add_argument("--host", default="localhost", help="SSH server")
+    ap.add_argument("--user", default=None)
+    ap.add_argument("--kills", type=int, default=5)
+    ap.add_argument("--check", type=float, default=0.5, help="watchdog interval (s)")
+    ap.add_argument("--connect-timeout", type=float, default=10)
+    args = ap.parse_args(argv)
+
+    server = scratch.server()
+    port = free_port()
+    warmed = threading.Event()
+
+    def on_up():
+        db.warm_pool()
+        warmed.set()
+
+    os.environ.update(PGHOST="localhost", PGPORT=str(port), PGUSER=server["user"],
+                      PGPASSWORD=server["password"],
+                      PGDATABASE=os.getenv("PGDATABASE", "postgres"))
+    db._engine.cache_clear()
+    tunnel = ssh_tunnel.TunnelManager(
+        port, host=args.host, user=args.user, remote_host=server["host"],
+        remote_port=int(server["port"]), ssh=args.ssh, check_s=args.check,
+        connect_timeout_s=args.connect_timeout, on_up=[on_up])
+
+    failures = []
+    try:
+        t0 = time.perf_counter()
+        tunnel.start()
+        up = time.perf_counter() - t0
+        warmed.wait(args.connect_timeout)
+        first_ok = query_ok()
+        first = time.perf_counter() - t0
+        print(f"⏱ cold start: tunnel up {up:.2f}s, first query {first:.2f}s "
+              f"({'ok' if first_ok else 'failed'})")
+        if not first_ok:
+            failures.append("first query failed")
+
+        limit = args.check + args.connect_timeout
+        recoveries = []
+        for i in range(args.kills):
+            warmed.clear()
+            os.kill(tunnel.pid, signal.SIGKILL)
+            t0 = time.perf_counter()
+            while not query_ok() and time.perf_counter() - t0 < limit:
+                time.sleep(0.02)
+            took = time.perf_counter() - t0
+            warmed.wait(args.connect_timeout)       # let the pool refill before the next kill
+            recoveries.append(took)
+            if took >= limit:
+                failures.append(f"recovery {i + 1} took {took:.2f}s")
+        print(f"⏱ recovery after kill ×{len(recoveries)}: median "
+              f"{statistics.median(recoveries):.2f}s, max {max(recoveries):.2f}s "
+              f"(watchdog every {args.check}s, {tunnel.reconnects} reconnects)")
+        if tunnel.reconnects != args.kills:
+            failures.append(f"{tunnel.reconnects} reconnects for {args.kills} kills")
+    finally:
+        tunnel.stop()
+        db._engine().dispose()
+
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print("✅ tunnel checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
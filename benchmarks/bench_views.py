@@ -0,0 +1,268 @@
+"""
+Benchmark view refreshes and dashboard queries on a throwaway database.
+
+    python -m benchmarks.bench_views --scales 1 4 16 --save-baseline
+    python -m benchmarks.bench_views --scales 1 4 16      # compare with the baseline
+
+For every scale a fresh ``f1_bench_x<scale>`` database is built from ``sql/``,
+seeded (``--seed``, synthetic data by default), and its data replicated ``<scale>`` times.  Then
+
+* every view in ``refresh_views.VIEWS`` is refreshed twice through
+  ``refresh_views.refresh`` – the populating refresh and a steady-state one –
+  followed by one ``refresh_all()``;
+* every SQL constant in ``queries.py`` runs ``--repeat`` times (median and
+  p95) and once under ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)``.
+
+Results and plans are written to ``benchmarks/results/<timestamp>/``.  Timings
+more than ``--threshold`` (and ``--min-ms``) slower than the baseline are
+flagged, and the exit status is then 1.
+"""
+import argparse
+import inspect
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+import db
+import queries
+import refresh_views
+from benchmarks import scratch
+
+HERE = Path(__file__).resolve().parent
+RESULTS_DIR = HERE / "results"
+BASELINE = HERE / "baseline.json"
+
+_PARAM_RE = re.compile(r"(?<!:):(\w+)")
+
+# a race with data, its season, the driver with most telemetry and one of their laps
+PARAMS_SQL = """
+WITH race AS (
+    SELECT s.session_id, m.year
+    FROM session s JOIN meeting m USING (meeting_id)
+    WHERE s.session_type = 'Race'
+    ORDER BY (SELECT count(*) FROM lap WHERE lap.session_id = s.session_id) DESC
+    LIMIT 1
+), drv AS (
+    SELECT driver_id FROM location
+    WHERE session_id = (SELECT session_id FROM race)
+    GROUP BY driver_id ORDER BY count(*) DESC LIMIT 1
+)
+SELECT race.session_id AS sid, race.year AS y, drv.driver_id AS did,
+       (SELECT min(lap_number) FROM lap
+        WHERE session_id = race.session_id AND driver_id = drv.driver_id) AS lap
+FROM race LEFT JOIN drv ON true
+"""
+
+
+RACE_IDS_SQL = """
+SELECT s.session_id FROM session s JOIN meeting m USING (meeting_id)
+WHERE m.year = :y AND s.session_type = 'Race'
+"""
+
+
+def sample_params(engine) -> dict:
+    """Bind values for every ``:param`` in ``queries.py``, taken from the data."""
+    with engine.connect() as con:
+        params = dict(con.execute(text(PARAMS_SQL)).one()._mapping)
+        ids = con.execute(text(RACE_IDS_SQL), {"y": params["y"]}).scalars().all()
+    # the season comparisons: the sample season and its races
+    params.update(yr=params["y"], buckets=750, years=[params["y"]], ids=list(ids))
+    return params
+
+
+def dashboard_queries() -> dict[str, str]:
+    """Every SQL constant in ``queries.py``."""
+    return {name: sql for name, sql in vars(queries).items()
+            if name.isupper() and isinstance(sql, str)}
+
+
+@contextmanager
+def dashboard_on(dbname: str):
+    """Point ``db._engine()`` (and so the refresh code) at a scratch database."""
+    saved = {k: os.environ.get(k) for k in ("PGHOST", "PGPORT", "PGUSER", "PGPASSWORD",
+                                            "PGDATABASE")}
+    b = scratch.server()
+    os.environ.update(PGHOST=b["host"], PGPORT=str(b["port"]), PGUSER=b["user"],
+                      PGPASSWORD=b["password"], PGDATABASE=dbname)
+    db._engine.cache_clear()
+    try:
+        yield
+    finally:
+        db._engine().dispose()
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        db._engine.cache_clear()
+
+
+# ─── Measurements ───────────────────────────────────────────────────
+def bench_refresh() -> dict[str, float]:
+    metrics = {}
+    for view in refresh_views._topological(refresh_views.dependency_graph()):
+        first = refresh_views.refresh(view)
+        again = refresh_views.refresh(view)
+        metrics[f"refresh/{view}/populate"] = first.seconds * 1000
+        metrics[f"refresh/{view}/{again.mode}"] = again.seconds * 1000
+    t0 = time.perf_counter()
+    refresh_views.refresh_all()
+    metrics["refresh/all/wall"] = (time.perf_counter() - t0) * 1000
+    return metrics
+
+
+def bench_queries(engine, params: dict, repeat: int, plan_dir: Path,
+                  statements: Optional[dict[str, str]] = None):
+    metrics, rows, errors = {}, {}, {}
+    plan_dir.mkdir(parents=True, exist_ok=True)
+    with engine.connect() as con:
+        for name, sql in (statements or dashboard_queries()).items():
+            bound = {p: params[p] for p in _PARAM_RE.findall(sql)}
+            stmt = text(sql)
+            try:
+                con.execute(stmt, bound).fetchall()               # warm-up
+            except DBAPIError as e:
+                con.rollback()
+                errors[name] = str(e.orig).splitlines()[0]
+                print(f"⚠️ {name}: {errors[name]}")
+                continue
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                rows[name] = len(con.execute(stmt, bound).fetchall())
+                times.append((time.perf_counter() - t0) * 1000)
+            plan = con.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"),
+                               bound).scalar()
+            (plan_dir / f"{name}.json").write_text(json.dumps(plan, indent=2))
+            metrics[f"query/{name}/median"] = statistics.median(times)
+            metrics[f"query/{name}/p95"] = sorted(times)[max(0, round(0.95 * len(times)) - 1)]
+            metrics[f"query/{name}/execution"] = plan[0]["Execution Time"]
+    return metrics, rows, errors
+
+
+def seed_options(args) -> dict:
+    """The CLI options the selected seeder accepts."""
+    params = inspect.signature(scratch.SEEDERS[args.seed]).parameters
+    return {k: v for k, v in vars(args).items() if k in params}
+
+
+def run_scale(scale: int, args, out: Path) -> dict:
+    name = f"x{scale}"
+    with scratch.scratch_database(name, incremental=args.track_projection == "incremental",
+                                  keep=args.keep) as engine:
+        seeder = scratch.SEEDERS[args.seed]
+        options = seed_options(args)
+        t0 = time.perf_counter()
+        seeder(engine, **options)
+        scratch.replicate(engine, scale)
+        with engine.begin() as con:
+            con.exec_driver_sql("ANALYZE")
+        seed_s = time.perf_counter() - t0
+
+        params = sample_params(engine)
+
+        with dashboard_on(scratch.PREFIX + name):
+            metrics = bench_refresh()
+        query_metrics, rows, errors = bench_queries(engine, params, args.repeat,
+                                                    out / "plans" / name)
+        metrics.update(query_metrics)
+        return {"tables": scratch.table_rows(engine), "seed_s": seed_s, "params": params,
+                "rows": rows, "errors": errors, "metrics": metrics}
+
+
+# ─── Baseline comparison ────────────────────────────────────────────
+def compare(current: dict, baseline: dict, threshold: float, min_ms: float) -> list[str]:
+    """Print the comparison; returns the regressed metric names."""
+    regressions = []
+    for scale, res in current["scales"].items():
+        base = baseline["scales"].get(scale, {}).get("metrics", {})
+        for name, error in res["errors"].items():
+            if f"query/{name}/median" in base:
+                regressions.append(f"{scale} query/{name}")
+                print(f"🔺 {scale:<5} {'query/' + name:<60} now fails: {error}")
+        for metric, ms in res["metrics"].items():
+            if metric not in base:
+                continue
+            was = base[metric]
+            change = (ms - was) / was if was else 0.0
+            if ms - was > min_ms and change > threshold:
+                regressions.append(f"{scale} {metric}")
+                print(f"🔺 {scale:<5} {metric:<60} {ms:10.1f} ms  (was {was:.1f}, {change:+.0%})")
+            elif was - ms > min_ms and -change > threshold:
+                print(f"🟢 {scale:<5} {metric:<60} {ms:10.1f} ms  (was {was:.1f}, {change:+.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark views and dashboard queries.")
+    ap.add_argument("--seed", choices=sorted(scratch.SEEDERS), default="synthetic")
+    ap.add_argument("--seasons", type=int, default=1)
+    ap.add_argument("--meetings", type=int, default=3,
+                    help="race weekends (per season for the synthetic seed)")
+    ap.add_argument("--hz", type=float, default=1.0, help="synthetic telemetry rate")
+    ap.add_argument("--rng-seed", type=int, default=0)
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 4],
+                    help="replicate the seeded data this many times")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--track-projection", choices=["incremental", "matview"],
+                    default="incremental")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.25, help="relative slowdown")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="ignore smaller slowdowns")
+    ap.add_argument("--keep", action="store_true", help="keep the scratch databases")
+    ap.add_argument("--allow-source-server", action="store_true",
+                    help="allow scratch databases on the dashboard's database server")
+    args = ap.parse_args(argv)
+
+    if scratch.same_server() and not args.allow_source_server:
+        print("❌ BENCH_PGHOST/BENCH_PGPORT point at the dashboard's database server. "
+              "Use a local throwaway Postgres (or --allow-source-server).")
+        return 2
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out = RESULTS_DIR / stamp
+    result = {"created_at": stamp, "seed": args.seed, "seed_options": seed_options(args),
+              "track_projection": args.track_projection, "scales": {}}
+    for scale in args.scales:
+        t0 = time.perf_counter()
+        result["scales"][f"x{scale}"] = res = run_scale(scale, args, out)
+        print(f"✅ x{scale}: {sum(res['tables'].values()):,} base rows, "
+              f"{len(res['metrics'])} timings in {time.perf_counter() - t0:.1f}s")
+
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "results.json").write_text(json.dumps(result, indent=2, default=str))
+    print(f"📁 results in {out}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2, default=str))
+        print(f"📌 baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("ℹ️ no baseline yet – run with --save-baseline to record one")
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    for key in ("seed", "seed_options", "track_projection"):
+        if baseline.get(key) != result[key]:
+            print(f"⚠️ baseline was recorded with {key}={baseline.get(key)}, "
+                  f"this run used {result[key]}")
+    regressions = compare(result, baseline, args.threshold, args.min_ms)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) against {args.baseline}")
+        return 1
+    print(f"✅ no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Stand-in for ``ssh -N -L port:host:hostport ...`` without an SSH server.
+
+    SSH_BIN="python -m benchmarks.loopback_ssh" streamlit run app.py
+
+Forwards the ``-L`` port over plain TCP and ignores every other option and the
+destination, so ``ssh_tunnel.TunnelManager`` can be exercised (and its ssh
+process killed) on a machine without sshd.  ``LOOPBACK_DELAY_MS`` delays every
+chunk in both directions to stand in for a remote link.
+"""
+import asyncio
+import os
+import sys
+
+DELAY_S = float(os.getenv("LOOPBACK_DELAY_MS", "0")) / 1000
+
+# ssh options that take a value; everything else is a flag or the destination
+_WITH_VALUE = {"-b", "-c", "-D", "-E", "-e", "-F", "-I", "-i", "-J", "-L", "-l", "-m",
+               "-O", "-o", "-p", "-Q", "-R", "-S", "-W", "-w"}
+
+
+def forward_spec(argv: list[str]) -> tuple[int, str, int]:
+    args = iter(argv)
+    for arg in args:
+        if arg == "-L":
+            local, host, port = next(args).split(":")[-3:]
+            return int(local), host, int(port)
+        if arg in _WITH_VALUE:
+            next(args, None)
+    raise SystemExit("loopback_ssh: no -L port:host:hostport given")
+
+
+async def _pipe(reader, writer):
+    try:
+        while data := await reader.read(65536):
+            if DELAY_S:
+                await asyncio.sleep(DELAY_S)
+            writer.write(data)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(local: int, host: str, port: int):
+    async def handle(client_r, client_w):
+        try:
+            upstream_r, upstream_w = await asyncio.open_connection(host, port)
+        except OSError:
+            client_w.close()
+            return
+        await asyncio.gather(_pipe(client_r, upstream_w), _pipe(upstream_r, client_w),
+                             return_exceptions=True)
+
+    server = await asyncio.start_server(handle, "localhost", local)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(*forward_spec(sys.argv[1:])))
+    except OSError as e:              # like ExitOnForwardFailure
+        sys.exit(f"loopback_ssh: {e}")
@@ -0,0 +1,237 @@
+"""
+Throwaway Postgres databases for benchmarks.
+
+``scratch_database(name)`` creates an empty database on the benchmark server
+(``BENCH_PG*``, defaulting to the ``PG*`` credentials on localhost), applies the
+tables, views and materialized views from ``sql/`` plus the migrations in
+``sql/migrations/``, and drops it afterwards.
+Only databases named ``f1_bench_*`` are ever created or dropped.
+
+Seeders fill the base tables.  ``synthetic`` generates plausible race
+weekends (see ``synthetic.py``); ``copy`` copies the latest races from the
+source database (``PG*`` – the one the dashboard reads).  Both use ``COPY``.
+``replicate()`` then multiplies the seeded data under fresh ids to reach
+larger scales.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+
+import migrate
+from benchmarks.synthetic import generate
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "sql"
+SCHEMA_FILES = [
+    SQL_DIR / "create_tables.sql",
+    SQL_DIR / "create_views.sql",
+    SQL_DIR / "create_materialized_views.sql",
+]
+INCREMENTAL_FILE = SQL_DIR / "create_track_projection_incremental.sql"
+
+PREFIX = "f1_bench_"
+
+# base tables in foreign-key order
+TABLES = [
+    "circuit", "team", "driver", "meeting", "session", "team_membership", "result",
+    "weather", "race_control", "lap", "sector", "segment", "stint", "pit_stop",
+    "location", "car_data", "position", "intervals",
+]
+
+# columns holding ids that must stay unique when the data is replicated
+# (table, column) -> id space; every other table only follows session_id
+ID_COLUMNS = {
+    ("meeting", "meeting_id"): "meeting",
+    ("session", "session_id"): "session",
+    ("session", "meeting_id"): "meeting",
+    ("lap", "lap_id"): "lap",
+    ("sector", "id"): "sector",
+    ("sector", "lap_id"): "lap",
+    ("segment", "sector_id"): "sector",
+    ("location", "location_id"): "location",
+}
+ID_SPACES = {"meeting": ("meeting", "meeting_id"), "session": ("session", "session_id"),
+             "lap": ("lap", "lap_id"), "sector": ("sector", "id"),
+             "location": ("location", "location_id")}
+SERIALS = [("lap", "lap_id"), ("sector", "id"), ("location", "location_id")]
+
+
+# ─── Connections ────────────────────────────────────────────────────
+def server() -> dict:
+    """Connection settings of the benchmark server."""
+    return {
+        "host": os.getenv("BENCH_PGHOST", "localhost"),
+        "port": os.getenv("BENCH_PGPORT", "5432"),
+        "user": os.getenv("BENCH_PGUSER", os.getenv("PGUSER", "postgres")),
+        "password": os.getenv("BENCH_PGPASSWORD", os.getenv("PGPASSWORD", "")),
+    }
+
+
+def source() -> dict:
+    return {"host": os.getenv("PGHOST"), "port": os.getenv("PGPORT"),
+            "user": os.getenv("PGUSER"), "password": os.getenv("PGPASSWORD"),
+            "dbname": os.getenv("PGDATABASE")}
+
+
+def url(host, port, user, password, dbname) -> str:
+    return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}"
+
+
+def same_server() -> bool:
+    """True if the benchmark server is the one the dashboard reads from."""
+    b, s = server(), source()
+    return (b["host"], str(b["port"])) == (s["host"], str(s["port"]))
+
+
+# ─── Scratch databases ──────────────────────────────────────────────
+def apply_sql(engine, path: Path):
+    with engine.begin() as con:
+        con.exec_driver_sql(path.read_text())
+
+
+@contextmanager
+def scratch_database(name: str, incremental: bool = True, keep: bool = False):
+    """Yield an engine on a fresh ``f1_bench_<name>`` database with the full schema."""
+    dbname = PREFIX + name
+    admin = create_engine(url(**server(), dbname="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as con:
+        con.exec_driver_sql(f'DROP DATABASE IF EXISTS "{dbname}" WITH (FORCE)')
+        con.exec_driver_sql(f'CREATE DATABASE "{dbname}"')
+    engine = create_engine(url(**server(), dbname=dbname))
+    try:
+        for path in SCHEMA_FILES:
+            apply_sql(engine, path)
+        migrate.apply_pending(engine)
+        if incremental:
+            apply_sql(engine, INCREMENTAL_FILE)
+        yield engine
+    finally:
+        engine.dispose()
+        if not keep:
+            with admin.connect() as con:
+                con.exec_driver_sql(f'DROP DATABASE IF EXISTS "{dbname}" WITH (FORCE)')
+        admin.dispose()
+
+
+def table_rows(engine) -> dict[str, int]:
+    """Row estimates of the base tables (run ANALYZE first)."""
+    with engine.connect() as con:
+        rows = con.execute(text("""
+            SELECT relname, reltuples::bigint FROM pg_class
+            WHERE relnamespace = 'public'::regnamespace AND relkind = 'r'
+        """)).all()
+    return {t: max(int(n), 0) for t, n in rows if t in TABLES}
+
+
+# ─── Seeders ────────────────────────────────────────────────────────
+def _copy_table(src_raw, dst_raw, table: str, where: Optional[str]):
+    with dst_raw.cursor() as cur:
+        cur.execute("SELECT column_name FROM information_schema.columns "
+                    "WHERE table_schema = 'public' AND table_name = %s "
+                    "ORDER BY ordinal_position", (table,))
+        cols = ", ".join(c for (c,) in cur.fetchall())
+    query = f"SELECT {cols} FROM {table}" + (f" WHERE {where}" if where else "")
+    # spool through a temp file so large telemetry tables never sit in memory
+    with tempfile.TemporaryFile() as buf:
+        with src_raw.cursor() as cur:
+            cur.copy_expert(f"COPY ({query}) TO STDOUT", buf)
+        buf.seek(0)
+        with dst_raw.cursor() as cur:
+            cur.copy_expert(f"COPY {table} ({cols}) FROM STDIN", buf)
+
+
+def copy_from_source(engine, seasons: int = 1, meetings: int = 3) -> list[int]:
+    """
+    Copy the latest ``meetings`` race weekends of the last ``seasons`` seasons.
+
+    Dimension tables (drivers, teams, circuits) are copied whole.  Returns
+    the copied session ids.
+    """
+    src = create_engine(url(**source()))
+    try:
+        with src.connect() as con:
+            meeting_ids = [r[0] for r in con.execute(text("""
+                SELECT meeting_id FROM meeting
+                WHERE year IN (SELECT DISTINCT year FROM meeting
+                               ORDER BY year DESC LIMIT :seasons)
+                ORDER BY start DESC LIMIT :meetings
+            """), {"seasons": seasons, "meetings": meetings})]
+            session_ids = [r[0] for r in con.execute(
+                text("SELECT session_id FROM session WHERE meeting_id = ANY(:m)"),
+                {"m": meeting_ids})]
+        if not session_ids:
+            raise RuntimeError("the source database has no meetings to copy")
+
+        m = f"ARRAY[{','.join(str(int(i)) for i in meeting_ids)}]::int[]"
+        s = f"ARRAY[{','.join(str(int(i)) for i in session_ids)}]::int[]"
+        laps = f"lap_id IN (SELECT lap_id FROM lap WHERE session_id = ANY({s}))"
+        where = {
+            "circuit": None, "team": None, "driver": None,
+            "meeting": f"meeting_id = ANY({m})",
+            "sector": laps,
+            "segment": f"sector_id IN (SELECT id FROM sector WHERE {laps})",
+        }
+        src_raw, dst_raw = src.raw_connection(), engine.raw_connection()
+        try:
+            for table in TABLES:
+                _copy_table(src_raw, dst_raw, table,
+                            where.get(table, f"session_id = ANY({s})"))
+            dst_raw.commit()
+        finally:
+            src_raw.close()
+            dst_raw.close()
+    finally:
+        src.dispose()
+
+    _reset_serials(engine)
+    return session_ids
+
+
+def replicate(engine, factor: int):
+    """
+    Multiply every meeting and everything below it ``factor`` times.
+
+    Copies get ids shifted past the current maximum of each id space, so
+    foreign keys stay consistent.  Drivers, teams and circuits are shared.
+    """
+    if factor <= 1:
+        return
+    with engine.begin() as con:
+        span = {space: (con.execute(text(f"SELECT coalesce(max({col}), 0) + 1 FROM {tbl}"))
+                        .scalar())
+                for space, (tbl, col) in ID_SPACES.items()}
+        for table in TABLES[3:]:
+            cols = con.execute(text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = 'public' AND table_name = :t ORDER BY ordinal_position"
+            ), {"t": table}).scalars().all()
+            spaces = {c: ID_COLUMNS.get((table, c), "session" if c == "session_id" else None)
+                      for c in cols}
+            # original rows are the ones whose first shifted id is below its span
+            key = next(c for c in cols if spaces[c])
+            for i in range(1, factor):
+                exprs = [f"{c} + {i * span[spaces[c]]}" if spaces[c] else c for c in cols]
+                con.execute(text(
+                    f"INSERT INTO {table} ({', '.join(cols)}) "
+                    f"SELECT {', '.join(exprs)} FROM {table} "
+                    f"WHERE {key} < {span[spaces[key]]}"
+                ))
+    _reset_serials(engine)
+
+
+def _reset_serials(engine):
+    with engine.begin() as con:
+        for table, col in SERIALS:
+            con.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{col}'), "
+                f"coalesce(max({col}), 0) + 1, false) FROM {table}"
+            ))
+
+
+SEEDERS = {
+    "synthetic": generate,
+    "copy": copy_from_source,
+}
@@ -0,0 +1,366 @@
+"""
+Synthetic F1 data for scale and load tests.
+
+``generate()`` fills the base tables of an (empty or partly filled) database
+with ``seasons`` × ``meetings`` plausible race weekends: a track outline per
+circuit, tyre strategies with pit stops, lap/sector/segment times with tyre
+degradation and fuel burn, and ``hz`` samples per second of ``location`` and
+``car_data`` along the lap, plus ``position``, ``intervals``, ``weather`` and
+``race_control``.  Ids continue after whatever is already in the tables, so
+``lap``/``sector``/``segment``/``stint``/``pit_stop`` always reference rows
+that exist.  Everything is written with ``COPY``, one transaction per session.
+
+    python -m benchmarks.synthetic --name load10x --seasons 10 --meetings 22
+
+creates (or recreates) the scratch database ``f1_bench_load10x`` and keeps it.
+The same generator is the default ``--seed`` of ``bench_views.py``.
+"""
+import argparse
+import io
+import time
+from datetime import datetime, timedelta
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+FIRST = ["Luca", "Marco", "Oscar", "Noah", "Felix", "Jonas", "Theo", "Adam", "Liam", "Elias",
+         "Hugo", "Leon", "Victor", "Emil", "Mateo", "Samuel", "Kai", "Ruben", "Nico", "Anton"]
+LAST = ["Brandt", "Castell", "Dorran", "Everett", "Fischer", "Galvani", "Hartley", "Ibarra",
+        "Jansen", "Kovac", "Lindqvist", "Moreau", "Novak", "Okafor", "Petrov", "Quinn",
+        "Rossi", "Sato", "Tanaka", "Varga"]
+COUNTRIES = ["GBR", "ITA", "AUS", "NED", "GER", "FRA", "ESP", "JPN", "USA", "MEX",
+             "CAN", "FIN", "DEN", "BRA", "MON", "CHN", "THA", "NZL", "ARG", "AUT"]
+TEAMS = [("Aurora Racing", "1E5BC6"), ("Vector GP", "E8002D"), ("Helix Motorsport", "27F4D2"),
+         ("Orbit F1 Team", "FF8000"), ("Nimbus Racing", "229971"), ("Pulse GP", "0093CC"),
+         ("Titan Racing", "64C4FF"), ("Kestrel F1", "B6BABD"), ("Solstice GP", "52E252"),
+         ("Meridian Racing", "6692FF")]
+CIRCUITS = ["Northfield", "Lago Rosso", "Sandbay", "Alpental", "Port Esmer", "Kirribilli",
+            "Valmont", "Desert Ring", "Hanami", "Cedar Park", "Isla Verde", "Ostrava"]
+
+SESSION_TYPES = {"Practice 1": "Practice", "Qualifying": "Qualifying", "Race": "Race"}
+WEEKEND_DAY = {"Practice": 0, "Qualifying": 1, "Race": 2}
+POINTS = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+COMPOUNDS = {"SOFT": 0.09, "MEDIUM": 0.055, "HARD": 0.03}       # degradation s/lap
+SEGMENTS_PER_SECTOR = (7, 8, 7)
+
+
+# ─── Helpers ────────────────────────────────────────────────────────
+def _copy(cur, table: str, df: pd.DataFrame):
+    """Bulk-load ``df`` into ``table`` (columns by name)."""
+    if df.empty:
+        return
+    buf = io.StringIO()
+    df.to_csv(buf, sep="\t", header=False, index=False, na_rep="\\N",
+              date_format="%Y-%m-%d %H:%M:%S.%f", float_format="%.3f")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN", buf)
+
+
+def _next_ids(con) -> dict[str, int]:
+    """First free id per id space, so generated data can be appended."""
+    return {
+        name: con.execute(text(f"SELECT coalesce(max({col}), 0) + 1 FROM {table}")).scalar()
+        for name, table, col in [("meeting", "meeting", "meeting_id"),
+                                 ("session", "session", "session_id"),
+                                 ("lap", "lap", "lap_id"), ("sector", "sector", "id"),
+                                 ("location", "location", "location_id"),
+                                 ("circuit", "circuit", "circuit_id")]
+    }
+
+
+class _Track:
+    """Closed outline and speed profile of one circuit."""
+
+    def __init__(self, rng: np.random.Generator):
+        self.a, self.b = rng.uniform(3000, 6000, 2)
+        self.wobble = rng.uniform(400, 1200, 2)
+        self.phase = rng.uniform(0, 2 * np.pi, 2)
+        self.corners = int(rng.integers(5, 10))
+        self.vmin, self.vmax = rng.uniform(80, 110), rng.uniform(310, 340)
+        self.lap_s = rng.uniform(78, 98)
+        self.laps = int(rng.integers(50, 71))
+
+    def xyz(self, s: np.ndarray):
+        u = 2 * np.pi * s
+        x = self.a * np.cos(u) + self.wobble[0] * np.cos(3 * u + self.phase[0])
+        y = self.b * np.sin(u) + self.wobble[1] * np.sin(2 * u + self.phase[1])
+        z = 100 + 20 * np.sin(u + self.phase[0])
+        return x.round().astype(int), y.round().astype(int), z.round().astype(int)
+
+    def speed(self, s: np.ndarray) -> np.ndarray:
+        wave = 0.5 + 0.5 * np.cos(2 * np.pi * self.corners * s + self.phase[1])
+        return self.vmin + (self.vmax - self.vmin) * wave ** 0.6
+
+
+# ─── Per-session generation ─────────────────────────────────────────
+def _laps(rng, track: _Track, n_laps: int, drivers: int, race: bool):
+    """Lap times (drivers × laps), stints and pit laps for one session."""
+    skill = np.sort(rng.normal(0, 0.5, drivers))
+    times = np.empty((drivers, n_laps))
+    stints, pits, out_laps = [], [], np.zeros((drivers, n_laps), dtype=int)
+    for d in range(drivers):
+        stops = int(rng.integers(1, 3)) if race else 0
+        bounds = np.sort(rng.choice(np.arange(8, n_laps - 5), stops, replace=False)) \
+            if stops and n_laps > 15 else np.array([], dtype=int)
+        starts = np.concatenate([[1], bounds + 1])
+        ends = np.concatenate([bounds, [n_laps]])
+        compounds = rng.choice(list(COMPOUNDS), len(starts))
+        lap_no = np.arange(1, n_laps + 1)
+        t = track.lap_s + skill[d] + rng.normal(0, 0.25, n_laps)
+        t -= 0.06 * lap_no if race else 0                    # fuel burn
+        for i, (a, b, c) in enumerate(zip(starts, ends, compounds), 1):
+            age = lap_no[a - 1:b] - a
+            t[a - 1:b] += COMPOUNDS[c] * age
+            stints.append((d, i, c, int(a), int(b), int(rng.integers(0, 4))))
+            if i > 1:
+                out_laps[d, a - 1] = 1
+                t[a - 1] += 2.0                              # out lap
+        for b in bounds:
+            t[b - 1] += 20.0                                 # pit lane on the in-lap
+            pits.append((d, int(b), float(rng.normal(23, 1.5))))
+        if race:
+            t[0] += 5.0                                      # standing start
+        times[d] = t
+    return times, stints, pits, out_laps
+
+
+def _session(cur, rng, ids: dict, sid: int, start: datetime, track: _Track, kind: str,
+             driver_ids: Sequence[int], teams: Sequence[str], hz: float):
+    """Write one session and everything below it."""
+    race = kind == "Race"
+    n_laps = track.laps if race else (25 if kind == "Practice" else 12)
+    n = len(driver_ids)
+    times, stints, pits, out_laps = _laps(rng, track, n_laps, n, race)
+    if not race:
+        times += rng.uniform(0, 120, (n, 1)) / n_laps       # staggered runs
+    cum = np.concatenate([np.zeros((n, 1)), times.cumsum(axis=1)], axis=1)
+
+    # team_membership, result
+    _copy(cur, "team_membership", pd.DataFrame({
+        "team_name": teams, "driver_id": driver_ids, "session_id": sid}))
+    total = cum[:, -1] if race else times.min(axis=1)
+    order = np.argsort(total)
+    position = np.empty(n, dtype=int)
+    position[order] = np.arange(1, n + 1)
+    _copy(cur, "result", pd.DataFrame({
+        "driver_id": driver_ids, "session_id": sid, "position": position,
+        "total_time": total.round(3),
+        "gap_to_winner": [f"+{g:.3f}" if g else "" for g in total - total.min()],
+        "points": [POINTS[p - 1] if race and p <= len(POINTS) else 0 for p in position],
+        "status": "Finished",
+    }))
+
+    # lap, sector, segment
+    lap_ids = ids["lap"] + np.arange(n * n_laps).reshape(n, n_laps)
+    ids["lap"] += n * n_laps
+    laps = pd.DataFrame({
+        "lap_id": lap_ids.ravel(),
+        "driver_id": np.repeat(driver_ids, n_laps),
+        "session_id": sid,
+        "lap_number": np.tile(np.arange(1, n_laps + 1), n),
+        "start_time": pd.to_datetime(start) + pd.to_timedelta(cum[:, :-1].ravel(), unit="s"),
+        "i1_speed": rng.integers(220, 300, n * n_laps),
+        "i2_speed": rng.integers(240, 320, n * n_laps),
+        "out_lap": out_laps.ravel(),
+        "duration": times.ravel().round(3),
+        "top_speed": rng.integers(300, 345, n * n_laps),
+    })
+    _copy(cur, "lap", laps)
+    split = rng.dirichlet([31, 38, 31], len(laps))
+    sector_ids = ids["sector"] + np.arange(len(laps) * 3)
+    ids["sector"] += len(laps) * 3
+    _copy(cur, "sector", pd.DataFrame({
+        "id": sector_ids,
+        "lap_id": np.repeat(laps["lap_id"].to_numpy(), 3),
+        "sector_number": np.tile([1, 2, 3], len(laps)),
+        "duration": (split * laps["duration"].to_numpy()[:, None]).ravel().round(3),
+    }))
+    per_sector = np.tile(SEGMENTS_PER_SECTOR, len(laps))
+    seg_no = np.concatenate([np.arange(1, k + 1) for k in per_sector])
+    _copy(cur, "segment", pd.DataFrame({
+        "sector_id": np.repeat(sector_ids, per_sector),
+        "segment_number": seg_no,
+        "segment_index": (seg_no / np.repeat(per_sector, per_sector)).round(3),
+        "segment_status": rng.choice(["2049", "2048", "2051"], len(seg_no), p=[0.85, 0.1, 0.05]),
+    }))
+
+    # stint, pit_stop
+    _copy(cur, "stint", pd.DataFrame(
+        [(driver_ids[d], sid, i, c, a, b, age) for d, i, c, a, b, age in stints],
+        columns=["driver_id", "session_id", "stint_number", "compound",
+                 "lap_start", "lap_end", "tire_age_at_start"]))
+    _copy(cur, "pit_stop", pd.DataFrame({
+        "time": [pd.Timestamp(start) + pd.Timedelta(seconds=cum[d, lap]) for d, lap, _ in pits],
+        "driver_id": [driver_ids[d] for d, _, _ in pits],
+        "session_id": sid,
+        "duration": [round(s, 3) for _, _, s in pits],
+        "lap_number": [lap for _, lap, _ in pits],
+    }))
+
+    # location + car_data on the same timestamps, so the track projection joins them
+    for d, driver_id in enumerate(driver_ids):
+        t = np.arange(0, cum[d, -1], 1 / hz) + rng.uniform(0, 1 / hz)
+        lap = np.clip(np.searchsorted(cum[d], t, side="right") - 1, 0, n_laps - 1)
+        s = (t - cum[d, lap]) / times[d, lap]
+        x, y, z = track.xyz(s)
+        speed = track.speed(s) * rng.normal(1, 0.01, len(s))
+        accel = np.gradient(speed)
+        when = pd.to_datetime(start) + pd.to_timedelta(t, unit="s")
+        _copy(cur, "location", pd.DataFrame({
+            "location_id": ids["location"] + np.arange(len(t)),
+            "time": when, "driver_id": driver_id, "session_id": sid, "x": x, "y": y, "z": z,
+        }))
+        ids["location"] += len(t)
+        _copy(cur, "car_data", pd.DataFrame({
+            "time": when, "driver_id": driver_id, "session_id": sid,
+            "brake_is_pressed": (accel < -2).astype(int),
+            "drs_status": np.where((speed > 290) & (lap > 1), 12, 0),
+            "gear": np.clip(speed // 42 + 1, 1, 8).astype(int),
+            "rpm": (9000 + (speed % 42) * 80).astype(int),
+            "speed": speed.round().astype(int),
+            "throttle": np.where(accel >= 0, 100, rng.integers(0, 40, len(s))),
+        }))
+
+    # position (on change) and intervals every 4 s
+    grid = np.arange(0, cum.max(), 4.0)
+    progress = np.empty((n, len(grid)))
+    for d in range(n):
+        lap = np.clip(np.searchsorted(cum[d], grid, side="right") - 1, 0, n_laps - 1)
+        progress[d] = np.minimum(lap + (grid - cum[d, lap]) / times[d, lap], n_laps)
+    rank = (-progress).argsort(axis=0).argsort(axis=0) + 1
+    when = pd.to_datetime(start) + pd.to_timedelta(grid, unit="s")
+    changed = np.concatenate([np.ones((n, 1), bool), rank[:, 1:] != rank[:, :-1]], axis=1)
+    dd, gg = np.nonzero(changed)
+    _copy(cur, "position", pd.DataFrame({
+        "time": when[gg], "driver_id": np.asarray(driver_ids)[dd], "session_id": sid,
+        "position": rank[dd, gg]}))
+    if race:
+        lead = progress.max(axis=0)
+        ahead = np.take_along_axis(np.sort(progress, axis=0)[::-1], rank - 2, axis=0)
+        gap_lead = (lead - progress) * track.lap_s
+        gap_next = np.where(rank > 1, (ahead - progress) * track.lap_s, np.nan)
+        _copy(cur, "intervals", pd.DataFrame({
+            "time": np.tile(when, n), "driver_id": np.repeat(driver_ids, len(grid)),
+            "session_id": sid, "gap_to_leader": gap_lead.ravel().round(3),
+            "gap_to_next": gap_next.ravel().round(3)}))
+
+    # weather every minute, a few race control messages
+    minutes = np.arange(0, cum.max() + 60, 60.0)
+    base = rng.uniform(18, 32)
+    _copy(cur, "weather", pd.DataFrame({
+        "session_id": sid, "time": pd.to_datetime(start) + pd.to_timedelta(minutes, unit="s"),
+        "temperature": base + rng.normal(0, 0.3, len(minutes)).cumsum() * 0.1,
+        "humidity": rng.integers(35, 70, len(minutes)),
+        "air_pressure": 1013 + rng.normal(0, 1, len(minutes)),
+        "rainfall": 0.0,
+        "track_temperature": base + 12 + rng.normal(0, 0.5, len(minutes)),
+        "wind_direction": rng.integers(0, 360, len(minutes)),
+        "wind_speed": rng.uniform(0, 5, len(minutes)),
+    }))
+    _copy(cur, "race_control", pd.DataFrame({
+        "session_id": sid,
+        "time": [start, start + timedelta(seconds=float(cum.max()))],
+        "category": "Flag", "flag": ["GREEN", "CHEQUERED"],
+        "lap_number": [1, n_laps], "message": ["GREEN LIGHT - PIT EXIT OPEN", "CHEQUERED FLAG"],
+        "scope": "Track",
+    }))
+
+
+# ─── Entry points ───────────────────────────────────────────────────
+def generate(engine, seasons: int = 1, meetings: int = 3, hz: float = 3.7, drivers: int = 20,
+             session_types: Sequence[str] = ("Race",), rng_seed: int = 0) -> list[int]:
+    """
+    Append ``seasons`` × ``meetings`` synthetic race weekends to ``engine``'s
+    database and return the new session ids.
+
+    ``hz`` is the ``location``/``car_data`` sample rate per driver (the live
+    timing feed sends ≈3.7 Hz); ``session_types`` picks from ``SESSION_TYPES``.
+    """
+    rng = np.random.default_rng(rng_seed)
+    with engine.begin() as con:
+        ids = _next_ids(con)
+        year0 = con.execute(text("SELECT coalesce(max(year), 2023) + 1 FROM meeting")).scalar()
+
+    driver_ids = list(range(1, drivers + 1))
+    teams = [TEAMS[(d // 2) % len(TEAMS)][0] for d in range(drivers)]
+    raw = engine.raw_connection()
+    sessions = []
+    try:
+        cur = raw.cursor()
+        cur.executemany("INSERT INTO team VALUES (%s, %s) ON CONFLICT DO NOTHING", TEAMS)
+        cur.executemany(
+            "INSERT INTO driver VALUES (%s, %s, %s, %s, %s, %s, NULL, %s) ON CONFLICT DO NOTHING",
+            [(i, f"{FIRST[k % 20][0]} {LAST[k % 20].upper()}", FIRST[k % 20],
+              f"{LAST[k % 20]}{'' if k < 20 else k // 20 + 1}",
+              f"{FIRST[k % 20]} {LAST[k % 20]}{'' if k < 20 else ' ' + str(k // 20 + 1)}",
+              COUNTRIES[k % 20], (LAST[k % 20][:2] + str(k // 20 or LAST[k % 20][2])).upper())
+             for k, i in enumerate(driver_ids)])
+        tracks = {}
+        for c, name in enumerate(CIRCUITS[:meetings] or CIRCUITS[:1]):
+            tracks[ids["circuit"] + c] = _Track(rng)
+            cur.execute("INSERT INTO circuit VALUES (%s, %s, %s, %s, %s, %s)",
+                        (ids["circuit"] + c, name, f"Circuit de {name}", COUNTRIES[c % 20],
+                         c + 1, name))
+        raw.commit()
+
+        circuits = list(tracks)
+        for season in range(seasons):
+            year = year0 + season
+            for rnd in range(meetings):
+                circuit_id = circuits[rnd % len(circuits)]
+                friday = datetime(year, 3, 1, 11, 30) + timedelta(weeks=2 * rnd)
+                mid = ids["meeting"]
+                ids["meeting"] += 1
+                name = f"{CIRCUITS[rnd % len(CIRCUITS)]} Grand Prix"
+                cur.execute("INSERT INTO meeting VALUES (%s, %s, %s, %s, %s, %s)",
+                            (mid, name, f"{year} {name}", circuit_id, friday, year))
+                for session_name in session_types:
+                    sid = ids["session"]
+                    ids["session"] += 1
+                    kind = SESSION_TYPES[session_name]
+                    start = friday + timedelta(days=WEEKEND_DAY[kind],
+                                               hours=2.5 if kind == "Race" else 0)
+                    cur.execute("INSERT INTO session VALUES (%s, %s, %s, %s, %s, %s)",
+                                (sid, mid, start, start + timedelta(hours=2),
+                                 session_name, kind))
+                    _session(cur, rng, ids, sid, start, tracks[circuit_id], kind,
+                             driver_ids, teams, hz)
+                    raw.commit()
+                    sessions.append(sid)
+    finally:
+        raw.close()
+
+    with engine.begin() as con:
+        for table, col in [("lap", "lap_id"), ("sector", "id"), ("location", "location_id")]:
+            con.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', '{col}'), "
+                             f"coalesce(max({col}), 0) + 1, false) FROM {table}"))
+    return sessions
+
+
+if __name__ == "__main__":
+    from benchmarks import scratch
+
+    ap = argparse.ArgumentParser(description="Fill a scratch database with synthetic F1 data.")
+    ap.add_argument("--name", default="synthetic", help="database f1_bench_<name>")
+    ap.add_argument("--seasons", type=int, default=1)
+    ap.add_argument("--meetings", type=int, default=22, help="race weekends per season")
+    ap.add_argument("--hz", type=float, default=3.7, help="telemetry samples per second")
+    ap.add_argument("--drivers", type=int, default=20)
+    ap.add_argument("--session-types", nargs="+", default=["Race"],
+                    choices=list(SESSION_TYPES))
+    ap.add_argument("--rng-seed", type=int, default=0)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    with scratch.scratch_database(args.name, keep=True) as engine:
+        sids = generate(engine, args.seasons, args.meetings, args.hz, args.drivers,
+                        args.session_types, args.rng_seed)
+        with engine.begin() as con:
+            con.exec_driver_sql("ANALYZE")
+        rows = scratch.table_rows(engine)
+    for table, n in sorted(rows.items(), key=lambda kv: -kv[1]):
+        print(f"  {table:<16} {n:>14,}")
+    print(f"✅ {len(sids)} sessions, {sum(rows.values()):,} rows in "
+          f"{scratch.PREFIX}{args.name} ({time.perf_counter() - t0:.1f}s)")
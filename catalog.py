@@ -0,0 +1,107 @@
+"""
+The race calendar – seasons, meetings and sessions – held in memory.
+
+``catalog()`` builds a ``Catalog`` from a single query (``queries.CATALOG``)
+and keeps it for the whole process, so the sidebar renders from dicts and
+tuples without a database round trip.  It is rebuilt after ``db`` dropped
+cached results (another process announced a refresh, see
+``db.watch_refreshes``) and at the latest every ``CATALOG_TTL_S`` seconds.
+"""
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import pandas as pd
+
+import queries
+from db import CACHE, run_query
+
+TTL_S = float(os.getenv("CATALOG_TTL_S", "600"))
+
+
+@dataclass(frozen=True)
+class Session:
+    session_id: int
+    meeting_id: int
+    year: int
+    meeting: str          # meeting label, unique within its season
+    name: str             # "Practice 1", "Qualifying", "Sprint", "Race", … unique per meeting
+    type: str             # "Practice", "Qualifying" or "Race"
+
+
+class Catalog:
+    """Seasons → meetings → sessions, with O(1) lookups by id and by label."""
+
+    def __init__(self, sessions: list[Session]):
+        """``sessions`` in calendar order."""
+        self.by_id: dict[int, Session] = {s.session_id: s for s in sessions}
+        self.years: tuple[int, ...] = tuple(sorted({s.year for s in sessions}, reverse=True))
+        self.session_types: tuple[str, ...] = tuple(sorted({s.type for s in sessions}))
+
+        grouped: dict[int, dict[str, list[Session]]] = {}
+        for s in sessions:
+            grouped.setdefault(s.year, {}).setdefault(s.meeting, []).append(s)
+        self._meetings = {year: tuple(meetings) for year, meetings in grouped.items()}
+        self._sessions = {(year, label): tuple(ss)
+                          for year, meetings in grouped.items() for label, ss in meetings.items()}
+        self._ids = {(s.year, s.meeting, s.name): s.session_id for s in sessions}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "Catalog":
+        """From the rows of ``queries.CATALOG``; repeated names get their date."""
+        meetings = df.drop_duplicates("meeting_id")
+        repeated = meetings.loc[meetings.duplicated(["year", "meeting_name"], keep=False),
+                                "meeting_id"]
+        meeting = df["meeting_name"].astype(str)
+        twice = df["meeting_id"].isin(repeated)
+        meeting = meeting.where(~twice, meeting + " (" + pd.to_datetime(df["start"])
+                                .dt.strftime("%d.%m.") + ")")
+        name = df["session_name"].astype(str)
+        twice = df.duplicated(["meeting_id", "session_name"], keep=False)
+        name = name.where(~twice, name + " (" + pd.to_datetime(df["start_time"])
+                          .dt.strftime("%d.%m. %H:%M") + ")")
+        return cls([Session(int(sid), int(mid), int(year), label, n, str(kind))
+                    for sid, mid, year, label, n, kind in zip(
+                        df["session_id"], df["meeting_id"], df["year"], meeting, name,
+                        df["session_type"])])
+
+    def meetings(self, year: int) -> tuple[str, ...]:
+        """Meeting labels of ``year`` in calendar order."""
+        return self._meetings.get(year, ())
+
+    def sessions(self, year: int, meeting: str) -> tuple[Session, ...]:
+        return self._sessions.get((year, meeting), ())
+
+    def session_id(self, year: int, meeting: str, name: str) -> int:
+        return self._ids[(year, meeting, name)]
+
+    def season(self, year: int, session_type: str = "Race") -> list[int]:
+        """Session ids of one type in ``year``, in calendar order."""
+        return [s.session_id for m in self.meetings(year) for s in self.sessions(year, m)
+                if s.type == session_type]
+
+    def main_session(self, year: int, meeting: str) -> Session:
+        """The Grand Prix itself if the meeting has one, else its last session."""
+        sessions = self.sessions(year, meeting)
+        races = [s for s in sessions if s.type == "Race"]
+        main = [s for s in races if s.name == "Race"]
+        return (main or races or sessions)[-1]
+
+    def latest_race(self, year: int) -> Session:
+        """The main session of the season's last meeting with a race."""
+        meetings = self.meetings(year)
+        with_race = [m for m in meetings
+                     if any(s.type == "Race" for s in self.sessions(year, m))]
+        return self.main_session(year, (with_race or meetings)[-1])
+
+
+@lru_cache(maxsize=1)
+def _load(generation: int, epoch: int) -> Catalog:
+    # the catalog is the cache here: a cached frame would outlive the epoch
+    return Catalog.from_frame(run_query(queries.CATALOG, cache=False))
+
+
+def catalog() -> Catalog:
+    """The process-wide catalog; rebuilt after a data change or ``TTL_S``."""
+    return _load(CACHE.generation, int(time.time() // TTL_S))
@@ -1,17 +1,26 @@
 # cleanup_tunnel.py
 import subprocess
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from ssh_tunnel import CONTROL_PATH, LOCAL_PORT, SSH_HOST, SSH_PORT, SSH_USER
 
-PORT = os.getenv("LOCAL_TUNNEL_PORT", "5433")  # fallback if not in .env
+PORT = str(LOCAL_PORT)      # same default as ssh_tunnel (LOCAL_TUNNEL_PORT, else 5432)
+
+def close_master():
+    """Ask the shared ControlMaster connection, if one is running, to exit."""
+    result = subprocess.run(
+        ["ssh", "-O", "exit", "-o", f"ControlPath={CONTROL_PATH}",
+         "-p", str(SSH_PORT), f"{SSH_USER}@{SSH_HOST}"],
+        capture_output=True, text=True
+    )
+    if result.returncode == 0:
+        print("🛑 Closed SSH control master")
 
 def close_tunnels(port: str = PORT):
     """
-    Kill any SSH tunnel processes using -N -f with the target port.
+    Kill any SSH tunnel processes using -N with the target port.
     """
     try:
+        close_master()
         # Find matching SSH processes
         result = subprocess.run(
             ["pgrep", "-af", f"ssh .*{port}:localhost"],
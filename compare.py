@@ -0,0 +1,79 @@
+"""
+Compare several races, or whole seasons, at once.
+
+Each dataset is fetched with a single ``session_id = ANY(:ids)`` query however
+many races are selected, then normalised per session with vectorised pandas
+operations (delta to the session's fastest lap), so circuits of different
+length land on one scale.
+"""
+from dataclasses import dataclass
+from typing import Iterable
+
+import pandas as pd
+
+import queries
+from db import run_query
+
+
+@dataclass(frozen=True)
+class Comparison:
+    session_ids: tuple[int, ...]
+    results: pd.DataFrame
+    laps: pd.DataFrame        # clean laps with delta_s / delta_pct
+    stints: pd.DataFrame      # with best_delta_pct / avg_delta_pct
+
+
+def season_races(years: Iterable[int]) -> pd.DataFrame:
+    """Race sessions of ``years`` in calendar order with unique labels."""
+    races = run_query(queries.SEASON_RACES, years=sorted({int(y) for y in years}))
+    label = races["year"].astype(str) + " " + races["label"]
+    # sprints are races too; repeated meeting names get their date
+    session = races["session_name"].astype(str)          # categorical when read via COPY
+    label = label.where(session == "Race", label + " (" + session + ")")
+    label = label.where(~label.duplicated(keep=False),
+                        label + " " + pd.to_datetime(races["start"]).dt.strftime("%d.%m."))
+    return races.assign(label=label)
+
+
+def lap_deltas(laps: pd.DataFrame) -> pd.DataFrame:
+    """Each lap's gap to the fastest clean lap of its session, in s and %."""
+    best = laps.groupby("session_id")["lap_time_s"].transform("min")
+    return laps.assign(delta_s=laps["lap_time_s"] - best,
+                       delta_pct=(laps["lap_time_s"] / best - 1) * 100)
+
+
+def stint_deltas(stints: pd.DataFrame) -> pd.DataFrame:
+    """Best and average stint pace relative to the session's best stint lap, in %."""
+    stints = stints.astype({"avg_lap_s": float, "best_lap_s": float})
+    best = stints.groupby("session_id")["best_lap_s"].transform("min")
+    return stints.assign(best_delta_pct=(stints["best_lap_s"] / best - 1) * 100,
+                         avg_delta_pct=(stints["avg_lap_s"] / best - 1) * 100)
+
+
+def compare(session_ids: Iterable[int]) -> Comparison:
+    """One query per dataset for all ``session_ids``."""
+    ids = sorted({int(s) for s in session_ids})
+    return Comparison(
+        session_ids=tuple(ids),
+        results=run_query(queries.COMPARE_RESULTS, ids=ids),
+        laps=lap_deltas(run_query(queries.COMPARE_LAPS, ids=ids)),
+        stints=stint_deltas(run_query(queries.COMPARE_STINTS, ids=ids)),
+    )
+
+
+def pace_matrix(laps: pd.DataFrame, labels: dict[int, str]) -> pd.DataFrame:
+    """Median lap delta (%) per driver and race, races in ``labels`` order."""
+    pace = laps.pivot_table(index="full_name", columns="session_id",
+                            values="delta_pct", aggfunc="median")
+    pace = pace.reindex(columns=[s for s in labels if s in pace.columns])
+    pace = pace.loc[pace.median(axis=1).sort_values().index]
+    return pace.rename(columns=labels).rename_axis(columns=None)
+
+
+def points_table(results: pd.DataFrame, labels: dict[int, str]) -> pd.DataFrame:
+    """Cumulative points per driver over the selected races."""
+    pts = results.pivot_table(index="full_name", columns="session_id", values="points",
+                              aggfunc="sum", fill_value=0)
+    pts = pts.reindex(columns=[s for s in labels if s in pts.columns]).cumsum(axis=1)
+    pts = pts.sort_values(pts.columns[-1], ascending=False)
+    return pts.rename(columns=labels).rename_axis(columns=None)
@@ -1,15 +1,80 @@
 """
 Very small helper to run any (read-only) SQL and get a pandas DataFrame.
+
+Results are kept in a process-wide cache (see ``QueryCache``) so that many
+Streamlit sessions looking at the same race share one Postgres round trip.
+Known dashboard queries are answered from a fresh Parquet snapshot when one
+exists (see ``snapshot.py``).  Ad-hoc SQL should go through ``QueryStream``,
+which pages through a server-side cursor with row, byte and time limits.
+``watch_refreshes()`` drops cached results as soon as another process
+announces a view refresh.
+
+Results are read with ``COPY (...) TO STDOUT`` and parsed by Arrow into typed
+columns (``read_copy``); ``F1_READ_PATH=read_sql`` switches back to
+``pd.read_sql``.
 """
+import io
 import os
+import re
+import select
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from functools import lru_cache
+from typing import Optional
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import create_engine, event, text
 from dotenv import load_dotenv
 
 load_dotenv()        # reads .env
 
+import perf
+import snapshot
+
+DEFAULT_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))          # seconds
+MAX_CACHE_BYTES = int(os.getenv("QUERY_CACHE_MB", "256")) * 1024 * 1024
+
+STREAM_MAX_ROWS = int(os.getenv("STREAM_MAX_ROWS", "200000"))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_MB", "200")) * 1024 * 1024
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "30000"))
+STREAM_IDLE_S = float(os.getenv("STREAM_IDLE_S", "300"))   # unread streams give their connection back
+POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))            # connections opened by warm_pool
+
+READ_PATH = os.getenv("F1_READ_PATH", "copy")                       # or "read_sql"
+# repeated labels are stored once per distinct value
+CATEGORY_COLUMNS = frozenset({"full_name", "name_acronym", "team_name", "team_colour",
+                              "compound", "session_name", "session_type"})
+
+# refresh_views.py announces refreshed views here
+REFRESHED_CHANNEL = "f1_views_refreshed"
+
+_RELATION_RE = re.compile(r"\b(?:from|join)\s+([a-z_][\w.]*)", re.I)
+
+
+_FIRST_CONNECT: dict = {}
+_first_connect_done = threading.Event()
+_first_connect_lock = threading.Lock()
+
+
+def on_first_connect(name: str, fn):
+    """Run ``fn()`` once, before the process opens its first database connection."""
+    _FIRST_CONNECT[name] = fn                 # keyed: Streamlit reruns register again
+
+
+def _before_connect(*_):
+    if _first_connect_done.is_set():
+        return
+    # connections opened by the hooks themselves wait here until they are done
+    with _first_connect_lock:
+        if not _first_connect_done.is_set():
+            for fn in list(_FIRST_CONNECT.values()):
+                fn()
+            _first_connect_done.set()
+
 
 @lru_cache
 def _engine():
@@ -17,10 +82,450 @@ def _engine():
         f"postgresql+psycopg2://{os.getenv('PGUSER')}:{os.getenv('PGPASSWORD')}"
         f"@{os.getenv('PGHOST')}:{os.getenv('PGPORT')}/{os.getenv('PGDATABASE')}"
     )
-    return create_engine(url, pool_pre_ping=True)
+    engine = create_engine(url, pool_pre_ping=True)
+    event.listen(engine, "do_connect", _before_connect)
+    return perf.instrument(engine)
+
+
+def warm_pool(n: int = POOL_WARM):
+    """Swap pooled connections (e.g. through a dead tunnel) for ``n`` fresh ones."""
+    engine = _engine()
+    engine.dispose()
+    conns = [engine.connect() for _ in range(n)]
+    for conn in conns:
+        conn.close()                    # back into the pool, ready for the next query
+
+
+# ─── COPY read path ─────────────────────────────────────────────────
+# result type oid -> Arrow type parsed from COPY's CSV; others use read_sql
+_ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+    700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),    # numeric as float
+    19: pa.string(), 25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+    1186: pa.string(),                                             # interval, see below
+}
+_INTERVAL_OID = 1186
+
+_CSV_CONVERT = dict(strings_can_be_null=True, quoted_strings_can_be_null=False,
+                    null_values=[""], true_values=["t"], false_values=["f"])
+
+# result columns per SQL text: (name, type oid) pairs; dropped by invalidate()
+_SHAPES: dict[str, list] = {}
+
 
+def _shape(cur, sql: str, bound: str) -> list:
+    """Column names and type oids of ``sql``, planned once with ``LIMIT 0``."""
+    shape = _SHAPES.get(sql)
+    if shape is None:
+        cur.execute(f"SELECT * FROM ({bound}\n) _q LIMIT 0")
+        shape = _SHAPES[sql] = [(d.name, d.type_code) for d in cur.description]
+    return shape
 
-def run_query(sql: str, **params) -> pd.DataFrame:
-    """Execute parameterised SQL safely and return a DataFrame."""
+
+def _read_sql(sql: str, params: dict) -> pd.DataFrame:
     with _engine().connect() as conn:
-        return pd.read_sql(text(sql), conn, params=params)
+        df = pd.read_sql(text(sql), conn, params=params)
+    perf.note_frame(df)
+    return df
+
+
+def _copy_csv(sql: str, params: dict) -> Optional[tuple[list, io.BytesIO]]:
+    """``(shape, CSV)`` of ``sql``, or None if a column type needs ``read_sql``."""
+    raw = _engine().raw_connection()
+    try:
+        with raw.cursor() as cur:
+            # COPY takes no bind parameters: psycopg2 renders them as literals
+            bound = cur.mogrify(str(text(sql).compile(dialect=_engine().dialect)),
+                                params).decode()
+            shape = _shape(cur, sql, bound)
+            if any(oid not in _ARROW_TYPES for _, oid in shape):
+                return None
+            buf = io.BytesIO()
+            cur.copy_expert(f"COPY ({bound}\n) TO STDOUT WITH (FORMAT csv)", buf)
+        raw.rollback()
+    finally:
+        raw.close()
+    return shape, buf
+
+
+def _parse_csv(shape: list, buf: io.BytesIO) -> pa.Table:
+    # positional names: result columns may repeat a name
+    keys = [f"c{i}" for i in range(len(shape))]
+    types = {k: _ARROW_TYPES[oid] for k, (_, oid) in zip(keys, shape)}
+    if buf.tell() == 0:
+        return pa.schema(types).empty_table()        # Arrow rejects an empty CSV
+    buf.seek(0)
+    return pa_csv.read_csv(buf, read_options=pa_csv.ReadOptions(column_names=keys),
+                           convert_options=pa_csv.ConvertOptions(column_types=types,
+                                                                 **_CSV_CONVERT))
+
+
+def read_copy(sql: str, params: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Run ``sql`` as ``COPY (...) TO STDOUT`` and parse the CSV with Arrow.
+
+    Column types come from the result description instead of being inferred
+    per row and numerics arrive as floats.  Results with types Arrow cannot
+    parse (arrays, JSON, ...) are read with ``pd.read_sql`` instead.  If the
+    CSV no longer matches the remembered description (a view was recreated
+    with other columns), the query is described again and re-run once.
+    """
+    params = params or {}
+    sql = sql.strip().rstrip(";")
+    t0 = time.perf_counter()
+    for retry in (False, True):
+        copied = _copy_csv(sql, params)
+        if copied is None:
+            return _read_sql(sql, params)
+        shape, buf = copied
+        try:
+            table = _parse_csv(shape, buf)
+            break
+        except pa.ArrowInvalid:
+            _SHAPES.pop(sql, None)
+            if retry:
+                raise
+    del buf, copied
+    df = table.to_pandas(self_destruct=True, split_blocks=True)
+    del table
+    df.columns = [name for name, _ in shape]
+    for i, (_, oid) in enumerate(shape):
+        if oid == _INTERVAL_OID:
+            df.isetitem(i, pd.to_timedelta(df.iloc[:, i]))
+
+    perf.RECORDER.add("query", perf.relation(sql), time.perf_counter() - t0,
+                      len(df), int(df.memory_usage(deep=True).sum()))
+    return df
+
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """``CATEGORY_COLUMNS`` as categoricals, whichever path read the frame."""
+    for i, name in enumerate(df.columns):
+        if name in CATEGORY_COLUMNS and not isinstance(df.dtypes.iloc[i], pd.CategoricalDtype):
+            df.isetitem(i, df.iloc[:, i].astype("category"))
+    return df
+
+
+# ─── Result cache ───────────────────────────────────────────────────
+def _normalize_sql(sql: str) -> str:
+    """Collapse whitespace and trailing semicolons so formatting never splits keys."""
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _relations(sql: str) -> frozenset:
+    """Unqualified, lower-cased names of every relation read via FROM/JOIN."""
+    return frozenset(m.split(".")[-1].lower() for m in _RELATION_RE.findall(sql))
+
+
+class _Entry:
+    __slots__ = ("df", "nbytes", "expires", "relations")
+
+    def __init__(self, df, nbytes, expires, relations):
+        self.df = df
+        self.nbytes = nbytes
+        self.expires = expires
+        self.relations = relations
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results, bounded by total DataFrame memory.
+
+    Entries expire after their TTL and can be dropped per relation, so a view
+    refresh only evicts results that actually read that view.  Concurrent misses
+    on the same key wait for the first caller instead of querying again.
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._inflight: dict[tuple, tuple[Future, frozenset]] = {}    # (load, relations)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0             # bumped by every invalidation: the data changed
+
+    def get_or_load(self, key: tuple, sql: str, ttl: float, load) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.df
+            if entry is not None:
+                self._drop(key)
+            fut, _ = self._inflight.get(key, (None, None))
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = (fut, _relations(sql))
+                generation = self.generation
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            return fut.result()
+
+        try:
+            df = load()
+        except BaseException as e:
+            with self._lock:
+                self._forget_load(key, fut)
+            fut.set_exception(e)
+            raise
+
+        with self._lock:
+            self._forget_load(key, fut)
+            # invalidated while loading: the frame may predate the change
+            if self.generation == generation:
+                self._put(key, _Entry(df, int(df.memory_usage(deep=True).sum()),
+                                      time.monotonic() + ttl, _relations(sql)))
+        fut.set_result(df)
+        return df
+
+    def invalidate(self, relation: Optional[str] = None) -> int:
+        """Drop entries reading ``relation`` (schema optional), or everything."""
+        name = relation.split(".")[-1].lower() if relation else None
+        with self._lock:
+            self.generation += 1
+            keys = [k for k, e in self._entries.items()
+                    if name is None or name in e.relations]
+            for k in keys:
+                self._drop(k)
+            # later misses start a new load instead of waiting for a stale one
+            for k in [k for k, (_, rels) in self._inflight.items()
+                      if name is None or name in rels]:
+                del self._inflight[k]
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def _put(self, key, entry: _Entry):
+        if entry.nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key).nbytes
+
+    def _forget_load(self, key, fut: Future):
+        if self._inflight.get(key, (None,))[0] is fut:
+            del self._inflight[key]
+
+
+CACHE = QueryCache()
+
+
+def invalidate(relation: Optional[str] = None) -> int:
+    """Forget cached results (and result descriptions) that read ``relation``, or all."""
+    name = relation.split(".")[-1].lower() if relation else None
+    for sql in list(_SHAPES):
+        if name is None or name in _relations(sql):
+            _SHAPES.pop(sql, None)
+    return CACHE.invalidate(relation)
+
+
+def _listen(channel: str, on_message, idle_s: float = 30.0, on_lost=None,
+            stop: Optional[threading.Event] = None):
+    """
+    Call ``on_message(payload)`` for every NOTIFY on ``channel``; reconnects forever
+    (or until ``stop`` is set).  ``on_lost()`` runs whenever the connection failed,
+    as notifications may have been missed; by default every cached result is dropped.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            raw = _engine().raw_connection()
+            raw.detach()                              # held for good, not a pool slot
+            conn = raw.dbapi_connection
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {channel}")
+                while not stop.is_set():
+                    if select.select([conn], [], [], idle_s)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            on_message(conn.notifies.pop(0).payload)
+                    else:
+                        with conn.cursor() as cur:   # notices a dropped tunnel
+                            cur.execute("SELECT 1")
+            finally:
+                conn.close()
+        except Exception:
+            # everything cached may be stale while we were not listening
+            (on_lost or invalidate)()
+            stop.wait(5)
+
+
+@lru_cache
+def watch_refreshes() -> threading.Thread:
+    """Start (once per process) a thread that invalidates views refreshed elsewhere."""
+    t = threading.Thread(target=_listen, args=(REFRESHED_CHANNEL, invalidate),
+                         name="refresh-listener", daemon=True)
+    t.start()
+    return t
+
+
+def _read(sql: str, params: dict) -> pd.DataFrame:
+    t0 = time.perf_counter()
+    local = snapshot.serve(sql, params)
+    if local is not None:
+        perf.RECORDER.add("snapshot", perf.relation(sql), time.perf_counter() - t0,
+                          len(local), int(local.memory_usage(deep=True).sum()))
+        return _categorize(local)
+    if READ_PATH == "copy":
+        return _categorize(read_copy(sql, params))
+    return _categorize(_read_sql(sql, params))
+
+
+def run_query(sql: str, *, ttl: Optional[float] = None, cache: bool = True,
+              **params) -> pd.DataFrame:
+    """
+    Execute parameterised SQL safely and return a DataFrame.
+
+    Results are served from the shared cache for ``ttl`` seconds
+    (``QUERY_CACHE_TTL`` by default); pass ``cache=False`` for ad-hoc SQL.
+    The returned frame is a copy, so callers may modify it freely.
+    """
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    if not cache or ttl <= 0:
+        return _read(sql, params)
+
+    key = (_normalize_sql(sql),
+           tuple(sorted((k, _freeze(v)) for k, v in params.items())))
+    return CACHE.get_or_load(key, sql, ttl, lambda: _read(sql, params)).copy()
+
+
+# ─── Streaming ──────────────────────────────────────────────────────
+class QueryStream:
+    """
+    Page through a read-only query with a server-side cursor.
+
+    Only ``page_rows`` rows are held per fetch.  The stream stops once
+    ``max_rows`` rows or ``max_bytes`` of DataFrame memory have been returned
+    (``truncated`` is then set), and every statement runs under
+    ``statement_timeout``.  The connection stays checked out until the last
+    page was read, ``close()`` is called or no page was asked for in
+    ``idle_s`` seconds (``expired`` is then set).
+    """
+
+    def __init__(self, sql: str, *, page_rows: int = 500,
+                 max_rows: int = STREAM_MAX_ROWS, max_bytes: int = STREAM_MAX_BYTES,
+                 timeout_ms: int = STATEMENT_TIMEOUT_MS, idle_s: float = STREAM_IDLE_S,
+                 **params):
+        self.page_rows = page_rows
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.idle_s = idle_s
+        self.rows = 0
+        self.bytes = 0
+        self.exhausted = False
+        self.truncated = False
+        self.expired = False
+        self._conn = self._result = self._idle = None
+        self._lock = threading.Lock()
+
+        self._conn = _engine().connect()
+        try:
+            self._conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            self._conn.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                               {"ms": str(int(timeout_ms))})
+            # backstop should this process stop without closing the stream
+            self._conn.execute(
+                text("SELECT set_config('idle_in_transaction_session_timeout', :ms, true)"),
+                {"ms": str(int(idle_s * 2000))})
+            self._result = (self._conn
+                            .execution_options(stream_results=True, max_row_buffer=page_rows)
+                            .execute(text(sql), params))
+            self._perf = perf.last_query()
+        except BaseException:
+            self._conn.close()
+            raise
+        self.columns = list(self._result.keys())
+        self._arm()
+
+    @property
+    def done(self) -> bool:
+        return self.exhausted or self.truncated or self.expired
+
+    def _arm(self):
+        if self._idle is not None:
+            self._idle.cancel()
+        self._idle = threading.Timer(self.idle_s, self._expire)
+        self._idle.daemon = True
+        self._idle.start()
+
+    def _expire(self):
+        with self._lock:
+            if not self.done:
+                self.expired = True
+                self._release()
+
+    def next_page(self) -> pd.DataFrame:
+        """The next chunk of rows; empty once the stream is done."""
+        with self._lock:
+            if self.done:
+                return pd.DataFrame(columns=self.columns)
+            n = min(self.page_rows, self.max_rows - self.rows)
+            rows = self._result.fetchmany(n)
+            df = pd.DataFrame(rows, columns=self.columns)
+            perf.note_frame(df, self._perf)
+            self.rows += len(df)
+            self.bytes += int(df.memory_usage(deep=True).sum())
+
+            if len(rows) < n:
+                self.exhausted = True
+            elif self.rows >= self.max_rows or self.bytes >= self.max_bytes:
+                self.truncated = True
+            if self.done:
+                self._release()
+            else:
+                self._arm()
+            return df
+
+    def __iter__(self):
+        while not self.done:
+            page = self.next_page()
+            if not page.empty:
+                yield page
+
+    def cancel(self):
+        """Abort the statement on the server; safe to call from another thread."""
+        if self._conn is not None and not self._conn.closed:
+            self._conn.connection.dbapi_connection.cancel()
+
+    def _release(self):
+        if self._idle is not None:
+            self._idle.cancel()
+        if self._conn is not None and not self._conn.closed:
+            if self._result is not None:
+                self._result.close()
+            self._conn.close()          # rolls the read-only transaction back
+
+    def close(self):
+        with self._lock:
+            self._release()
+
+    def __del__(self):
+        if hasattr(self, "_lock"):      # __init__ may have failed before the connection
+            self.close()
@@ -0,0 +1,96 @@
+"""
+Shape-preserving decimation of telemetry for the track map and speed plots.
+
+Two strategies, both bounded by a point budget:
+
+* ``lttb``   – Largest-Triangle-Three-Buckets on the fetched frame (NumPy)
+* ``minmax`` – per time bucket keep the slowest and fastest sample; runs either
+  in NumPy (``minmax``) or inside Postgres (``sql``) so only the decimated rows
+  cross the tunnel.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import queries
+from db import run_query
+
+METHODS = ("lttb", "minmax", "sql")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the ``n`` points LTTB keeps from the finite points of ``(x, y)``."""
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        # a NaN anchor or centroid would make every later triangle area NaN
+        idx = np.flatnonzero(finite)
+        return idx[lttb(x[idx], y[idx], n)]
+    # n - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, size - 1
+
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        # twice the triangle area (a, candidate, next-bucket centroid)
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the min and max ``y`` in each of ``n // 2`` equal-width x buckets."""
+    size = len(x)
+    if n >= size or n < 2:
+        return np.arange(size)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float), nan=-np.inf)
+    edges = np.linspace(x[0], x[-1], n // 2 + 1)[1:-1]
+    bucket = np.searchsorted(edges, x, side="right")
+
+    order = np.lexsort((y, bucket))          # by bucket, then by y
+    sorted_b = bucket[order]
+    first = np.r_[True, sorted_b[1:] != sorted_b[:-1]]
+    last = np.r_[sorted_b[1:] != sorted_b[:-1], True]
+    return np.unique(np.r_[order[first], order[last]])
+
+
+def downsample(df: pd.DataFrame, points: int, method: str = "lttb",
+               x: str = "t", y: str = "speed") -> pd.DataFrame:
+    """Decimate ``df`` (sorted by ``x``) to at most ``points`` rows."""
+    if len(df) <= points:
+        return df
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype("datetime64[ns]").astype(np.int64)
+    pick = lttb if method == "lttb" else minmax
+    return df.iloc[pick(xs, df[y].to_numpy(), points)].reset_index(drop=True)
+
+
+def fetch_telemetry(session_id: int, driver_id: int, lap_number: Optional[int] = None,
+                    points: int = 1500, method: str = "lttb") -> pd.DataFrame:
+    """
+    Telemetry for one driver (optionally one lap), decimated to ``points`` rows.
+
+    ``method="sql"`` buckets inside Postgres; the other methods fetch the full
+    per-second series (cached by ``run_query``) and decimate it with NumPy.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    params = dict(sid=session_id, did=driver_id, lap=lap_number)
+    if method == "sql":
+        return run_query(queries.TELEMETRY_MINMAX, buckets=max(points // 2, 1), **params)
+    df = run_query(queries.TELEMETRY, **params)
+    return downsample(df, points, method)
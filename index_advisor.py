@@ -0,0 +1,472 @@
+"""
+Recommend indexes for the joins and filters behind the dashboard.
+
+The advisor reads the live definitions of every view and materialized view
+plus the SQL in ``queries.py`` and ``track_projection.py``, and collects per
+relation the sets of columns compared with ``=`` in one ``ON``/``USING``/
+``WHERE`` clause (an *access pattern*).  Filters on plain views are traced
+back to the base table column they select.  A pattern is covered when an
+index starts with exactly those columns, in any order.
+
+``pg_stat_user_tables`` and ``pg_stat_user_indexes`` add what the server saw:
+tables mostly read by sequential scans and indexes that were never used.
+
+    python index_advisor.py                            # report
+    python index_advisor.py --write base_table_indexes # sql/migrations/NNN_*.sql
+    python index_advisor.py --apply sql/migrations/001_base_table_indexes.sql
+
+``--apply`` times the app's read-only SQL and records its scan nodes before
+and after running the migration (see ``migrate.py``).
+"""
+import argparse
+import json
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+
+import migrate
+import queries
+import track_projection
+
+# modules whose upper-case string constants are SQL the app runs
+SQL_MODULES = [queries, track_projection]
+
+SCHEMAS = ("public", "analysis")
+MIN_ROWS = 1000                 # smaller tables are scanned faster than probed
+
+CATALOG_SQL = """
+SELECT n.nspname || '.' || c.relname AS name, c.relkind AS kind,
+       greatest(c.reltuples, 0)::bigint AS rows,
+       array_agg(a.attname::text ORDER BY a.attnum) AS columns
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+WHERE n.nspname IN ('public', 'analysis') AND c.relkind IN ('r', 'p', 'v', 'm')
+  AND NOT c.relispartition
+GROUP BY 1, 2, 3
+"""
+
+INDEXES_SQL = """
+SELECT n.nspname || '.' || t.relname AS relation, i.relname AS index,
+       x.indisunique AS is_unique,
+       array(SELECT a.attname::text
+             FROM unnest(x.indkey) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+             ORDER BY k.ord) AS columns
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname IN ('public', 'analysis') AND NOT t.relispartition
+  AND x.indpred IS NULL AND x.indexprs IS NULL
+"""
+
+DEFINITIONS_SQL = """
+SELECT schemaname || '.' || viewname, definition FROM pg_views
+WHERE schemaname IN ('public', 'analysis')
+UNION ALL
+SELECT schemaname || '.' || matviewname, definition FROM pg_matviews
+WHERE schemaname IN ('public', 'analysis')
+"""
+
+SEQ_HEAVY_SQL = """
+SELECT schemaname || '.' || relname AS relation, seq_scan, seq_tup_read,
+       coalesce(idx_scan, 0) AS idx_scan
+FROM pg_stat_user_tables
+WHERE schemaname IN ('public', 'analysis')
+  AND seq_scan > coalesce(idx_scan, 0)
+  AND seq_tup_read / greatest(seq_scan, 1) >= :min_rows
+ORDER BY seq_tup_read DESC
+"""
+
+UNUSED_SQL = """
+SELECT s.schemaname || '.' || s.relname AS relation, s.indexrelname AS index,
+       pg_relation_size(s.indexrelid) AS bytes
+FROM pg_stat_user_indexes s
+JOIN pg_index x ON x.indexrelid = s.indexrelid
+JOIN pg_class t ON t.oid = s.relid
+WHERE s.schemaname IN ('public', 'analysis') AND s.idx_scan = 0
+  AND NOT x.indisunique AND NOT t.relispartition      -- unique ones enforce constraints
+ORDER BY bytes DESC
+"""
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_CAST_RE = re.compile(r"::(?:character varying|double precision|"
+                      r"timestamp (?:with|without) time zone|\w+)(?:\[\])?", re.I)
+_CLAUSE_RE = re.compile(
+    r"\b(SELECT|FROM|JOIN|ON|USING|WHERE|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|"
+    r"WINDOW|LEFT|RIGHT|INNER|FULL|CROSS|LATERAL)\b", re.I)
+_RELATION_RE = re.compile(r"\s*\(*\s*([a-z_][\w.]*)(?:\s+(?:AS\s+)?([a-z_]\w*))?", re.I)
+_COLUMN_RE = re.compile(r"(?:([a-z_]\w*)\.)?([a-z_]\w*)", re.I)
+_BETWEEN_RE = re.compile(r"([\w.]+)\s+BETWEEN\s+(.+?)\s+AND\s+", re.I)
+_COMPARE_RE = re.compile(r"^(.+?)\s*(<>|!=|<=|>=|=|<|>)\s*(.+)$", re.S)
+_SELECT_ITEM_RE = re.compile(r"^([a-z_]\w*)\.([a-z_]\w*)(?:\s+AS\s+([a-z_]\w*))?$", re.I)
+_LITERALS = {"null", "true", "false"}
+
+
+@dataclass
+class Relation:
+    name: str                       # schema.name
+    kind: str                       # r, p, v or m
+    rows: int
+    columns: list[str]
+    indexes: dict[str, list[str]] = field(default_factory=dict)
+    lineage: dict[str, tuple[str, str]] = field(default_factory=dict)  # views only
+
+
+@dataclass
+class Pattern:
+    relation: str
+    columns: frozenset
+    ranges: set[str] = field(default_factory=set)
+    sources: set[str] = field(default_factory=set)
+
+
+@dataclass
+class Recommendation:
+    relation: str
+    columns: tuple[str, ...]
+    sources: set[str]
+    rows: int
+
+    @property
+    def name(self) -> str:
+        table = self.relation.split(".")[-1]
+        return f"ix_{table}_{'_'.join(self.columns)}"[:63]
+
+    @property
+    def ddl(self) -> str:
+        return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name}\n"
+                f"    ON {self.relation} ({', '.join(self.columns)});")
+
+
+# ─── Catalog ────────────────────────────────────────────────────────
+def catalog(con) -> dict[str, Relation]:
+    rels = {r.name: Relation(r.name, r.kind, r.rows, list(r.columns))
+            for r in con.execute(text(CATALOG_SQL))}
+    for r in con.execute(text(INDEXES_SQL)):
+        if r.relation in rels:
+            rels[r.relation].indexes[r.index] = list(r.columns)
+    return rels
+
+
+def _lookup(rels: dict[str, Relation], name: str) -> Optional[Relation]:
+    """Resolve a possibly unqualified name the way ``public, analysis`` would."""
+    if "." in name:
+        return rels.get(name.lower())
+    return next((rels[f"{s}.{name.lower()}"] for s in SCHEMAS
+                 if f"{s}.{name.lower()}" in rels), None)
+
+
+def app_sql() -> dict[str, str]:
+    """Every SQL constant the app runs, keyed ``module.NAME``."""
+    return {f"{mod.__name__}.{name}": sql
+            for mod in SQL_MODULES for name, sql in vars(mod).items()
+            if name.isupper() and isinstance(sql, str) and _CLAUSE_RE.search(sql)}
+
+
+# ─── SQL parsing ────────────────────────────────────────────────────
+def _balanced(chunk: str) -> str:
+    """Cut a clause at the parenthesis that closes an enclosing subquery."""
+    depth = 0
+    for i, ch in enumerate(chunk):
+        depth += {"(": 1, ")": -1}.get(ch, 0)
+        if depth < 0:
+            return chunk[:i]
+    return chunk
+
+
+def _operand(s: str):
+    """``(alias, column)`` if the operand is a plain column reference."""
+    s = s.strip().strip("()").strip()
+    m = _COLUMN_RE.fullmatch(s)
+    if not m or m.group(2).lower() in _LITERALS:
+        return None
+    return (m.group(1) or "").lower(), m.group(2).lower()
+
+
+def _conditions(clause: str):
+    """Yield ``(operand, kind)`` for every column in ``=``/range comparisons."""
+    clause = _BETWEEN_RE.sub(lambda m: f"{m.group(1)} >= {m.group(2)} AND ", clause)
+    for conj in re.split(r"\bAND\b", clause, flags=re.I):
+        if re.search(r"\bOR\b", conj, re.I):
+            continue
+        m = _COMPARE_RE.match(conj.strip().lstrip("("))
+        if not m or m.group(2) in ("<>", "!="):
+            continue
+        kind = "eq" if m.group(2) == "=" else "range"
+        for side in (m.group(1), m.group(3)):
+            col = _operand(side)
+            if col:
+                yield col, kind
+
+
+def parse(sql: str, rels: dict[str, Relation]) -> list[tuple[str, frozenset, set]]:
+    """``(relation, equality columns, range columns)`` per clause and relation."""
+    sql = _CAST_RE.sub("", _COMMENT_RE.sub(" ", sql))
+    parts = _CLAUSE_RE.split(sql)
+    aliases, order = {}, []          # alias -> relation; relations as they appear
+    clauses = []                     # (keyword, text, relation of the last FROM/JOIN)
+    current = None
+    for kw, chunk in zip(parts[1::2], parts[2::2]):
+        kw = kw.upper()
+        if kw in ("FROM", "JOIN"):
+            m = _RELATION_RE.match(chunk)
+            rel = _lookup(rels, m.group(1)) if m else None
+            current = rel.name if rel else None
+            if rel:
+                aliases[(m.group(2) or m.group(1).split(".")[-1]).lower()] = rel.name
+                aliases.setdefault(rel.name.split(".")[-1], rel.name)
+                order.append(rel.name)
+        elif kw in ("ON", "WHERE", "USING"):
+            clauses.append((kw, _balanced(chunk), current))
+
+    found = []
+    for kw, clause, current in clauses:
+        eq, ranges = defaultdict(set), defaultdict(set)
+        if kw == "USING":
+            if current:
+                inner = clause.strip().lstrip("(").split(")")[0]
+                eq[current] |= {c.strip().lower() for c in inner.split(",")}
+        else:
+            for (alias, col), kind in _conditions(clause):
+                if alias:
+                    rel = aliases.get(alias)
+                else:                # unqualified: the nearest FROM first
+                    rel = next((r for r in [current] + order[::-1]
+                                if r and col in rels[r].columns), None)
+                if rel and col in rels[rel].columns:
+                    (eq if kind == "eq" else ranges)[rel].add(col)
+        for rel in set(eq) | set(ranges):
+            found.append((rel, frozenset(eq[rel]), ranges[rel]))
+    return found
+
+
+def _lineage(definition: str, rels: dict[str, Relation]) -> dict[str, tuple[str, str]]:
+    """Output column of a view -> the ``(relation, column)`` it selects."""
+    sql = _CAST_RE.sub("", _COMMENT_RE.sub(" ", definition))
+    parts = _CLAUSE_RE.split(sql)
+    aliases = {}
+    for kw, chunk in zip(parts[1::2], parts[2::2]):
+        m = _RELATION_RE.match(chunk) if kw.upper() in ("FROM", "JOIN") else None
+        rel = _lookup(rels, m.group(1)) if m else None
+        if rel:
+            aliases[(m.group(2) or m.group(1).split(".")[-1]).lower()] = rel.name
+    select = parts[2] if len(parts) > 2 and parts[1].upper() == "SELECT" else ""
+    out = {}
+    for item in select.split(","):
+        m = _SELECT_ITEM_RE.match(item.strip())
+        if m and m.group(1).lower() in aliases:
+            out[(m.group(3) or m.group(2)).lower()] = (aliases[m.group(1).lower()],
+                                                       m.group(2).lower())
+    return out
+
+
+def _to_base(rels: dict[str, Relation], rel: str, cols: set) -> dict[str, set]:
+    """Map columns of a plain view to the relations behind them."""
+    out = defaultdict(set)
+    for col in cols:
+        r, c = rel, col
+        while rels[r].kind == "v" and c in rels[r].lineage:
+            r, c = rels[r].lineage[c]
+        if rels[r].kind != "v":
+            out[r].add(c)
+    return out
+
+
+# ─── Analysis ───────────────────────────────────────────────────────
+def access_patterns(con, rels: dict[str, Relation]) -> dict[tuple, Pattern]:
+    sources = dict(con.execute(text(DEFINITIONS_SQL)).all())
+    for name, definition in sources.items():
+        if rels[name].kind == "v":
+            rels[name].lineage = _lineage(definition, rels)
+    sources.update(app_sql())
+
+    patterns = {}
+    for source, sql in sources.items():
+        for rel, eq, ranges in parse(sql, rels):
+            for base, cols in _to_base(rels, rel, eq).items():
+                p = patterns.setdefault((base, frozenset(cols)),
+                                        Pattern(base, frozenset(cols)))
+                p.sources.add(source.split(".")[-1])
+                p.ranges |= _to_base(rels, rel, ranges).get(base, set())
+    return {k: p for k, p in patterns.items() if p.columns}
+
+
+def covering_index(rel: Relation, columns: frozenset) -> Optional[str]:
+    return next((name for name, cols in rel.indexes.items()
+                 if set(cols[:len(columns)]) == columns), None)
+
+
+def recommend(rels: dict[str, Relation], patterns: dict[tuple, Pattern],
+              min_rows: int = MIN_ROWS) -> list[Recommendation]:
+    """
+    One index per uncovered pattern on tables of at least ``min_rows`` rows.
+
+    Columns used by more patterns go first.  An index is widened with the
+    other columns (and the range column) of the largest pattern containing
+    it, and dropped when another recommendation already starts with its
+    columns.
+    """
+    by_rel = defaultdict(list)
+    for p in patterns.values():
+        by_rel[p.relation].append(p)
+
+    out = []
+    for name, pats in sorted(by_rel.items()):
+        rel = rels[name]
+        if rel.kind not in ("r", "p") or rel.rows < min_rows:
+            continue
+        freq = Counter(c for p in pats for c in p.columns)
+        rank = lambda c: (-freq[c], c)
+        chosen = []
+        for p in pats:
+            if covering_index(rel, p.columns):
+                continue
+            wider = max((q for q in pats if p.columns <= q.columns),
+                        key=lambda q: len(q.columns))
+            cols = sorted(p.columns, key=rank) + sorted(wider.columns - p.columns, key=rank)
+            cols += sorted((wider.ranges | p.ranges) - set(cols))[:1]
+            chosen.append(Recommendation(name, tuple(cols), set(p.sources), rel.rows))
+        chosen.sort(key=lambda r: -len(r.columns))
+        for r in chosen:
+            same = next((o for o in out if o.relation == r.relation
+                         and set(o.columns[:len(r.columns)]) == set(r.columns)), None)
+            if same:
+                same.sources |= r.sources
+            else:
+                out.append(r)
+    return out
+
+
+def report(con, rels, patterns, recs, min_rows: int = MIN_ROWS):
+    print(f"🔍 {len(patterns)} access patterns on {len({p.relation for p in patterns.values()})}"
+          f" relations")
+    for p in sorted(patterns.values(), key=lambda p: (p.relation, sorted(p.columns))):
+        rel = rels[p.relation]
+        cols = f"{p.relation} ({', '.join(sorted(p.columns))})"
+        used_by = ", ".join(sorted(p.sources))
+        index = covering_index(rel, p.columns)
+        if index:
+            print(f"✅ {cols:<60} {index}")
+        elif rel.kind not in ("r", "p"):
+            print(f"ℹ️ {cols:<60} add an index to the view's SQL  ← {used_by}")
+        elif rel.rows < min_rows:
+            print(f"💤 {cols:<60} only {rel.rows:,} rows  ← {used_by}")
+        else:
+            print(f"❌ {cols:<60} {rel.rows:,} rows  ← {used_by}")
+
+    print(f"\n🛠 {len(recs)} recommended index(es)")
+    for r in recs:
+        print(f"   {r.relation} ({', '.join(r.columns)})")
+
+    heavy = con.execute(text(SEQ_HEAVY_SQL), {"min_rows": min_rows}).all()
+    if heavy:
+        print("\n📉 read mostly by sequential scans")
+        for h in heavy:
+            print(f"   {h.relation:<40} {h.seq_scan:>8,} seq scans, {h.seq_tup_read:>14,} rows"
+                  f" read, {h.idx_scan:>8,} index scans")
+    unused = con.execute(text(UNUSED_SQL)).all()
+    if unused:
+        print("\n🗑 never scanned since the last stats reset")
+        for u in unused:
+            print(f"   {u.index:<50} {u.relation:<35} {u.bytes / 2**20:8.1f} MB")
+
+
+# ─── Migrations and timings ─────────────────────────────────────────
+def write_migration(recs: list[Recommendation], name: str,
+                    directory: Path = migrate.MIGRATIONS_DIR) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    v = migrate.next_version(directory)
+    path = directory / f"{v:03d}_{name}.sql"
+    title = name.replace("_", " ").capitalize()
+    lines = [
+        "/*---------------------------------------------------------------",
+        f"  {v:03d}  {title}",
+        "  ---------------------------------------------------------------",
+        f"  Written by index_advisor.py on {datetime.now(timezone.utc):%Y-%m-%d}.",
+        "  Apply with  python migrate.py",
+        "----------------------------------------------------------------*/",
+    ]
+    for r in recs:
+        lines += ["", f"-- {', '.join(sorted(r.sources))}", r.ddl]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def _scans(plan) -> set[str]:
+    """``relation: node type`` of every scan in an EXPLAIN (FORMAT JSON) plan."""
+    found, todo = set(), [plan[0]["Plan"]]
+    while todo:
+        node = todo.pop()
+        if "Relation Name" in node:
+            found.add(f"{node['Relation Name']}: {node['Node Type']}")
+        todo.extend(node.get("Plans", []))
+    return found
+
+
+def before_after(engine, path: Path, repeat: int = 5) -> dict:
+    """Time the app's read-only SQL, apply the migration, time it again."""
+    from benchmarks.bench_views import RESULTS_DIR, bench_queries, sample_params
+
+    out = RESULTS_DIR / f"advisor-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+    params = sample_params(engine)
+    reads = {name.split(".")[-1]: sql for name, sql in app_sql().items()
+             if sql.lstrip().upper().startswith(("SELECT", "WITH"))}
+    before, _, _ = bench_queries(engine, params, repeat, out / "before", reads)
+    seconds = migrate.apply(engine, path)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as con:
+        con.exec_driver_sql("ANALYZE")
+    after, _, _ = bench_queries(engine, params, repeat, out / "after", reads)
+
+    result = {"migration": path.name, "apply_s": seconds, "queries": {}}
+    for plan in sorted((out / "before").glob("*.json")):
+        q = plan.stem
+        was = _scans(json.loads(plan.read_text()))
+        now_path = out / "after" / plan.name
+        now = _scans(json.loads(now_path.read_text())) if now_path.exists() else set()
+        result["queries"][q] = {
+            "before_ms": before.get(f"query/{q}/median"),
+            "after_ms": after.get(f"query/{q}/median"),
+            "scans_before": sorted(was), "scans_after": sorted(now),
+        }
+    (out / "before_after.json").write_text(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    from db import _engine
+
+    ap = argparse.ArgumentParser(description="Report missing and unused indexes.")
+    ap.add_argument("--min-rows", type=int, default=MIN_ROWS,
+                    help="ignore tables smaller than this")
+    ap.add_argument("--write", metavar="NAME",
+                    help="write the recommendations to sql/migrations/NNN_NAME.sql")
+    ap.add_argument("--apply", type=Path, metavar="MIGRATION",
+                    help="apply a migration and time the dashboard queries around it")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.apply:
+        res = before_after(_engine(), args.apply, args.repeat)
+        print(f"✅ {res['migration']} applied in {res['apply_s']:.1f}s")
+        for q, r in res["queries"].items():
+            if r["before_ms"] is None or r["after_ms"] is None:
+                continue
+            seq = sorted(s for s in r["scans_before"] if "Seq Scan" in s
+                         and s not in r["scans_after"])
+            note = f"  no longer: {', '.join(seq)}" if seq else ""
+            print(f"   {q:<20} {r['before_ms']:9.1f} ms → {r['after_ms']:9.1f} ms{note}")
+    else:
+        with _engine().connect() as con:
+            rels = catalog(con)
+            patterns = access_patterns(con, rels)
+            recs = recommend(rels, patterns, args.min_rows)
+            report(con, rels, patterns, recs, args.min_rows)
+        if args.write and recs:
+            print(f"📁 {write_migration(recs, args.write)}")
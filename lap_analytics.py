@@ -0,0 +1,138 @@
+"""
+Lap analytics: tyre degradation, fuel-corrected pace and consistency.
+
+Everything starts from one query per session (``queries.STINT_LAPS``: every
+lap with its stint, tyre age and pit flags).  The statistics are whole-column
+NumPy/pandas operations grouped by session, driver and stint – no Python loop
+per driver or stint – so the same functions handle a whole season's laps at
+once (see ``benchmarks/bench_lap_analytics.py``).
+
+* fuel correction: race laps are made comparable by removing the time the
+  remaining fuel costs, ``FUEL_S_PER_LAP`` per lap still to go;
+* outliers: clean laps further than ``OUTLIER_MAD`` robust deviations from
+  their stint's median (traffic, mistakes, safety cars) are left out;
+* degradation: least-squares slope of the fuel-corrected lap time over the
+  tyre age, per stint.
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import queries
+from db import run_query
+
+FUEL_S_PER_LAP = float(os.getenv("FUEL_S_PER_LAP", "0.06"))
+OUTLIER_MAD = float(os.getenv("LAP_OUTLIER_MAD", "3"))
+MIN_STINT_LAPS = 3          # fewer valid laps: no degradation fit
+ROLLING_LAPS = 5
+_MAD_FLOOR_S = 0.05         # a stint of near-identical laps keeps its slightly slower ones
+
+DRIVER = ["session_id", "driver_id"]
+STINT = DRIVER + ["stint_number"]
+
+
+@dataclass(frozen=True)
+class LapAnalytics:
+    laps: pd.DataFrame        # every lap with fuel_corrected_s, valid and rolling_s
+    stints: pd.DataFrame      # degradation fit and outlier-filtered medians per stint
+    drivers: pd.DataFrame     # pace and consistency per driver, fastest first
+
+
+def _codes(g) -> np.ndarray:
+    """Group number of every row; -1 where a key is missing (a lap outside any stint)."""
+    return g.ngroup().fillna(-1).to_numpy(int)
+
+
+def prepare(laps: pd.DataFrame) -> pd.DataFrame:
+    """Laps in driver order with ``fuel_corrected_s`` and ``valid`` (clean, no outlier)."""
+    laps = laps.sort_values(DRIVER + ["lap_number"], ignore_index=True)
+    t = laps["lap_time_s"].astype(float)
+    to_go = laps.groupby("session_id")["lap_number"].transform("max") - laps["lap_number"]
+    race = (laps["session_type"].astype(str) == "Race").to_numpy()
+    corrected = t - np.where(race, FUEL_S_PER_LAP * to_go, 0.0)
+
+    # robust z-score per stint: |x - median| / (1.4826 · MAD)
+    stint = _codes(laps.groupby(STINT))
+    clean = corrected.where(laps["clean"].fillna(False).astype(bool) & (stint >= 0))
+    dev = (clean - clean.groupby(stint).transform("median")).abs()
+    scale = np.maximum(1.4826 * dev.groupby(stint).transform("median"), _MAD_FLOOR_S)
+    valid = (dev <= OUTLIER_MAD * scale).to_numpy() & (stint >= 0)
+    return laps.assign(lap_time_s=t, fuel_corrected_s=corrected, valid=valid)
+
+
+def degradation(laps: pd.DataFrame) -> pd.DataFrame:
+    """One row per stint: lap counts, medians and the degradation slope (s/lap)."""
+    g = laps.groupby(STINT)
+    lap = g["lap_number"]
+    stints = g[["full_name", "team_colour", "compound"]].first().assign(
+        lap_start=lap.min(), lap_end=lap.max(), num_laps=lap.size())
+
+    # least squares per stint from sums over its group number, centred for precision
+    code = _codes(g)
+    use = laps["valid"].to_numpy() & laps["tyre_age"].notna().to_numpy() & (code >= 0)
+    code = code[use]
+    x = laps["tyre_age"].to_numpy(float)[use]
+    y = laps["fuel_corrected_s"].to_numpy()[use]
+    k = len(stints)
+    n = np.bincount(code, minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = x - (np.bincount(code, x, k) / n)[code]
+        dy = y - (np.bincount(code, y, k) / n)[code]
+        sxx, sxy, syy = (np.bincount(code, w, k) for w in (dx * dx, dx * dy, dy * dy))
+        ok = (n >= MIN_STINT_LAPS) & (sxx > 0)
+        slope = np.where(ok, sxy / sxx, np.nan)
+        r2 = np.where(ok & (syy > 0), sxy ** 2 / (sxx * syy), np.nan)
+
+    by_code = np.arange(k)
+    return stints.assign(
+        valid_laps=n,
+        median_s=pd.Series(laps["lap_time_s"].to_numpy()[use]).groupby(code).median()
+        .reindex(by_code).to_numpy(),
+        corrected_median_s=pd.Series(y).groupby(code).median().reindex(by_code).to_numpy(),
+        deg_s_per_lap=slope,
+        r2=r2,
+    ).reset_index()
+
+
+def rolling_pace(laps: pd.DataFrame, window: int = ROLLING_LAPS) -> pd.Series:
+    """Rolling median of each driver's valid fuel-corrected laps (NaN elsewhere)."""
+    v = laps[laps["valid"]]
+    rolled = v.groupby(DRIVER)["fuel_corrected_s"].rolling(window, min_periods=1).median()
+    return rolled.droplevel(list(range(len(DRIVER)))).reindex(laps.index)
+
+
+def consistency(laps: pd.DataFrame) -> pd.DataFrame:
+    """One row per driver: outlier-filtered median pace, spread and share of valid laps."""
+    g = laps.groupby(DRIVER)
+    code = _codes(g)
+    valid = laps["valid"].to_numpy() & (code >= 0)
+    code = code[valid]
+    pace = pd.Series(laps["fuel_corrected_s"].to_numpy()[valid]).groupby(code)
+    q1, q3 = pace.quantile(0.25), pace.quantile(0.75)
+    n = np.bincount(code, minlength=g.ngroups)
+    stats = pd.DataFrame({
+        "valid_laps": n,
+        "median_s": pd.Series(laps["lap_time_s"].to_numpy()[valid]).groupby(code).median(),
+        "corrected_median_s": pace.median(),
+        "std_s": pace.std(),
+        "iqr_s": q3 - q1,
+        "cv_pct": pace.std() / pace.mean() * 100,
+        "valid_pct": n / g.size().to_numpy() * 100,
+    }, index=np.arange(g.ngroups))
+    drivers = g[["full_name", "team_colour"]].first()
+    drivers = pd.concat([drivers, stats.set_axis(drivers.index)], axis=1)
+    return drivers[drivers["valid_laps"] > 0].sort_values("corrected_median_s").reset_index()
+
+
+def analyse(laps: pd.DataFrame) -> LapAnalytics:
+    """All statistics for the rows of ``queries.STINT_LAPS`` (any number of sessions)."""
+    laps = prepare(laps)
+    laps = laps.assign(rolling_s=rolling_pace(laps))
+    return LapAnalytics(laps=laps, stints=degradation(laps), drivers=consistency(laps))
+
+
+def session_analytics(session_id: int) -> LapAnalytics:
+    """``analyse`` for one session, from a single (cached) query."""
+    return analyse(run_query(queries.STINT_LAPS, sid=session_id))
@@ -0,0 +1,94 @@
+"""
+Versioned schema migrations in ``sql/migrations``.
+
+Files are named ``NNN_description.sql`` and applied in version order; every
+applied version is recorded in ``public.schema_migrations``.  Statements run
+one at a time outside a transaction so ``CREATE INDEX CONCURRENTLY`` works,
+which is also why each statement must be safe to re-run (``IF NOT EXISTS``).
+
+    python migrate.py            # apply pending migrations to the PG* database
+    python migrate.py --list
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+MIGRATIONS_DIR = Path(__file__).parent / "sql" / "migrations"
+
+_NAME_RE = re.compile(r"^(\d{3})_(\w+)\.sql$")
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+
+TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+    version    int PRIMARY KEY,
+    name       text        NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+
+def version(path: Path) -> int:
+    m = _NAME_RE.match(path.name)
+    if not m:
+        raise ValueError(f"{path.name}: migrations are named NNN_description.sql")
+    return int(m.group(1))
+
+
+def available(directory: Path = MIGRATIONS_DIR) -> list[Path]:
+    return sorted(directory.glob("[0-9][0-9][0-9]_*.sql"), key=version)
+
+
+def next_version(directory: Path = MIGRATIONS_DIR) -> int:
+    return max((version(p) for p in available(directory)), default=0) + 1
+
+
+def statements(path: Path) -> list[str]:
+    """The file's statements, comments stripped (no functions or DO blocks)."""
+    sql = _COMMENT_RE.sub(" ", path.read_text())
+    return [s.strip() for s in sql.split(";") if s.strip()]
+
+
+def applied(engine) -> set[int]:
+    with engine.begin() as con:
+        con.execute(text(TABLE_SQL))
+        return set(con.execute(text("SELECT version FROM public.schema_migrations")).scalars())
+
+
+def apply(engine, path: Path) -> float:
+    """Run one migration (unless already recorded); returns the seconds it took."""
+    if version(path) in applied(engine):
+        return 0.0
+    t0 = time.perf_counter()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as con:
+        for stmt in statements(path):
+            con.exec_driver_sql(stmt)
+        con.execute(text("INSERT INTO public.schema_migrations (version, name) "
+                         "VALUES (:v, :n)"), {"v": version(path), "n": path.stem})
+    return time.perf_counter() - t0
+
+
+def apply_pending(engine, directory: Path = MIGRATIONS_DIR) -> list[tuple[Path, float]]:
+    done = applied(engine)
+    return [(p, apply(engine, p)) for p in available(directory) if version(p) not in done]
+
+
+if __name__ == "__main__":
+    from db import _engine
+
+    ap = argparse.ArgumentParser(description="Apply the migrations in sql/migrations.")
+    ap.add_argument("--list", action="store_true", help="show applied and pending versions")
+    args = ap.parse_args()
+
+    if args.list:
+        done = applied(_engine())
+        for p in available():
+            print(f"{'✅' if version(p) in done else '⏳'} {p.name}")
+    else:
+        ran = apply_pending(_engine())
+        for p, seconds in ran:
+            print(f"✅ {p.name} in {seconds:.1f}s")
+        if not ran:
+            print("ℹ️ nothing to apply")
@@ -0,0 +1,198 @@
+"""
+Where does the time go on a dashboard rerun?
+
+``instrument(engine)`` hooks SQLAlchemy's cursor events and records latency and
+rows of every statement; ``db`` adds the size of the DataFrame built from it.
+``app.py`` marks the active tab with ``tab(...)`` and times DataFrame prep and
+chart drawing with ``timed(...)``.  Everything lands in one process-wide
+``Recorder``: the last events for the "⏱ Performance" panel plus running
+totals for export.
+
+``PERF_EXPORT=metrics.prom`` writes a Prometheus text file (for the node
+exporter's textfile collector) after every rerun; any other file name appends
+one JSON object per event instead.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import event
+
+EXPORT_PATH = os.getenv("PERF_EXPORT")
+MAX_EVENTS = int(os.getenv("PERF_MAX_EVENTS", "2000"))
+
+_TAB: ContextVar[Optional[str]] = ContextVar("perf_tab", default=None)
+_RUN: ContextVar[Optional[int]] = ContextVar("perf_run", default=None)
+_LAST: ContextVar[Optional[dict]] = ContextVar("perf_last_query", default=None)
+
+_FROM_RE = re.compile(r"\bfrom\s+([a-z_][\w.]*)", re.I)
+
+
+def relation(sql: str) -> str:
+    """First relation read by ``sql`` – good enough to name the view behind a query."""
+    m = _FROM_RE.search(sql)
+    return m.group(1).lower() if m else "-"
+
+
+class Recorder:
+    """Thread-safe ring buffer of events plus totals per (kind, tab, name)."""
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self.events: deque = deque(maxlen=max_events)
+        self.totals: dict[tuple, list] = {}        # -> [count, seconds, rows, bytes]
+        self._lock = threading.Lock()
+        self._runs = 0
+
+    def new_run(self) -> int:
+        with self._lock:
+            self._runs += 1
+            return self._runs
+
+    def add(self, kind: str, name: str, seconds: float, rows: int = 0, nbytes: int = 0) -> dict:
+        ev = {"ts": time.time(), "run": _RUN.get(), "tab": _TAB.get() or "-",
+              "kind": kind, "name": name, "seconds": seconds, "rows": rows, "bytes": nbytes}
+        with self._lock:
+            self.events.append(ev)
+            tot = self.totals.setdefault((kind, ev["tab"], name), [0, 0.0, 0, 0])
+            tot[0] += 1
+            tot[1] += seconds
+            tot[2] += rows
+            tot[3] += nbytes
+        return ev
+
+    def add_result(self, ev: Optional[dict], rows: int, nbytes: int):
+        """Attach the size of the frame built from a query to its event."""
+        if ev is None:
+            return
+        if ev.get("rows_known"):
+            rows = 0                    # the cursor already reported them
+        with self._lock:
+            tot = self.totals[(ev["kind"], ev["tab"], ev["name"])]
+            tot[2] += rows
+            tot[3] += nbytes
+            ev["rows"] += rows
+            ev["bytes"] += nbytes
+
+    def run_events(self, run: int) -> pd.DataFrame:
+        with self._lock:
+            rows = [e for e in self.events if e["run"] == run]
+        return pd.DataFrame(rows, columns=["ts", "run", "tab", "kind", "name",
+                                           "seconds", "rows", "bytes"])
+
+    def prometheus(self) -> str:
+        with self._lock:
+            totals = dict(self.totals)
+        lines = []
+        for metric, i, help_ in [("seconds_total", 1, "Time spent"),
+                                 ("count_total", 0, "Number of calls"),
+                                 ("rows_total", 2, "Rows returned"),
+                                 ("bytes_total", 3, "DataFrame bytes returned")]:
+            lines += [f"# HELP f1_dashboard_{metric} {help_} per kind, tab and name.",
+                      f"# TYPE f1_dashboard_{metric} counter"]
+            for (kind, tab, name), tot in sorted(totals.items()):
+                labels = ",".join(f'{k}="{_escape(v)}"'
+                                  for k, v in (("kind", kind), ("tab", tab), ("name", name)))
+                lines.append(f"f1_dashboard_{metric}{{{labels}}} {tot[i]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+RECORDER = Recorder()
+
+
+# ─── Context ────────────────────────────────────────────────────────
+def start_run() -> int:
+    """Mark the start of a script run; later events carry its id."""
+    run = RECORDER.new_run()
+    _RUN.set(run)
+    return run
+
+
+@contextmanager
+def tab(name: str):
+    token = _TAB.set(name)
+    try:
+        yield
+    finally:
+        _TAB.reset(token)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the block took as a ``stage`` event of the current tab."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        RECORDER.add("stage", stage, time.perf_counter() - t0)
+
+
+# ─── SQLAlchemy hooks ───────────────────────────────────────────────
+def instrument(engine):
+    """Record every statement executed through ``engine``."""
+    if getattr(engine, "_perf_instrumented", False):
+        return engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("perf_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["perf_t0"].pop()
+        ev = RECORDER.add("query", relation(statement), seconds, max(cursor.rowcount, 0))
+        ev["rows_known"] = cursor.rowcount >= 0      # -1 for server-side cursors
+        _LAST.set(ev)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        # a statement that failed never reaches after_cursor_execute; errors while
+        # fetching (no statement) or while compiling (no context, no push) are skipped
+        stack = ctx.connection.info.get("perf_t0") if ctx.connection is not None else None
+        if ctx.statement is None or ctx.execution_context is None or not stack:
+            return
+        ev = RECORDER.add("query", relation(ctx.statement), time.perf_counter() - stack.pop(), 0)
+        ev["failed"] = True
+        _LAST.set(ev)
+
+    engine._perf_instrumented = True
+    return engine
+
+
+def last_query() -> Optional[dict]:
+    """The event of the statement most recently executed in this context."""
+    return _LAST.get()
+
+
+def note_frame(df: pd.DataFrame, ev: Optional[dict] = None):
+    """Add rows and bytes of ``df`` to ``ev`` (default: the last query)."""
+    RECORDER.add_result(ev if ev is not None else _LAST.get(),
+                        len(df), int(df.memory_usage(deep=True).sum()))
+
+
+# ─── Export ─────────────────────────────────────────────────────────
+def export(run: Optional[int] = None, path: Optional[str] = EXPORT_PATH):
+    """Write totals (``.prom``) or append the run's events (JSON lines) to ``path``."""
+    if not path:
+        return
+    path = Path(path)
+    if path.suffix == ".prom":
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(RECORDER.prometheus())
+        tmp.replace(path)                       # collectors never see a half-written file
+        return
+    events = RECORDER.run_events(run if run is not None else _RUN.get())
+    with path.open("a") as f:
+        for ev in events.to_dict("records"):
+            f.write(json.dumps(ev) + "\n")
@@ -0,0 +1,158 @@
+"""
+SQL behind the dashboard tabs.
+
+Kept in one place so the tabs and the prefetcher issue byte-identical
+statements and therefore share entries in the ``db.run_query`` cache.
+"""
+
+# every session with its meeting, in calendar order – loaded once into catalog.Catalog
+CATALOG = """
+    SELECT s.session_id,
+           s.session_name,
+           s.session_type,
+           s.start_time,
+           m.meeting_id,
+           m.meeting_name,
+           m.year,
+           m.start
+    FROM session s
+    JOIN meeting m ON m.meeting_id = s.meeting_id
+    ORDER BY m.start, s.start_time
+"""
+
+SESSION_RESULTS = "SELECT * FROM v_session_results WHERE session_id = :sid ORDER BY position"
+
+# clean laps only: no opening lap, in-lap or out-lap
+LAP_PACE = """
+    SELECT full_name, lap_number, lap_time_s, compound, tyre_age
+    FROM analysis.mv_lap_detail
+    WHERE session_id = :sid AND clean
+    ORDER BY lap_number
+"""
+
+STINT_SUMMARY = """
+    SELECT
+        driver_id,
+        full_name,
+        team_name,
+        team_colour,
+        stint_number,
+        compound,
+        best_lap_s
+    FROM analysis.mv_stint_summary
+    WHERE session_id = :sid
+"""
+
+# every lap with its stint and pit flags – the input of lap_analytics
+STINT_LAPS = """
+    SELECT ld.session_id, ld.driver_id, ld.full_name, ld.team_colour, ld.lap_number,
+           ld.lap_time_s, ld.stint_number, ld.compound, ld.tyre_age, ld.clean,
+           s.session_type
+    FROM analysis.mv_lap_detail ld
+    JOIN session s USING (session_id)
+    WHERE ld.session_id = :sid
+    ORDER BY ld.driver_id, ld.lap_number
+"""
+
+PIT_STOPS = """
+    SELECT *
+    FROM analysis.mv_pit_stop_timeline
+    WHERE session_id = :sid
+"""
+
+SECTOR_BESTS = "SELECT * FROM analysis.mv_sector_performance WHERE session_id = :sid"
+
+# one row per driver and lap; a few thousand rows instead of raw position/intervals
+RACE_TRACE = """
+    SELECT driver_id, full_name, team_colour, lap_number, position,
+           gap_to_leader, gap_to_next
+    FROM analysis.mv_race_trace
+    WHERE session_id = :sid
+    ORDER BY lap_number, position
+"""
+
+SEASON_SUMMARY = "SELECT * FROM analysis.mv_driver_summary_season WHERE year = :y"
+
+# ─── Track map / telemetry ──────────────────────────────────────────
+SESSION_DRIVERS = """
+    SELECT d.driver_id, d.full_name
+    FROM team_membership tm
+    JOIN driver d USING (driver_id)
+    WHERE tm.session_id = :sid
+    ORDER BY d.full_name
+"""
+
+DRIVER_LAPS = """
+    SELECT lap_number
+    FROM lap
+    WHERE session_id = :sid AND driver_id = :did
+    ORDER BY lap_number
+"""
+
+TELEMETRY = """
+    SELECT t, lap_number, x, y, speed, gear, throttle, brake_is_pressed
+    FROM analysis.mv_track_projection
+    WHERE session_id = :sid AND driver_id = :did
+      AND (CAST(:lap AS int) IS NULL OR lap_number = :lap)
+    ORDER BY t
+"""
+
+# slowest and fastest sample per equal-width time bucket, decimated in Postgres
+TELEMETRY_MINMAX = """
+    WITH s AS (
+        SELECT t, lap_number, x, y, speed, gear, throttle, brake_is_pressed
+        FROM analysis.mv_track_projection
+        WHERE session_id = :sid AND driver_id = :did
+          AND (CAST(:lap AS int) IS NULL OR lap_number = :lap)
+    ), b AS (
+        SELECT s.*,
+               width_bucket(extract(epoch FROM t),
+                            min(extract(epoch FROM t)) OVER (),
+                            max(extract(epoch FROM t)) OVER () + 1e-6,
+                            :buckets) AS bucket
+        FROM s
+    ), r AS (
+        SELECT b.*,
+               row_number() OVER (PARTITION BY bucket ORDER BY speed ASC NULLS LAST, t)  AS lo,
+               row_number() OVER (PARTITION BY bucket ORDER BY speed DESC NULLS LAST, t) AS hi
+        FROM b
+    )
+    SELECT t, lap_number, x, y, speed, gear, throttle, brake_is_pressed
+    FROM r
+    WHERE lo = 1 OR hi = 1
+    ORDER BY t
+"""
+
+# ─── Comparison (one set-based query per dataset) ───────────────────
+SEASON_RACES = """
+    SELECT s.session_id,
+           m.year,
+           m.meeting_name AS label,
+           s.session_name,
+           m.start
+    FROM session s
+    JOIN meeting m ON m.meeting_id = s.meeting_id
+    WHERE m.year = ANY(:years)
+      AND s.session_type = 'Race'
+    ORDER BY m.start
+"""
+
+COMPARE_RESULTS = """
+    SELECT session_id, acronym, full_name, team_name, team_colour, position, points
+    FROM v_session_results
+    WHERE session_id = ANY(:ids)
+"""
+
+COMPARE_LAPS = """
+    SELECT session_id, driver_id, full_name, team_colour, lap_number, lap_time_s,
+           stint_number, compound, tyre_age
+    FROM analysis.mv_lap_detail
+    WHERE session_id = ANY(:ids) AND clean
+"""
+
+COMPARE_STINTS = """
+    SELECT session_id, driver_id, full_name, team_name, stint_number, compound,
+           lap_start, lap_end, num_laps, avg_lap_s, best_lap_s
+    FROM analysis.mv_stint_summary
+    WHERE session_id = ANY(:ids)
+"""
@@ -0,0 +1,205 @@
+"""
+Refresh the analysis views when, and only where, their base tables change.
+
+Changes come from one of two feeds:
+
+* ``notify`` – ``LISTEN f1_table_changed``, fed by the statement-level
+  triggers in ``sql/create_change_notify.sql`` (``--install`` applies them);
+* ``poll``   – insert/update/delete counters in ``pg_stat_user_tables``,
+  compared every ``--interval`` seconds; needs no schema changes.
+
+Changed tables are collected until ingestion has been quiet for ``--quiet``
+seconds (or ``--max-delay`` has passed since the first change), mapped to the
+views in ``refresh_views.VIEWS`` that read them and refreshed in dependency
+order.  Every refresh is announced to running dashboards.
+
+    python refresh_daemon.py --install
+    python refresh_daemon.py --mode poll --interval 5
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+import refresh_views
+from db import _engine, _listen
+
+CHANGED_CHANNEL = "f1_table_changed"
+NOTIFY_FILE = Path(__file__).parent / "sql" / "create_change_notify.sql"
+
+QUIET_S = float(os.getenv("REFRESH_QUIET_S", "2"))
+MAX_DELAY_S = float(os.getenv("REFRESH_MAX_DELAY_S", "30"))
+POLL_INTERVAL_S = float(os.getenv("REFRESH_POLL_S", "2"))
+IDLE_S = 60.0
+
+COUNTERS_SQL = """
+SELECT relname, n_tup_ins + n_tup_upd + n_tup_del
+FROM pg_stat_user_tables
+WHERE schemaname = 'public'
+"""
+
+
+# ─── Change feeds ───────────────────────────────────────────────────
+class NotifyFeed:
+    """
+    Table names sent by the triggers in ``sql/create_change_notify.sql``.
+
+    Listens through ``db._listen``, which reconnects after a dropped tunnel and
+    probes an idle connection; after a reconnect every watched table counts as
+    changed, as notifications may have been missed meanwhile.
+    """
+
+    def __init__(self, idle_s: float = 10.0):
+        self._queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=_listen, args=(CHANGED_CHANNEL, self._queue.put, idle_s),
+            kwargs={"on_lost": lambda: self._queue.put(None), "stop": self._stop},
+            name="change-listener", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: float) -> set[str]:
+        try:
+            payloads = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return set()
+        while not self._queue.empty():
+            payloads.append(self._queue.get_nowait())
+        if None in payloads:
+            return set(watched_tables())
+        return set(payloads)
+
+    def close(self):
+        self._stop.set()
+
+
+class PollFeed:
+    """Tables whose write counters moved since the previous look."""
+
+    def __init__(self, interval: float = POLL_INTERVAL_S):
+        self.interval = interval
+        self._last = self._counters()
+
+    @staticmethod
+    def _counters() -> dict[str, int]:
+        # a new transaction per look: statistics are snapshotted per transaction
+        with _engine().connect() as con:
+            return dict(con.execute(text(COUNTERS_SQL)).all())
+
+    def wait(self, timeout: float) -> set[str]:
+        time.sleep(min(timeout, self.interval))
+        now = self._counters()
+        changed = {t for t, n in now.items() if self._last.get(t) != n}
+        self._last = now
+        return changed
+
+    def close(self):
+        pass
+
+
+def has_triggers() -> bool:
+    with _engine().connect() as con:
+        return con.execute(text(
+            "SELECT to_regprocedure('analysis.notify_table_change()') IS NOT NULL")).scalar()
+
+
+def install():
+    raw = _engine().raw_connection()
+    try:
+        with raw.cursor() as cur:           # no parameters: format('%I') stays literal
+            cur.execute(NOTIFY_FILE.read_text())
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def open_feed(mode: str = "auto", interval: float = POLL_INTERVAL_S):
+    if mode == "notify" or (mode == "auto" and has_triggers()):
+        return NotifyFeed()
+    return PollFeed(interval)
+
+
+# ─── Debounced refresh ──────────────────────────────────────────────
+def watched_tables() -> frozenset:
+    """Every base table some view in ``VIEWS`` reads."""
+    return frozenset().union(*(refresh_views.base_tables(v) for v in refresh_views.VIEWS))
+
+
+def cycles(feed, quiet_s: float = QUIET_S,
+           max_delay_s: float = MAX_DELAY_S) -> Iterator[tuple[set, list]]:
+    """
+    Yield ``(changed tables, refresh stats)`` after every refresh.
+
+    A burst of changes is refreshed once it has been quiet for ``quiet_s``,
+    but never later than ``max_delay_s`` after its first change.  A failed
+    refresh keeps its tables pending and is retried after the next quiet period.
+    """
+    watched = watched_tables()
+    pending: set[str] = set()
+    first: Optional[float] = None
+    last: Optional[float] = None
+    while True:
+        if pending:
+            timeout = max(0.0, min(last + quiet_s, first + max_delay_s) - time.monotonic())
+        else:
+            timeout = IDLE_S
+        changed = feed.wait(timeout) & watched
+        now = time.monotonic()
+        if changed:
+            pending |= changed
+            first = first or now
+            last = now
+        if not pending or (now - last < quiet_s and now - first < max_delay_s):
+            continue
+
+        views = refresh_views.affected_views(pending)
+        try:
+            stats = refresh_views.refresh_all(views=views) if views else []
+        except Exception as e:
+            print(f"❌ {datetime.now():%H:%M:%S} refresh of {', '.join(views)} failed: {e}")
+            first = last = time.monotonic()
+            continue
+        yield set(pending), stats
+        pending.clear()
+        first = last = None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Refresh analysis views as base tables change.")
+    ap.add_argument("--mode", choices=["auto", "notify", "poll"], default="auto",
+                    help="auto uses the triggers when they are installed")
+    ap.add_argument("--install", action="store_true",
+                    help="install the change triggers (sql/create_change_notify.sql) first")
+    ap.add_argument("--interval", type=float, default=POLL_INTERVAL_S, help="poll interval (s)")
+    ap.add_argument("--quiet", type=float, default=QUIET_S,
+                    help="refresh once ingestion was quiet this long (s)")
+    ap.add_argument("--max-delay", type=float, default=MAX_DELAY_S,
+                    help="refresh at the latest this long after the first change (s)")
+    ap.add_argument("--skip-initial", action="store_true",
+                    help="do not refresh everything on start-up")
+    args = ap.parse_args()
+
+    if args.install:
+        install()
+        print("✅ change triggers installed")
+    feed = open_feed(args.mode, args.interval)
+    print(f"👂 watching {len(watched_tables())} tables via {type(feed).__name__}")
+    if not args.skip_initial:
+        # whatever changed while the daemon was down
+        refresh_views.refresh_all()
+        print(f"✅ {datetime.now():%H:%M:%S} initial refresh done")
+    try:
+        for tables, stats in cycles(feed, args.quiet, args.max_delay):
+            took = max((s.seconds for s in stats), default=0.0)
+            print(f"🔄 {datetime.now():%H:%M:%S} {', '.join(sorted(tables))} → "
+                  f"{', '.join(s.view for s in stats) or 'no views'} (slowest {took:.2f}s)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
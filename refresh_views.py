@@ -1,5 +1,26 @@
+"""
+Refresh the materialized views in ``analysis``.
+
+Views are refreshed in dependency order (parsed from
+``sql/create_materialized_views.sql``); views that do not depend on each other
+run in parallel, each on its own pooled connection.  ``CONCURRENTLY`` is used
+whenever Postgres allows it, otherwise the view is refreshed with a plain lock.
+Views listed in ``INCREMENTAL`` are maintained per session instead once their
+incremental tables exist (see ``track_projection.py``).  Every refreshed view
+is announced on ``REFRESHED_CHANNEL`` so running dashboards drop their cached
+results (see ``db.watch_refreshes``).
+"""
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
 from sqlalchemy import text
-from db import _engine      # same helper you already have
+import track_projection
+from db import REFRESHED_CHANNEL, _engine, invalidate      # same helper you already have
 
 VIEWS = [
     "analysis.mv_track_projection",
@@ -7,17 +28,200 @@ VIEWS = [
     "analysis.mv_pit_stop_timeline",
     "analysis.mv_sector_performance",
     "analysis.mv_driver_summary_season",
+    "analysis.mv_lap_detail",
+    "analysis.mv_race_trace",
 ]
 
-def refresh(view: str):
+# views with a per-session maintenance path: (is it set up?, refresh changed sessions)
+INCREMENTAL = {
+    "analysis.mv_track_projection": (track_projection.is_incremental,
+                                     track_projection.refresh_track_projection),
+}
+
+SQL_FILE = Path(__file__).parent / "sql" / "create_materialized_views.sql"
+VIEWS_FILE = Path(__file__).parent / "sql" / "create_views.sql"
+
+_MV_RE = re.compile(
+    r"CREATE\s+MATERIALIZED\s+VIEW\s+([\w.]+)\s+AS(.*?)WITH\s+NO\s+DATA", re.I | re.S)
+_VIEW_RE = re.compile(r"CREATE\s+(?:OR\s+REPLACE\s+)?VIEW\s+([\w.]+)\s+AS(.*?);", re.I | re.S)
+_RELATION_RE = re.compile(r"\b(?:FROM|JOIN)\s+([a-z_][\w.]*)", re.I)
+
+
+@dataclass
+class RefreshStat:
+    view: str
+    seconds: float
+    rows: int            # estimated by ANALYZE, or rows rewritten if incremental
+    mode: str            # "concurrent", "locked" or "incremental"
+
+
+# ─── Dependency graph ───────────────────────────────────────────────
+@lru_cache
+def view_sources(path: Path = SQL_FILE) -> dict[str, frozenset]:
+    """Every relation each materialized view reads, as written in the SQL file."""
+    sql = re.sub(r"--[^\n]*|/\*.*?\*/", " ", path.read_text(), flags=re.S)
+    return {
+        name: frozenset(r.lower() for r in _RELATION_RE.findall(body))
+        for name, body in _MV_RE.findall(sql)
+    }
+
+
+@lru_cache
+def plain_view_sources(path: Path = VIEWS_FILE) -> dict[str, frozenset]:
+    """Relations read by the plain views in ``sql/create_views.sql``."""
+    sql = re.sub(r"--[^\n]*|/\*.*?\*/", " ", path.read_text(), flags=re.S)
+    return {
+        name.lower(): frozenset(r.lower() for r in _RELATION_RE.findall(body))
+        for name, body in _VIEW_RE.findall(sql)
+    }
+
+
+def base_tables(view: str) -> frozenset:
+    """Unqualified names of the relations behind ``view``, looking through plain views."""
+    plain = plain_view_sources()
+    todo, seen = list(view_sources().get(view, ())), set()
+    while todo:
+        rel = todo.pop().split(".")[-1]
+        if rel not in seen:
+            seen.add(rel)
+            todo.extend(plain.get(rel, ()))
+    return frozenset(seen)
+
+
+def affected_views(tables: Iterable[str]) -> list[str]:
+    """Views reading any of ``tables``, plus the views built on them, in refresh order."""
+    changed = {t.split(".")[-1].lower() for t in tables}
+    graph = dependency_graph()
+    hit = {v for v in VIEWS if base_tables(v) & changed}
+    grew = True
+    while grew:
+        more = {v for v, deps in graph.items() if deps & hit} - hit
+        hit |= more
+        grew = bool(more)
+    return [v for v in _topological(graph) if v in hit]
+
+
+def dependency_graph(path: Path = SQL_FILE) -> dict[str, set]:
+    """Map each view in ``VIEWS`` to the views in ``VIEWS`` it reads from."""
+    by_name = {v.split(".")[-1]: v for v in VIEWS}
+    sources = view_sources(path)
+    return {
+        v: {by_name[r.split(".")[-1]] for r in sources.get(v, ())
+            if r.split(".")[-1] in by_name and by_name[r.split(".")[-1]] != v}
+        for v in VIEWS
+    }
+
+
+# ─── Refresh ────────────────────────────────────────────────────────
+def _can_refresh_concurrently(con, view: str) -> bool:
+    """CONCURRENTLY needs a populated view with a plain unique index."""
+    return bool(con.execute(text("""
+        SELECT m.ispopulated AND EXISTS (
+                   SELECT 1 FROM pg_index i
+                   WHERE i.indrelid = CAST(:v AS regclass)
+                     AND i.indisunique AND i.indpred IS NULL)
+        FROM pg_matviews m
+        WHERE format('%I.%I', m.schemaname, m.matviewname) = :v
+    """), {"v": view}).scalar())
+
+
+def _announce(con, view: str):
+    """Tell listening dashboards (on commit) that ``view`` changed."""
+    con.execute(text("SELECT pg_notify(:c, :v)"), {"c": REFRESHED_CHANNEL, "v": view})
+
+
+def refresh(view: str, concurrently: bool = True) -> RefreshStat:
     if view not in VIEWS:
         raise ValueError("Unknown view")
-    with _engine().connect() as con:
-        con.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};"))
+    t0 = time.perf_counter()
+    if view in INCREMENTAL:
+        ready, refresh_changed = INCREMENTAL[view]
+        if ready():
+            rows = sum(refresh_changed().values())
+            with _engine().begin() as con:
+                _announce(con, view)
+            invalidate(view)
+            return RefreshStat(view, time.perf_counter() - t0, rows, "incremental")
+
+    with _engine().begin() as con:
+        concurrent = concurrently and _can_refresh_concurrently(con, view)
+        mode = "CONCURRENTLY " if concurrent else ""
+        con.execute(text(f"REFRESH MATERIALIZED VIEW {mode}{view};"))
+        con.execute(text(f"ANALYZE {view};"))
+        rows = con.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:v AS regclass)"),
+            {"v": view},
+        ).scalar()
+        _announce(con, view)
+    # cached dashboard results that read this view are now stale
+    invalidate(view)
+    return RefreshStat(view, time.perf_counter() - t0, max(int(rows or 0), 0),
+                       "concurrent" if concurrent else "locked")
+
+
+def refresh_all(parallel: bool = True, max_workers: int = 4,
+                views: Optional[Iterable[str]] = None) -> list[RefreshStat]:
+    """
+    Refresh every view in ``VIEWS`` (or only ``views``) and return per-view timings.
+
+    With ``parallel`` a view starts as soon as all views it reads from are
+    done, so the wall time approaches the longest dependency chain.  If a view
+    fails, its dependants are skipped and the first error is re-raised once
+    the remaining independent views have finished.
+    """
+    graph = dependency_graph()
+    if views is not None:
+        only = set(views)
+        graph = {v: deps & only for v, deps in graph.items() if v in only}
+    if not parallel:
+        return [refresh(v) for v in _topological(graph)]
+
+    stats, errors = [], []
+    done, failed = set(), set()
+    pending = dict(graph)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh") as pool:
+        running = {}
+        while pending or running:
+            for v in [v for v, deps in pending.items() if deps & failed]:
+                failed.add(v)
+                del pending[v]
+            for v in [v for v, deps in pending.items() if deps <= done]:
+                running[pool.submit(refresh, v)] = v
+                del pending[v]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                v = running.pop(fut)
+                try:
+                    stats.append(fut.result())
+                    done.add(v)
+                except Exception as e:
+                    errors.append(e)
+                    failed.add(v)
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def _topological(graph: dict[str, set]) -> list[str]:
+    order, seen = [], set()
+
+    def visit(v):
+        if v not in seen:
+            seen.add(v)
+            for dep in sorted(graph[v]):
+                visit(dep)
+            order.append(v)
 
-def refresh_all():
     for v in VIEWS:
-        refresh(v)
+        if v in graph:
+            visit(v)
+    return order
+
 
 if __name__ == "__main__":
-    refresh_all()
+    t0 = time.perf_counter()
+    for s in refresh_all():
+        print(f"✅ {s.view:<40} {s.seconds:8.2f}s {s.rows:>12,} rows ({s.mode})")
+    print(f"⏱️ total wall time {time.perf_counter() - t0:.2f}s")
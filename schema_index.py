@@ -0,0 +1,216 @@
+"""
+Pick the part of the schema that is relevant to a question.
+
+``question_to_sql`` used to send every ``CREATE TABLE`` with each request.  A
+``SchemaIndex`` scores tables and views by how well their names, columns and a
+few domain synonyms match the question, then adds the tables needed to join the
+hits together (via foreign keys), and renders only those.
+
+The index can be built from ``ai_sql.SCHEMA_SNIPPET`` or from the live database
+(``introspect()``), so the prompt follows the real schema.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+# words users say -> tables that hold the answer
+SYNONYMS = {
+    "fastest": ["lap"], "slowest": ["lap"], "lap": ["lap", "v_lap_detail"],
+    "laptime": ["lap"], "time": ["lap"],
+    "pit": ["pit_stop"], "stop": ["pit_stop"],
+    "tyre": ["stint"], "tire": ["stint"], "compound": ["stint"], "stint": ["stint"],
+    "weather": ["weather"], "rain": ["weather"], "temperature": ["weather"],
+    "wind": ["weather"], "humidity": ["weather"],
+    "point": ["result", "v_driver_points"], "win": ["result"], "winner": ["result"],
+    "won": ["result"], "podium": ["result"], "finish": ["result"], "position": ["result"],
+    "result": ["result", "v_session_results"], "standing": ["v_driver_points"],
+    "team": ["team", "team_membership"], "constructor": ["team", "team_membership"],
+    "speed": ["car_data", "lap"], "throttle": ["car_data"], "rpm": ["car_data"],
+    "gear": ["car_data"], "brake": ["car_data"], "drs": ["car_data"],
+    "gap": ["intervals"], "interval": ["intervals"], "behind": ["intervals"],
+    "overtake": ["position"], "sector": ["sector"], "segment": ["segment"],
+    "flag": ["race_control"], "penalty": ["race_control"], "safety": ["race_control"],
+    "circuit": ["circuit"], "track": ["circuit"], "country": ["circuit"],
+    "race": ["session", "meeting"], "qualifying": ["session"], "practice": ["session"],
+    "grand": ["meeting"], "prix": ["meeting"], "gp": ["meeting"], "season": ["meeting"],
+    "year": ["meeting"], "driver": ["driver"], "who": ["driver"],
+}
+
+# always useful to name drivers; cheap to include
+CORE = ["driver"]
+
+# high-frequency tables: never pulled in just to connect two others
+HEAVY = {"car_data", "location", "position", "intervals"}
+
+_TABLE_RE = re.compile(r"CREATE\s+(TABLE|VIEW)\s+(\w+)\s*\((.*?)\);", re.I | re.S)
+_REF_RE = re.compile(r"references\s+(\w+)", re.I)
+
+
+@dataclass
+class Table:
+    name: str
+    kind: str                                   # "table" or "view"
+    columns: list[str] = field(default_factory=list)
+    refs: dict[str, str] = field(default_factory=dict)    # column -> referenced table
+    ddl: str = ""
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (≈ 4 characters per token) for prompt-size reporting."""
+    return len(text) // 4
+
+
+def _words(text: str) -> set[str]:
+    words = set()
+    for w in re.findall(r"[a-zäöüß0-9]+", text.lower()):
+        words.add(w)
+        if len(w) > 3 and w.endswith("s"):
+            words.add(w[:-1])
+    return words
+
+
+def parse_schema(snippet: str) -> dict[str, Table]:
+    """Tables and views from ``CREATE TABLE``/``CREATE VIEW`` statements."""
+    tables = {}
+    for kind, name, body in _TABLE_RE.findall(snippet):
+        t = Table(name=name.lower(), kind=kind.lower(),
+                  ddl=f"CREATE {kind.upper()} {name}({body});")
+        for line in body.splitlines():
+            parts = line.strip().rstrip(",").split()
+            if not parts or re.match(r"(UNIQUE|PRIMARY)\b|\.\.\.", parts[0], re.I):
+                continue
+            col = parts[0].lower()
+            t.columns.append(col)
+            ref = _REF_RE.search(line)
+            if ref:
+                t.refs[col] = ref.group(1).lower()
+        tables[t.name] = t
+    return tables
+
+
+def introspect(run_query) -> dict[str, Table]:
+    """Read tables, views, columns and foreign keys from the connected database."""
+    # pg_catalog rather than information_schema: the latter omits materialized views
+    cols = run_query("""
+        SELECT n.nspname AS table_schema, c.relname AS table_name,
+               a.attname AS column_name, format_type(a.atttypid, a.atttypmod) AS data_type,
+               CASE WHEN c.relkind IN ('r', 'p') THEN 'BASE TABLE' ELSE 'VIEW' END AS table_type
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE n.nspname IN ('public', 'analysis')
+          AND c.relkind IN ('r', 'p', 'v', 'm')
+          AND NOT c.relispartition
+        ORDER BY n.nspname, c.relname, a.attnum
+    """, ttl=3600)
+    fks = run_query("""
+        SELECT c.relname AS table_name, a.attname AS column_name, r.relname AS ref_table
+        FROM pg_constraint k
+        JOIN pg_class c ON c.oid = k.conrelid
+        JOIN pg_class r ON r.oid = k.confrelid
+        JOIN pg_attribute a ON a.attrelid = k.conrelid AND a.attnum = k.conkey[1]
+        WHERE k.contype = 'f'
+    """, ttl=3600)
+
+    tables = {}
+    for (schema, name, ttype), g in cols.groupby(["table_schema", "table_name", "table_type"],
+                                                sort=False):
+        full = name if schema == "public" else f"{schema}.{name}"
+        kind = "table" if ttype == "BASE TABLE" else "view"
+        body = ",\n    ".join(f"{c} {d}" for c, d in zip(g["column_name"], g["data_type"]))
+        tables[full] = Table(full, kind, list(g["column_name"]), {},
+                             f"CREATE {kind.upper()} {full}(\n    {body}\n);")
+    for name, col, ref in fks.itertuples(index=False):
+        if name in tables:
+            tables[name].refs[col] = ref
+    return tables
+
+
+class SchemaIndex:
+    def __init__(self, tables: dict[str, Table]):
+        self.tables = tables
+        self._by_word: dict[str, set[str]] = {}
+        for t in tables.values():
+            for w in _words(t.name.split(".")[-1].replace("_", " ")):
+                self._by_word.setdefault(w, set()).add(t.name)
+        # undirected FK graph for join paths
+        self._graph: dict[str, set[str]] = {n: set() for n in tables}
+        for t in tables.values():
+            for ref in t.refs.values():
+                if ref in self._graph:
+                    self._graph[t.name].add(ref)
+                    self._graph[ref].add(t.name)
+
+    def full_text(self) -> str:
+        return "\n\n".join(t.ddl for t in self.tables.values())
+
+    def score(self, question: str) -> dict[str, float]:
+        words = _words(question)
+        scores: dict[str, float] = {}
+        for w in words:
+            for name in self._by_word.get(w, ()):
+                scores[name] = scores.get(name, 0) + 3
+            for name in SYNONYMS.get(w, ()):
+                if name in self.tables:
+                    scores[name] = scores.get(name, 0) + 2
+        for t in self.tables.values():
+            hits = sum(1 for c in t.columns if c in words or c.replace("_", "") in words)
+            if hits:
+                scores[t.name] = scores.get(t.name, 0) + hits
+        return scores
+
+    def _join_path(self, chosen: list[str], target: str) -> list[str]:
+        """Tables linking ``target`` to the closest already chosen table."""
+        prev = {n: None for n in chosen}
+        todo = deque(chosen)
+        while todo:
+            n = todo.popleft()
+            if n == target:
+                path = []
+                while prev[n] is not None:
+                    path.append(n)
+                    n = prev[n]
+                return path
+            for m in sorted(self._graph.get(n, ()), key=lambda m: (m in HEAVY, m)):
+                if m not in prev:
+                    prev[m] = n
+                    todo.append(m)
+        return []
+
+    def select(self, question: str, max_tables: int = 6) -> list[str]:
+        """Most relevant tables plus the tables that join them."""
+        scores = self.score(question)
+        if not scores:
+            # nothing matched: the best-connected light tables, not the whole schema
+            scores = {n: len(self._graph.get(n, ())) for n in self.tables if n not in HEAVY}
+        picked = sorted(scores, key=lambda n: -scores[n])[:max_tables]
+        picked += [c for c in CORE if c in self.tables and c not in picked]
+
+        chosen = list(dict.fromkeys(picked))
+        linked = [n for n in chosen if self.tables[n].kind == "table"][:1]
+        for n in chosen:
+            if self.tables[n].kind == "table" and n not in linked:
+                linked += [m for m in self._join_path(linked, n) if m not in linked]
+        return list(dict.fromkeys(chosen + linked))
+
+    def render(self, question: str, max_tables: int = 6) -> tuple[str, dict]:
+        """Schema text for the prompt and how much it saved."""
+        names = self.select(question, max_tables)
+        text = "\n\n".join(self.tables[n].ddl for n in names)
+        full, pruned = approx_tokens(self.full_text()), approx_tokens(text)
+        return text, {
+            "tables": names,
+            "schema_tokens": pruned,
+            "full_schema_tokens": full,
+            "reduction": 1 - pruned / full if full else 0.0,
+        }
+
+
+def from_snippet(snippet: str) -> SchemaIndex:
+    return SchemaIndex(parse_schema(snippet))
+
+
+def from_database(run_query) -> Optional[SchemaIndex]:
+    tables = introspect(run_query)
+    return SchemaIndex(tables) if tables else None
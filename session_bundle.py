@@ -0,0 +1,76 @@
+"""
+Fetch everything the dashboard needs for one session in parallel.
+
+The per-session tab queries are independent, so instead of paying the
+tunnel latency five times in a row they run on a small thread pool over the
+engine's connection pool.  Results go through ``db.run_query`` and therefore
+land in its shared cache, which is what makes background prefetching useful.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import pandas as pd
+
+import queries
+from db import _engine, run_query
+
+# stay within the default SQLAlchemy pool (5 + 10 overflow)
+_POOL = ThreadPoolExecutor(max_workers=6, thread_name_prefix="bundle")
+_PREFETCH = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+
+_BUNDLE_QUERIES = {
+    "results":   queries.SESSION_RESULTS,
+    "laps":      queries.LAP_PACE,
+    "stints":    queries.STINT_SUMMARY,
+    "stint_laps": queries.STINT_LAPS,
+    "pit_stops": queries.PIT_STOPS,
+    "sectors":   queries.SECTOR_BESTS,
+    "trace":     queries.RACE_TRACE,
+}
+
+
+@dataclass(frozen=True)
+class SessionBundle:
+    session_id: int
+    results: pd.DataFrame
+    laps: pd.DataFrame
+    stints: pd.DataFrame
+    stint_laps: pd.DataFrame
+    pit_stops: pd.DataFrame
+    sectors: pd.DataFrame
+    trace: pd.DataFrame
+
+
+def fetch_session_bundle(session_id: int,
+                         neighbours: Optional[Sequence[int]] = None) -> SessionBundle:
+    """
+    Run all per-session tab queries concurrently and return them as one bundle.
+
+    If ``neighbours`` (the season's session ids in calendar order) is given,
+    the races directly before and after ``session_id`` are fetched in the
+    background so switching to them is served from the cache.
+    """
+    _engine()      # build the engine once before the workers race for it
+    futures = {
+        # copy the context so the workers' queries are attributed to the caller's tab/run
+        name: _POOL.submit(contextvars.copy_context().run, run_query, sql, sid=session_id)
+        for name, sql in _BUNDLE_QUERIES.items()
+    }
+    bundle = SessionBundle(session_id=session_id,
+                           **{name: f.result() for name, f in futures.items()})
+
+    if neighbours is not None:
+        prefetch_neighbours(session_id, neighbours)
+    return bundle
+
+
+def prefetch_neighbours(session_id: int, neighbours: Sequence[int]) -> None:
+    """Warm the cache for the sessions adjacent to ``session_id``."""
+    ids = list(neighbours)
+    if session_id not in ids:
+        return
+    i = ids.index(session_id)
+    for sid in ids[max(i - 1, 0):i] + ids[i + 1:i + 2]:
+        _PREFETCH.submit(contextvars.copy_context().run, fetch_session_bundle, int(sid))
@@ -0,0 +1,270 @@
+"""
+Offline columnar snapshot of everything the dashboard reads.
+
+``python snapshot.py`` exports the views behind the tabs to Parquet, partitioned
+as ``<relation>/year=<y>/session_id=<id>/part-0.parquet``.  While a snapshot is
+fresh (``F1_SNAPSHOT_MAX_AGE_H``, default 24h) ``db.run_query`` answers the tab
+queries from memory-mapped Arrow files instead of going through the tunnel.
+Anything else (custom SQL, Ask AI) still goes to Postgres.
+
+``F1_SNAPSHOT=off`` disables the read path, ``F1_SNAPSHOT_DIR`` moves the store.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+import queries
+
+SNAPSHOT_DIR = Path(os.getenv("F1_SNAPSHOT_DIR", Path(__file__).parent / "snapshots"))
+MAX_AGE_S = float(os.getenv("F1_SNAPSHOT_MAX_AGE_H", "24")) * 3600
+ENABLED = os.getenv("F1_SNAPSHOT", "auto").lower() != "off"
+
+# relation -> partitioning
+PER_SESSION = [
+    "v_session_results",
+    "analysis.mv_lap_detail",
+    "analysis.mv_stint_summary",
+    "analysis.mv_pit_stop_timeline",
+    "analysis.mv_sector_performance",
+    "analysis.mv_race_trace",
+    "analysis.mv_track_projection",
+]
+PER_YEAR = ["analysis.mv_driver_summary_season"]
+WHOLE = ["meeting", "session", "driver", "team_membership"]
+
+
+# ─── Export ─────────────────────────────────────────────────────────
+def _write(df: pd.DataFrame, path: Path):
+    path.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path / "part-0.parquet")
+
+
+def export(years: Optional[list[int]] = None, out: Path = SNAPSHOT_DIR) -> Path:
+    """Write a complete snapshot to ``out`` (replacing the previous one once complete)."""
+    from db import _engine        # keep the read path importable without a database
+
+    tmp = out.with_name(out.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    with _engine().connect() as con:
+        sessions = pd.read_sql(text("""
+            SELECT s.session_id, m.year
+            FROM session s JOIN meeting m USING (meeting_id)
+        """), con)
+        if years:
+            sessions = sessions[sessions["year"].isin(years)]
+
+        for rel in WHOLE:
+            _write(pd.read_sql(text(f"SELECT * FROM {rel}"), con), tmp / rel)
+
+        for year, group in sessions.groupby("year"):
+            ids = [int(s) for s in group["session_id"]]
+            for rel in PER_YEAR:
+                df = pd.read_sql(text(f"SELECT * FROM {rel} WHERE year = :y"),
+                                 con, params={"y": int(year)})
+                _write(df, tmp / rel / f"year={year}")
+            for rel in PER_SESSION:
+                df = pd.read_sql(text(f"SELECT * FROM {rel} WHERE session_id = ANY(:ids)"),
+                                 con, params={"ids": ids})
+                parts = dict(tuple(df.groupby("session_id")))
+                # empty partitions too, so "no pit stops" is not mistaken for "not exported"
+                for sid in ids:
+                    _write(parts.get(sid, df.iloc[:0]),
+                           tmp / rel / f"year={year}" / f"session_id={sid}")
+
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "sessions": {str(s): int(y) for s, y in zip(sessions["session_id"], sessions["year"])},
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest))
+
+    # the previous snapshot stays on disk until the new one is in place
+    old = out.with_name(out.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out.exists():
+        out.rename(old)
+    try:
+        tmp.rename(out)
+    except OSError:
+        if old.exists():
+            old.rename(out)
+        raise
+    shutil.rmtree(old, ignore_errors=True)
+    _manifest.cache_clear()
+    return out
+
+
+# ─── Read path ──────────────────────────────────────────────────────
+class _NotInSnapshot(LookupError):
+    """The requested partition was not exported; fall back to Postgres."""
+
+
+@lru_cache
+def _manifest(mtime: float) -> dict:
+    return json.loads((SNAPSHOT_DIR / "manifest.json").read_text())
+
+
+def manifest() -> Optional[dict]:
+    path = SNAPSHOT_DIR / "manifest.json"
+    if not path.exists():
+        return None
+    return _manifest(path.stat().st_mtime)
+
+
+def is_fresh() -> bool:
+    """True if reads may be served from the snapshot."""
+    if not ENABLED:
+        return False
+    m = manifest()
+    if m is None:
+        return False
+    created = datetime.fromisoformat(m["created_at"]).timestamp()
+    return time.time() - created < MAX_AGE_S
+
+
+def _read(rel: str, *, year=None, sid=None, filters=None) -> pd.DataFrame:
+    path = SNAPSHOT_DIR / rel
+    if sid is not None:
+        year = manifest()["sessions"].get(str(int(sid)))
+        path = path / f"year={year}" / f"session_id={int(sid)}"
+    elif year is not None:
+        path = path / f"year={int(year)}"
+    path = path / "part-0.parquet"
+    if not path.exists():
+        raise _NotInSnapshot(path)
+    return pq.read_table(path, memory_map=True, filters=filters).to_pandas()
+
+
+def _catalog(p):
+    df = _read("session").merge(_read("meeting"), on="meeting_id")
+    cols = ["session_id", "session_name", "session_type", "start_time",
+            "meeting_id", "meeting_name", "year", "start"]
+    return df.sort_values(["start", "start_time"])[cols].reset_index(drop=True)
+
+
+def _lap_pace(p):
+    laps = _read("analysis.mv_lap_detail", sid=p["sid"], filters=[("clean", "=", True)])
+    cols = ["full_name", "lap_number", "lap_time_s", "compound", "tyre_age"]
+    return laps.sort_values("lap_number")[cols].reset_index(drop=True)
+
+
+def _stint_laps(p):
+    laps = _read("analysis.mv_lap_detail", sid=p["sid"])
+    laps = laps.merge(_read("session")[["session_id", "session_type"]], on="session_id")
+    cols = ["session_id", "driver_id", "full_name", "team_colour", "lap_number", "lap_time_s",
+            "stint_number", "compound", "tyre_age", "clean", "session_type"]
+    return laps.sort_values(["driver_id", "lap_number"])[cols].reset_index(drop=True)
+
+
+def _race_trace(p):
+    df = _read("analysis.mv_race_trace", sid=p["sid"])
+    cols = ["driver_id", "full_name", "team_colour", "lap_number", "position",
+            "gap_to_leader", "gap_to_next"]
+    return df.sort_values(["lap_number", "position"])[cols].reset_index(drop=True)
+
+
+def _season_races(p):
+    s = _read("session")
+    m = _read("meeting")
+    df = s[s["session_type"] == "Race"].merge(m[m["year"].isin(p["years"])], on="meeting_id")
+    return (df.rename(columns={"meeting_name": "label"})
+              .sort_values("start")[["session_id", "year", "label", "session_name", "start"]]
+              .reset_index(drop=True))
+
+
+def _sessions(rel: str, p, cols: list[str], filters=None) -> pd.DataFrame:
+    """The partitions of every session in ``p["ids"]``, concatenated."""
+    frames = [_read(rel, sid=sid, filters=filters) for sid in p["ids"]]
+    return pd.concat(frames, ignore_index=True)[cols]
+
+
+def _session_drivers(p):
+    tm = _read("team_membership")
+    d = _read("driver")
+    df = d.merge(tm[tm["session_id"] == p["sid"]][["driver_id"]], on="driver_id")
+    return df.sort_values("full_name")[["driver_id", "full_name"]].reset_index(drop=True)
+
+
+def _telemetry(p):
+    filters = [("driver_id", "=", int(p["did"]))]
+    if p.get("lap") is not None:
+        filters.append(("lap_number", "=", int(p["lap"])))
+    df = _read("analysis.mv_track_projection", sid=p["sid"], filters=filters)
+    cols = ["t", "lap_number", "x", "y", "speed", "gear", "throttle", "brake_is_pressed"]
+    return df.sort_values("t")[cols].reset_index(drop=True)
+
+
+def _telemetry_minmax(p):
+    from downsample import downsample
+    return downsample(_telemetry(p), int(p["buckets"]) * 2, "minmax")
+
+
+def _driver_laps(p):
+    laps = _read("analysis.mv_lap_detail", sid=p["sid"],
+                 filters=[("driver_id", "=", int(p["did"]))])
+    return laps.sort_values("lap_number")[["lap_number"]].reset_index(drop=True)
+
+
+_HANDLERS = {
+    queries.CATALOG: _catalog,
+    queries.SESSION_RESULTS: lambda p: (
+        _read("v_session_results", sid=p["sid"]).sort_values("position").reset_index(drop=True)),
+    queries.LAP_PACE: _lap_pace,
+    queries.STINT_SUMMARY: lambda p: _read("analysis.mv_stint_summary", sid=p["sid"])[
+        ["driver_id", "full_name", "team_name", "team_colour",
+         "stint_number", "compound", "best_lap_s"]],
+    queries.STINT_LAPS: _stint_laps,
+    queries.PIT_STOPS: lambda p: _read("analysis.mv_pit_stop_timeline", sid=p["sid"]),
+    queries.SECTOR_BESTS: lambda p: _read("analysis.mv_sector_performance", sid=p["sid"]),
+    queries.RACE_TRACE: _race_trace,
+    queries.SEASON_SUMMARY: lambda p: _read("analysis.mv_driver_summary_season", year=p["y"]),
+    queries.SESSION_DRIVERS: _session_drivers,
+    queries.DRIVER_LAPS: _driver_laps,
+    queries.TELEMETRY: _telemetry,
+    queries.TELEMETRY_MINMAX: _telemetry_minmax,
+    queries.SEASON_RACES: _season_races,
+    queries.COMPARE_RESULTS: lambda p: _sessions(
+        "v_session_results", p,
+        ["session_id", "acronym", "full_name", "team_name", "team_colour", "position", "points"]),
+    queries.COMPARE_LAPS: lambda p: _sessions(
+        "analysis.mv_lap_detail", p,
+        ["session_id", "driver_id", "full_name", "team_colour", "lap_number", "lap_time_s",
+         "stint_number", "compound", "tyre_age"], filters=[("clean", "=", True)]),
+    queries.COMPARE_STINTS: lambda p: _sessions(
+        "analysis.mv_stint_summary", p,
+        ["session_id", "driver_id", "full_name", "team_name", "stint_number", "compound",
+         "lap_start", "lap_end", "num_laps", "avg_lap_s", "best_lap_s"]),
+}
+_HANDLERS = {" ".join(sql.split()): fn for sql, fn in _HANDLERS.items()}
+
+
+def serve(sql: str, params: dict) -> Optional[pd.DataFrame]:
+    """Answer a known dashboard query from a fresh snapshot, else ``None``."""
+    handler = _HANDLERS.get(" ".join(sql.split()))
+    if handler is None or not is_fresh():
+        return None
+    try:
+        return handler(params)
+    except _NotInSnapshot:
+        return None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export a Parquet snapshot for offline use.")
+    ap.add_argument("--years", type=int, nargs="*", help="only these seasons")
+    ap.add_argument("--out", type=Path, default=SNAPSHOT_DIR)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    path = export(args.years, args.out)
+    print(f"✅ snapshot written to {path} in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,37 @@
+/*---------------------------------------------------------------
+  Change notifications for refresh_daemon.py
+  ---------------------------------------------------------------
+  A statement-level trigger on every base table sends the table
+  name on channel f1_table_changed.  One message per statement,
+  not per row, and Postgres folds identical messages of one
+  transaction into one, so a bulk COPY costs a single NOTIFY.
+
+  Without these triggers the daemon polls pg_stat_user_tables.
+----------------------------------------------------------------*/
+CREATE SCHEMA IF NOT EXISTS analysis;
+
+CREATE OR REPLACE FUNCTION analysis.notify_table_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('f1_table_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END
+$$;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'circuit', 'team', 'driver', 'meeting', 'session', 'team_membership', 'result',
+        'weather', 'race_control', 'lap', 'sector', 'segment', 'stint', 'pit_stop',
+        'location', 'car_data', 'position', 'intervals'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS notify_change ON public.%I', t);
+        EXECUTE format('CREATE TRIGGER notify_change
+                            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.%I
+                            FOR EACH STATEMENT EXECUTE FUNCTION analysis.notify_table_change()',
+                       t);
+    END LOOP;
+END
+$$;
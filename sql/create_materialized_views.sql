@@ -7,31 +7,55 @@ SET search_path = public, analysis;
 /*---------------------------------------------------------------
   1.  Track projection  (location + car_data)  [heavy!]
 ----------------------------------------------------------------*/
-DROP MATERIALIZED VIEW IF EXISTS analysis.mv_track_projection;
-CREATE MATERIALIZED VIEW analysis.mv_track_projection AS
-SELECT
-    l.session_id,
-    l.driver_id,
-    d.full_name,
-    tm.team_name,
-    t.team_colour,
-    l.lap_number,
-    date_trunc('second', l.time) AS t,   -- round to second
-    l.x, l.y, l.z,
-    cd.speed,
-    cd.gear,
-    cd.throttle,
-    cd.brake_is_pressed
-FROM location l
-JOIN driver d          USING (driver_id)
-JOIN team_membership tm USING (driver_id, session_id)
-JOIN team t            ON t.team_name = tm.team_name
-LEFT JOIN car_data cd  ON cd.time = l.time
-                      AND cd.driver_id  = l.driver_id
-                      AND cd.session_id = l.session_id
-WITH NO DATA;
+-- once sql/create_track_projection_incremental.sql has been applied this is a
+-- plain view over analysis.track_projection, maintained by track_projection.py:
+-- leave it alone then
+DO $$
+BEGIN
+    IF to_regclass('analysis.track_projection') IS NOT NULL THEN
+        RAISE NOTICE 'analysis.track_projection exists: keeping the incremental projection';
+        RETURN;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_class
+               WHERE oid = to_regclass('analysis.mv_track_projection') AND relkind = 'v') THEN
+        DROP VIEW analysis.mv_track_projection;
+    END IF;
+    DROP MATERIALIZED VIEW IF EXISTS analysis.mv_track_projection;
+    CREATE MATERIALIZED VIEW analysis.mv_track_projection AS
+    SELECT DISTINCT ON (l.session_id, l.driver_id, date_trunc('second', l.time))
+        l.session_id,
+        l.driver_id,
+        d.full_name,
+        tm.team_name,
+        t.team_colour,
+        lp.lap_number,
+        date_trunc('second', l.time) AS t,   -- round to second (first sample wins)
+        l.x, l.y, l.z,
+        cd.speed,
+        cd.gear,
+        cd.throttle,
+        cd.brake_is_pressed
+    FROM location l
+    JOIN driver d          USING (driver_id)
+    JOIN team_membership tm USING (driver_id, session_id)
+    JOIN team t            ON t.team_name = tm.team_name
+    LEFT JOIN car_data cd  ON cd.time = l.time
+                          AND cd.driver_id  = l.driver_id
+                          AND cd.session_id = l.session_id
+    -- location has no lap number: take the last lap started before the sample
+    LEFT JOIN LATERAL (
+        SELECT max(lap_number) AS lap_number
+        FROM lap
+        WHERE lap.session_id = l.session_id
+          AND lap.driver_id  = l.driver_id
+          AND lap.start_time <= l.time
+    ) lp ON true
+    ORDER BY l.session_id, l.driver_id, date_trunc('second', l.time), l.time
+    WITH NO DATA;
 
-CREATE UNIQUE INDEX ON analysis.mv_track_projection(session_id, driver_id, t, lap_number);
+    CREATE UNIQUE INDEX ON analysis.mv_track_projection(session_id, driver_id, t);
+END
+$$;
 
 /*---------------------------------------------------------------
   2.  Stint summary
@@ -49,8 +73,8 @@ SELECT
     st.lap_start,
     st.lap_end,
     COUNT(*)                               AS num_laps,
-    ROUND(AVG(l.duration),2)               AS avg_lap_s,
-    ROUND(MIN(l.duration),2)               AS best_lap_s
+    ROUND(AVG(l.duration)::numeric,2)      AS avg_lap_s,
+    ROUND(MIN(l.duration)::numeric,2)      AS best_lap_s
 FROM stint             st
 JOIN lap               l  USING (driver_id, session_id)
 JOIN driver            d  USING (driver_id)
@@ -124,3 +148,126 @@ SELECT
 FROM v_session_results
 GROUP BY year, full_name
 WITH NO DATA;
+
+-- one row per driver and season; lets the view refresh CONCURRENTLY
+CREATE UNIQUE INDEX ON analysis.mv_driver_summary_season(year, full_name);
+
+/*---------------------------------------------------------------
+  6.  Lap detail  (sectors as columns, stint, clean-lap flag)
+----------------------------------------------------------------*/
+DROP MATERIALIZED VIEW IF EXISTS analysis.mv_lap_detail;
+CREATE MATERIALIZED VIEW analysis.mv_lap_detail AS
+SELECT
+    l.session_id,
+    l.driver_id,
+    l.lap_number,
+    l.lap_id,
+    d.full_name,
+    tm.team_name,
+    t.team_colour,
+    l.duration                                  AS lap_time_s,
+    sec.sector1_s,
+    sec.sector2_s,
+    sec.sector3_s,
+    st.stint_number,
+    st.compound,
+    st.tire_age_at_start + l.lap_number - st.lap_start AS tyre_age,
+    l.out_lap <> 0                              AS out_lap,
+    ps.lap_number IS NOT NULL                   AS pit_in_lap,
+    -- a timed racing lap: not the opening lap and no pit lane at either end
+    l.duration IS NOT NULL AND l.lap_number > 1
+        AND l.out_lap = 0 AND ps.lap_number IS NULL AS clean
+FROM lap               l
+JOIN driver            d  ON d.driver_id = l.driver_id
+JOIN team_membership   tm ON tm.driver_id = l.driver_id
+                         AND tm.session_id = l.session_id
+JOIN team              t  ON t.team_name = tm.team_name
+-- one pass over sector instead of a join per sector
+LEFT JOIN (
+    SELECT lap_id,
+           MAX(duration) FILTER (WHERE sector_number = 1) AS sector1_s,
+           MAX(duration) FILTER (WHERE sector_number = 2) AS sector2_s,
+           MAX(duration) FILTER (WHERE sector_number = 3) AS sector3_s
+    FROM sector
+    GROUP BY lap_id
+) sec ON sec.lap_id = l.lap_id
+LEFT JOIN LATERAL (
+    SELECT stint_number, compound, lap_start, tire_age_at_start
+    FROM stint
+    WHERE stint.session_id = l.session_id
+      AND stint.driver_id  = l.driver_id
+      AND l.lap_number BETWEEN stint.lap_start AND stint.lap_end
+    ORDER BY stint_number DESC
+    LIMIT 1
+) st ON true
+LEFT JOIN (
+    SELECT DISTINCT session_id, driver_id, lap_number FROM pit_stop
+) ps ON ps.session_id = l.session_id
+    AND ps.driver_id  = l.driver_id
+    AND ps.lap_number = l.lap_number
+WITH NO DATA;
+
+CREATE UNIQUE INDEX ON analysis.mv_lap_detail(session_id, driver_id, lap_number);
+
+/*---------------------------------------------------------------
+  7.  Race trace  (position + gaps per lap)  [reads position / intervals]
+----------------------------------------------------------------*/
+DROP MATERIALIZED VIEW IF EXISTS analysis.mv_race_trace;
+CREATE MATERIALIZED VIEW analysis.mv_race_trace AS
+WITH ev AS (
+    -- lap starts and samples on one timeline per driver
+    SELECT session_id, driver_id, start_time AS time, lap_number,
+           NULL::float AS gap_to_leader, NULL::float AS gap_to_next, NULL::int AS position
+    FROM lap
+    WHERE start_time IS NOT NULL
+    UNION ALL
+    SELECT session_id, driver_id, time, NULL, gap_to_leader, gap_to_next, NULL
+    FROM intervals
+    UNION ALL
+    SELECT session_id, driver_id, time, NULL, NULL, NULL, position
+    FROM position
+), tagged AS (
+    -- lap numbers only grow, so the running max is the lap a sample falls in
+    SELECT ev.*,
+           coalesce(max(lap_number) OVER (PARTITION BY session_id, driver_id
+                                          ORDER BY time, lap_number NULLS LAST), 0) AS lap
+    FROM ev
+), per_lap AS (
+    -- the last value seen in each lap (position is only sent on change)
+    SELECT session_id, driver_id, lap AS lap_number,
+           MIN(time) AS t,
+           (array_agg(position ORDER BY time DESC)
+                FILTER (WHERE position IS NOT NULL))[1]      AS position_change,
+           (array_agg(gap_to_leader ORDER BY time DESC)
+                FILTER (WHERE gap_to_leader IS NOT NULL))[1] AS gap_to_leader,
+           (array_agg(gap_to_next ORDER BY time DESC)
+                FILTER (WHERE gap_to_next IS NOT NULL))[1]   AS gap_to_next
+    FROM tagged
+    GROUP BY session_id, driver_id, lap
+), filled AS (
+    SELECT per_lap.*,
+           COUNT(position_change) OVER (PARTITION BY session_id, driver_id
+                                        ORDER BY lap_number) AS position_run
+    FROM per_lap
+)
+SELECT
+    f.session_id,
+    f.driver_id,
+    d.full_name,
+    tm.team_name,
+    t.team_colour,
+    f.lap_number,
+    f.t,
+    MAX(f.position_change) OVER (PARTITION BY f.session_id, f.driver_id, f.position_run)
+                                                AS position,
+    ROUND(f.gap_to_leader::numeric, 3)::float   AS gap_to_leader,
+    ROUND(f.gap_to_next::numeric, 3)::float     AS gap_to_next
+FROM filled            f
+JOIN driver            d  ON d.driver_id = f.driver_id
+JOIN team_membership   tm ON tm.driver_id = f.driver_id
+                         AND tm.session_id = f.session_id
+JOIN team              t  ON t.team_name = tm.team_name
+WHERE f.lap_number > 0
+WITH NO DATA;
+
+CREATE UNIQUE INDEX ON analysis.mv_race_trace(session_id, driver_id, lap_number);
@@ -0,0 +1,187 @@
+/*---------------------------------------------------------------
+  Base tables (public schema)
+  ---------------------------------------------------------------
+  The ingest schema the views are built on; the same tables are
+  described to the model in ai_sql.SCHEMA_SNIPPET.  Used to set up
+  scratch databases (see benchmarks/).
+----------------------------------------------------------------*/
+
+CREATE TABLE driver(
+    driver_id int PRIMARY KEY,
+    broadcast_name varchar(200) NOT NULL,
+    first_name varchar(200) NOT NULL,
+    last_name varchar(200) NOT NULL,
+    full_name varchar(200) NOT NULL,
+    country_code char(3) NOT NULL,
+    picture_url varchar(200),
+    acronym char(3) NOT NULL
+);
+
+CREATE TABLE team(
+    team_name varchar(200) PRIMARY KEY,
+    team_colour char(6) NOT NULL
+);
+
+CREATE TABLE circuit(
+    circuit_id int PRIMARY KEY,
+    short_name varchar(200) NOT NULL,
+    official_name varchar(200) NOT NULL,
+    country_code char(3) NOT NULL,
+    country_key int NOT NULL,
+    location varchar(200) NOT NULL
+);
+
+CREATE TABLE meeting(
+    meeting_id int PRIMARY KEY,
+    meeting_name varchar(200) NOT NULL,
+    official_name varchar(200) NOT NULL,
+    circuit_id int references circuit NOT NULL,
+    start timestamp NOT NULL,
+    year int
+);
+
+CREATE TABLE session(
+    session_id int PRIMARY KEY,
+    meeting_id int references meeting NOT NULL,
+    start_time timestamp NOT NULL,
+    end_time timestamp,
+    session_name varchar(200) NOT NULL,
+    session_type varchar(200) NOT NULL
+);
+
+CREATE TABLE team_membership(
+    team_name varchar(200) references team NOT NULL,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    UNIQUE(team_name, driver_id, session_id)
+);
+
+CREATE TABLE weather(
+    session_id int references session NOT NULL,
+    time timestamp NOT NULL,
+    temperature float,
+    humidity int,
+    air_pressure  float,
+    rainfall float,
+    track_temperature float,
+    wind_direction int,
+    wind_speed float,
+    UNIQUE(session_id, time)
+);
+
+CREATE TABLE race_control(
+    session_id int references session NOT NULL,
+    time timestamp NOT NULL,
+    driver_id int references driver DEFAULT NULL,
+    category varchar(200) NOT NULL,
+    flag varchar(200) DEFAULT NULL,
+    lap_number int DEFAULT NULL,
+    message varchar(500),
+    scope varchar(200),
+    sector int DEFAULT NULL,
+    UNIQUE(session_id, driver_id, time)
+);
+
+CREATE TABLE result(
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    position int NOT NULL,
+    total_time float,
+    gap_to_winner varchar(200),
+    points int,
+    status varchar(200),
+    PRIMARY KEY(driver_id, session_id)
+);
+
+CREATE TABLE location(
+    location_id SERIAL PRIMARY KEY,
+    time timestamp NOT NULL,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    x int,
+    y int,
+    z int,
+    UNIQUE(time, driver_id, session_id)
+);
+
+CREATE TABLE position(
+    time timestamp NOT NULL,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    position int,
+    PRIMARY KEY(time, driver_id, session_id)
+);
+
+CREATE TABLE intervals(
+    time timestamp NOT NULL,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    gap_to_leader float,
+    overlap_to_leader int DEFAULT 0,
+    gap_to_next float,
+    overlap_to_next int DEFAULT 0,
+    PRIMARY KEY(time, driver_id, session_id)
+);
+
+CREATE TABLE lap(
+    lap_id SERIAL PRIMARY KEY,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    lap_number int NOT NULL,
+    start_time timestamp,
+    i1_speed int,
+    i2_speed int,
+    out_lap int DEFAULT 0 NOT NULL,
+    duration float,
+    top_speed int,
+    UNIQUE(driver_id, session_id, lap_number)
+);
+
+CREATE TABLE sector(
+    id SERIAL PRIMARY KEY,
+    lap_id int references lap NOT NULL,
+    sector_number int NOT NULL,
+    duration float NOT NULL,
+    UNIQUE(lap_id, sector_number)
+);
+
+CREATE TABLE segment(
+    sector_id int references sector NOT NULL,
+    segment_number int NOT NULL,
+    segment_index float NOT NULL,
+    segment_status varchar(200) NOT NULL,
+    UNIQUE(sector_id, segment_number)
+);
+
+CREATE TABLE car_data(
+    time timestamp NOT NULL,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    brake_is_pressed int,
+    drs_status int,
+    gear int,
+    rpm int,
+    speed int,
+    throttle int,
+    UNIQUE(time, driver_id, session_id)
+);
+
+CREATE TABLE pit_stop(
+    time timestamp NOT NULL,
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    duration float,
+    lap_number int,
+    UNIQUE(time, driver_id, session_id)
+);
+
+CREATE TABLE stint(
+    driver_id int references driver NOT NULL,
+    session_id int references session NOT NULL,
+    stint_number int NOT NULL,
+    compound varchar(200),
+    lap_start int,
+    lap_end int,
+    tire_age_at_start int,
+    UNIQUE(driver_id, session_id, stint_number)
+);
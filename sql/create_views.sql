@@ -10,7 +10,8 @@ SELECT
     r.position,
     r.points,
     t.team_name,
-    t.team_colour
+    t.team_colour,
+    s.session_type
 FROM result r
 JOIN driver d ON d.driver_id = r.driver_id
 JOIN session s ON s.session_id = r.session_id
@@ -0,0 +1,26 @@
+/*---------------------------------------------------------------
+  001  Base table indexes
+  ---------------------------------------------------------------
+  Written by index_advisor.py on 2026-10-17.
+  Apply with  python migrate.py
+----------------------------------------------------------------*/
+
+-- PROJECTION_SQL
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_car_data_session_id_driver_id_time
+    ON public.car_data (session_id, driver_id, time);
+
+-- PROJECTION_SQL, mv_lap_detail
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_lap_session_id_driver_id_start_time
+    ON public.lap (session_id, driver_id, start_time);
+
+-- HAS_LOCATION_SQL, PROJECTION_SQL
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_location_session_id_driver_id_time
+    ON public.location (session_id, driver_id, time);
+
+-- v_session_results
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_result_session_id
+    ON public.result (session_id);
+
+-- PROJECTION_SQL, SESSION_DRIVERS, mv_pit_stop_timeline, mv_sector_performance, mv_stint_summary, v_session_results
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_team_membership_session_id_driver_id
+    ON public.team_membership (session_id, driver_id);
@@ -0,0 +1,112 @@
+"""
+Cost-based guard for generated and ad-hoc SQL.
+
+Before a query runs, ``check`` asks the planner for an ``EXPLAIN (FORMAT JSON)``
+estimate.  Queries over the cost/row limits are rewritten where that helps –
+first by filtering to the selected ``session_id``, then by adding a ``LIMIT`` –
+and rejected with a readable reason if they are still too expensive.  The
+statement timeout follows the estimate, so a cheap query that runs away is
+stopped early while an expensive one keeps the full ``STATEMENT_TIMEOUT_MS``.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from db import STATEMENT_TIMEOUT_MS, _engine
+
+MAX_COST = float(os.getenv("SQL_GUARD_MAX_COST", "5e6"))
+MAX_ROWS = int(float(os.getenv("SQL_GUARD_MAX_ROWS", "1e6")))
+ROW_LIMIT = int(os.getenv("SQL_GUARD_LIMIT", "10000"))
+EXPLAIN_TIMEOUT_MS = 5000
+MS_PER_COST = float(os.getenv("SQL_GUARD_MS_PER_COST", "0.05"))   # planner cost → timeout budget
+MIN_TIMEOUT_MS = 2000
+
+
+@dataclass
+class GuardResult:
+    sql: str                        # what will run (possibly rewritten)
+    allowed: bool
+    cost: float                     # planner estimate for ``sql``
+    rows: int
+    original_cost: float
+    original_rows: int
+    timeout_ms: int = STATEMENT_TIMEOUT_MS
+    rewrites: list[str] = field(default_factory=list)
+    reason: Optional[str] = None
+
+
+def _plan(con, sql: str) -> tuple[float, int]:
+    plan = con.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+    return float(plan["Total Cost"]), int(plan["Plan Rows"])
+
+
+def _timeout_ms(cost: float) -> int:
+    return int(min(STATEMENT_TIMEOUT_MS, max(MIN_TIMEOUT_MS, cost * MS_PER_COST)))
+
+
+def _columns(con, sql: str) -> list[str]:
+    """Result columns of ``sql``; empty if the database cannot describe it."""
+    try:
+        with con.begin_nested():
+            return list(con.execute(text(f"SELECT * FROM (\n{sql}\n) AS q LIMIT 0")).keys())
+    except DBAPIError:
+        return []                   # e.g. the EXPLAIN timeout: no rewrite, still a verdict
+
+
+def _try_rewrite(con, res: GuardResult, sql: str, note: str):
+    """Adopt ``sql`` if the planner accepts it and it is estimated cheaper."""
+    try:
+        with con.begin_nested():
+            cost, rows = _plan(con, sql)
+    except DBAPIError:
+        return                      # e.g. ambiguous columns in the wrapped query
+    if cost >= res.cost and rows >= res.rows:
+        return
+    res.sql, res.cost, res.rows = sql, cost, rows
+    res.timeout_ms = _timeout_ms(cost)
+    res.rewrites.append(note)
+
+
+def check(sql: str, session_id: Optional[int] = None,
+          max_cost: float = MAX_COST, max_rows: int = MAX_ROWS) -> GuardResult:
+    """
+    Estimate ``sql`` and decide whether (and in which form) it may run.
+
+    Planner errors (syntax, unknown columns) are raised unchanged.
+    """
+    sql = sql.strip().rstrip(";")
+    with _engine().connect() as con:
+        con.exec_driver_sql("SET TRANSACTION READ ONLY")
+        con.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                    {"ms": str(EXPLAIN_TIMEOUT_MS)})
+        cost, rows = _plan(con, sql)
+        res = GuardResult(sql, True, cost, rows, cost, rows, _timeout_ms(cost))
+        if cost <= max_cost and rows <= max_rows:
+            return res
+
+        # 1. restrict to the session the user is looking at
+        if (session_id is not None
+                and not re.search(r"\bsession_id\s*(=|in\b)", sql, re.I)
+                and _columns(con, sql).count("session_id") == 1):
+            _try_rewrite(con, res,
+                         f"SELECT * FROM (\n{res.sql}\n) AS q WHERE q.session_id = {int(session_id)}",
+                         f"filtered to session_id = {int(session_id)}")
+
+        # 2. cap the number of rows returned
+        if (res.cost > max_cost or res.rows > max_rows) and res.rows > ROW_LIMIT and \
+                not re.search(r"\blimit\s+\d+\s*$", res.sql, re.I):
+            _try_rewrite(con, res, f"SELECT * FROM (\n{res.sql}\n) AS q LIMIT {ROW_LIMIT}",
+                         f"limited to {ROW_LIMIT:,} rows")
+
+    if res.cost > max_cost or res.rows > max_rows:
+        res.allowed = False
+        res.reason = (f"Estimated cost {res.original_cost:,.0f} "
+                      f"(≈{res.original_rows:,} rows) exceeds the limit of {max_cost:,.0f}")
+        if res.rewrites:
+            res.reason += f", even after it was {' and '.join(res.rewrites)} ({res.cost:,.0f})"
+        res.reason += ". Add a filter (e.g. on session_id) or an aggregation."
+    return res
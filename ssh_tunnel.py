@@ -1,27 +1,210 @@
 # ssh_tunnel.py
-import subprocess
+"""
+SSH tunnel to the course database, owned by this process.
+
+``TunnelManager`` runs ``ssh -N -L`` as a child process instead of a detached
+``ssh -f``.  The connection is a ControlMaster other ssh commands can share,
+ssh drops a dead link itself after ``TUNNEL_KEEPALIVE_S`` ×
+``TUNNEL_KEEPALIVE_COUNT`` seconds, and a watchdog thread probes the forwarded
+port every ``TUNNEL_CHECK_S`` seconds and restarts ssh when it is gone.  After
+every (re)connect the ``on_up`` callbacks run – the app uses
+``db.warm_pool`` to swap pooled connections through the old tunnel for fresh
+ones.
+
+Any ssh-compatible command can stand in for ``ssh`` (``SSH_BIN``), e.g.
+``benchmarks/loopback_ssh.py``, which only forwards the port.
+"""
+import atexit
+import os
+import shlex
 import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SSH_HOST = os.getenv("SSH_HOST", "194.95.221.127")
+SSH_USER = os.getenv("SSH_USER", "adt2025SS")
+SSH_PORT = int(os.getenv("SSH_PORT", "22"))
+SSH_BIN = os.getenv("SSH_BIN", "ssh")
+REMOTE_DB_HOST = os.getenv("REMOTE_DB_HOST", "localhost")
+REMOTE_DB_PORT = int(os.getenv("REMOTE_DB_PORT", "5432"))
+LOCAL_PORT = int(os.getenv("LOCAL_TUNNEL_PORT", "5432"))
 
-def is_port_in_use(port=5432):
+KEEPALIVE_S = int(os.getenv("TUNNEL_KEEPALIVE_S", "10"))
+KEEPALIVE_COUNT = int(os.getenv("TUNNEL_KEEPALIVE_COUNT", "3"))
+CHECK_S = float(os.getenv("TUNNEL_CHECK_S", "2"))
+CONNECT_TIMEOUT_S = float(os.getenv("TUNNEL_CONNECT_TIMEOUT_S", "15"))
+MAX_BACKOFF_S = 30.0
+
+# %C: hash of local host, remote host, port and user – one master per target
+CONTROL_PATH = os.getenv("SSH_CONTROL_PATH", os.path.join(tempfile.gettempdir(), "f1-ssh-%C"))
+
+
+def is_port_in_use(port=LOCAL_PORT):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(1.0)
         return s.connect_ex(("localhost", port)) == 0
 
-def start_ssh_tunnel():
-    if is_port_in_use(5432):
-        print("🔁 Tunnel already active on port 5432, skipping...")
-        return
-
-    print("🔐 Starting SSH tunnel...")
-    cmd = [
-        "ssh", "-N", "-f",  # -N: no shell, -f: background
-        "-o", "StrictHostKeyChecking=no",
-        "-o", "ExitOnForwardFailure=yes",
-        "-L", "5432:localhost:5432",
-        "adt2025SS@194.95.221.127", "-p", "22"
-    ]
-    try:
-        subprocess.check_call(cmd)
-        print("✅ SSH tunnel started")
-    except subprocess.CalledProcessError as e:
-        print("❌ Failed to start SSH tunnel")
-        raise e
+
+class TunnelManager:
+    """Keep ``localhost:local_port`` forwarded to the database behind ``host``."""
+
+    def __init__(self, local_port: int = LOCAL_PORT, *, host: str = SSH_HOST,
+                 user: Optional[str] = SSH_USER, ssh_port: int = SSH_PORT,
+                 remote_host: str = REMOTE_DB_HOST, remote_port: int = REMOTE_DB_PORT,
+                 ssh: str = SSH_BIN, check_s: float = CHECK_S,
+                 connect_timeout_s: float = CONNECT_TIMEOUT_S,
+                 on_up: Iterable[Callable[[], None]] = ()):
+        self.local_port = local_port
+        self.host = host
+        self.user = user
+        self.ssh_port = ssh_port
+        self.remote_host = remote_host
+        self.remote_port = remote_port
+        self.ssh = shlex.split(ssh)
+        self.check_s = check_s
+        self.connect_timeout_s = connect_timeout_s
+        self.on_up = list(on_up)
+        self.reconnects = 0
+        self.last_connect_s: Optional[float] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._stderr: deque = deque(maxlen=20)     # last lines ssh wrote
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def command(self) -> list[str]:
+        target = f"{self.user}@{self.host}" if self.user else self.host
+        return self.ssh + [
+            "-N",
+            "-o", "StrictHostKeyChecking=no",
+            "-o", "ExitOnForwardFailure=yes",
+            "-o", "BatchMode=yes",                    # never wait for a password prompt
+            "-o", f"ConnectTimeout={int(self.connect_timeout_s)}",
+            "-o", f"ServerAliveInterval={KEEPALIVE_S}",
+            "-o", f"ServerAliveCountMax={KEEPALIVE_COUNT}",
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={CONTROL_PATH}",
+            "-L", f"{self.local_port}:{self.remote_host}:{self.remote_port}",
+            "-p", str(self.ssh_port),
+            target,
+        ]
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid if self._proc is not None else None
+
+    def healthy(self) -> bool:
+        if self._proc is not None and self._proc.poll() is not None:
+            return False
+        return is_port_in_use(self.local_port)
+
+    def start(self) -> "TunnelManager":
+        """Forward the port (unless something already does) and start the watchdog."""
+        if is_port_in_use(self.local_port):
+            print(f"🔁 Tunnel already active on port {self.local_port}, skipping...")
+        else:
+            self._connect()
+        self._thread = threading.Thread(target=self._watch, name="ssh-tunnel", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._terminate()
+
+    # ─── internals ──────────────────────────────────────────────────
+    def _connect(self):
+        """Start ssh and wait until the port accepts connections."""
+        print(f"🔐 Starting SSH tunnel on port {self.local_port}...")
+        t0 = time.monotonic()
+        self._proc = subprocess.Popen(self.command(), stdin=subprocess.DEVNULL,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # keep reading: a full stderr pipe would block ssh and hang the tunnel
+        self._stderr.clear()
+        drain = threading.Thread(target=self._drain, args=(self._proc.stderr,),
+                                 name="ssh-stderr", daemon=True)
+        drain.start()
+        while not is_port_in_use(self.local_port):
+            rc = self._proc.poll()
+            if rc is not None:
+                drain.join(timeout=1)     # ssh has exited: its stderr ends too
+                err = " ".join(self._stderr)
+                self._proc = None
+                raise RuntimeError(f"ssh exited with {rc}: {err}")
+            if time.monotonic() - t0 > self.connect_timeout_s:
+                self._terminate()
+                raise TimeoutError(f"SSH tunnel on port {self.local_port} not up "
+                                   f"after {self.connect_timeout_s:.0f}s")
+            time.sleep(0.05)
+        if self._proc.poll() == 0:
+            self._proc = None             # an existing master holds the forward now
+        self.last_connect_s = time.monotonic() - t0
+        print(f"✅ SSH tunnel started in {self.last_connect_s:.2f}s")
+
+    def _drain(self, stderr):
+        for line in stderr:
+            self._stderr.append(line.decode(errors="replace").strip())
+
+    def _terminate(self):
+        proc, self._proc = self._proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def _notify(self):
+        for callback in self.on_up:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Tunnel callback {getattr(callback, '__name__', callback)} failed: {e}")
+
+    def _watch(self):
+        self._notify()
+        backoff = 1.0
+        while not self._stop.wait(self.check_s):
+            if self.healthy():
+                continue
+            print(f"⚠️ SSH tunnel on port {self.local_port} is down, reconnecting...")
+            self._terminate()
+            while not self._stop.is_set():
+                try:
+                    self._connect()
+                except (RuntimeError, TimeoutError, OSError) as e:
+                    print(f"❌ Reconnect failed ({e}), retrying in {backoff:.0f}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF_S)
+                    continue
+                self.reconnects += 1
+                backoff = 1.0
+                self._notify()
+                break
+
+
+_START_LOCK = threading.Lock()
+
+
+def start_ssh_tunnel(on_up: Optional[Callable[[], None]] = None) -> TunnelManager:
+    """The process-wide tunnel; Streamlit reruns (and other threads) get the running one."""
+    with _START_LOCK:
+        return _start(on_up)
+
+
+@lru_cache
+def _start(on_up: Optional[Callable[[], None]]) -> TunnelManager:
+    manager = TunnelManager(on_up=[on_up] if on_up else [])
+    manager.start()
+    # only a started tunnel is cached, so this runs once per process
+    atexit.register(manager.stop)
+    return manager
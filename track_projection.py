@@ -0,0 +1,158 @@
+"""
+Incremental maintenance of the track projection (location + car_data).
+
+Once ``sql/create_track_projection_incremental.sql`` has been applied, the
+projection lives in the session-partitioned table
+``analysis.track_projection``.  Triggers on every table the projection reads
+record the sessions each statement touched in ``track_projection_dirty``; a
+refresh rebuilds exactly those partitions and drops the ones of deleted
+sessions, so its cost follows newly ingested data instead of the whole history
+– finding the work never scans ``location`` or ``car_data``.
+"""
+import sys
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from db import _engine
+
+# one row per driver and second, tagged with the lap that was running then
+PROJECTION_SQL = """
+INSERT INTO analysis.track_projection
+SELECT DISTINCT ON (l.driver_id, date_trunc('second', l.time))
+    l.session_id,
+    l.driver_id,
+    d.full_name,
+    tm.team_name,
+    t.team_colour,
+    lp.lap_number,
+    date_trunc('second', l.time) AS t,
+    l.x, l.y, l.z,
+    cd.speed,
+    cd.gear,
+    cd.throttle,
+    cd.brake_is_pressed
+FROM location l
+JOIN driver d          USING (driver_id)
+JOIN team_membership tm USING (driver_id, session_id)
+JOIN team t            ON t.team_name = tm.team_name
+LEFT JOIN car_data cd  ON cd.time = l.time
+                      AND cd.driver_id  = l.driver_id
+                      AND cd.session_id = l.session_id
+LEFT JOIN LATERAL (
+    SELECT max(lap_number) AS lap_number
+    FROM lap
+    WHERE lap.session_id = l.session_id
+      AND lap.driver_id  = l.driver_id
+      AND lap.start_time <= l.time
+) lp ON true
+WHERE l.session_id = :sid
+ORDER BY l.driver_id, date_trunc('second', l.time), l.time
+"""
+
+# sessions marked by the ingest triggers of sql/create_track_projection_incremental.sql
+DIRTY_SQL = """
+SELECT session_id, seq
+FROM analysis.track_projection_dirty
+ORDER BY session_id
+"""
+
+# one index probe: does the session have any telemetry at all?
+HAS_LOCATION_SQL = "SELECT EXISTS (SELECT 1 FROM location WHERE session_id = :sid)"
+
+SAVE_STATE_SQL = """
+INSERT INTO analysis.track_projection_state (session_id, row_count)
+VALUES (:sid, :rows)
+ON CONFLICT (session_id) DO UPDATE
+SET row_count    = EXCLUDED.row_count,
+    refreshed_at = now()
+"""
+
+# unmark only if nobody marked the session again while it was rebuilt
+CLEAR_DIRTY_SQL = """
+DELETE FROM analysis.track_projection_dirty
+WHERE session_id = :sid AND (CAST(:seq AS bigint) IS NULL OR seq = :seq)
+"""
+
+# partitions (and state rows) of sessions that no longer exist
+ORPHANS_SQL = """
+SELECT p.session_id
+FROM (
+    SELECT substring(c.relname FROM '^track_projection_s(\\d+)$')::int AS session_id
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'analysis.track_projection'::regclass
+    UNION
+    SELECT session_id FROM analysis.track_projection_state
+) p
+WHERE p.session_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM session s WHERE s.session_id = p.session_id)
+"""
+
+
+def is_incremental() -> bool:
+    """True once the partitioned table has replaced the materialized view."""
+    with _engine().connect() as con:
+        return con.execute(
+            text("SELECT to_regclass('analysis.track_projection') IS NOT NULL")
+        ).scalar()
+
+
+def _partition(sid: int) -> str:
+    return f"analysis.track_projection_s{int(sid)}"
+
+
+def drop_session(con, sid: int):
+    """Remove a session's partition and state, e.g. after the session was deleted."""
+    con.execute(text(f"DROP TABLE IF EXISTS {_partition(sid)}"))
+    con.execute(text("DELETE FROM analysis.track_projection_state WHERE session_id = :sid"),
+                {"sid": int(sid)})
+
+
+def rebuild_session(con, sid: int) -> int:
+    """Replace one session's partition; returns the number of rows written."""
+    sid = int(sid)
+    if not con.execute(text(HAS_LOCATION_SQL), {"sid": sid}).scalar():
+        drop_session(con, sid)
+        return 0
+    con.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition(sid)} "
+        f"PARTITION OF analysis.track_projection FOR VALUES IN ({sid})"
+    ))
+    con.execute(text(f"TRUNCATE {_partition(sid)}"))
+    rows = con.execute(text(PROJECTION_SQL), {"sid": sid}).rowcount
+    con.execute(text(SAVE_STATE_SQL), {"sid": sid, "rows": rows})
+    return rows
+
+
+def refresh_track_projection(sessions: Optional[Iterable[int]] = None) -> dict[int, int]:
+    """
+    Rebuild the sessions marked dirty (or exactly ``sessions``) and drop orphans.
+
+    Every session is rebuilt in its own transaction, so readers always see
+    either the old or the new partition.  Returns ``{session_id: rows}``;
+    dropped sessions count 0 rows.
+    """
+    with _engine().connect() as con:
+        if sessions is None:
+            todo = [(int(sid), seq) for sid, seq in con.execute(text(DIRTY_SQL))]
+        else:
+            todo = [(int(s), None) for s in sessions]
+        orphans = [int(sid) for sid in con.execute(text(ORPHANS_SQL)).scalars()]
+
+    written = {}
+    for sid, seq in todo:
+        with _engine().begin() as con:
+            written[sid] = rebuild_session(con, sid)
+            con.execute(text(CLEAR_DIRTY_SQL), {"sid": sid, "seq": seq})
+    for sid in orphans:
+        with _engine().begin() as con:
+            drop_session(con, sid)
+            con.execute(text(CLEAR_DIRTY_SQL), {"sid": sid, "seq": None})
+        written[sid] = 0
+    return written
+
+
+if __name__ == "__main__":
+    only = [int(a) for a in sys.argv[1:]] or None
+    for sid, rows in refresh_track_projection(only).items():
+        print(f"✅ session {sid}: {rows:,} rows")
@@ -0,0 +1,37 @@
+"""
+Cold-start warm-up: what the first rerun needs, fetched in the background.
+
+``start()`` runs once per process, right after the tunnel is up.  A background
+thread builds the race calendar (``catalog.catalog()``), and the SQLAlchemy
+engine on the way, while the script imports its chart modules; the sidebar
+then waits for that in-flight result instead of querying again.
+``F1_WARMUP=off`` disables it.
+"""
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import perf
+from catalog import catalog
+
+ENABLED = os.getenv("F1_WARMUP", "on") != "off"
+
+
+def _run():
+    try:
+        with perf.tab("warmup"):
+            catalog()
+    except Exception as e:
+        # the script's own queries report the problem
+        print(f"⚠️ Warm-up failed: {e}")
+
+
+@lru_cache
+def start() -> Optional[threading.Thread]:
+    """Start the warm-up thread (once per process); None when disabled."""
+    if not ENABLED:
+        return None
+    t = threading.Thread(target=_run, name="warmup", daemon=True)
+    t.start()
+    return t